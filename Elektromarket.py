@@ -2,9 +2,15 @@
 from loguru import logger
 import csv
 import os
+import time
 from datetime import datetime
-import requests
 from bs4 import BeautifulSoup
+from http_fetch import HttpFetcher
+from price_history import PriceHistory
+from product_index import ProductIndex
+from run_manifest import LISTING, record_run
+from metrics import CSV_WRITE, HISTORY_WRITE, HTML_PARSE, PARSE_PRODUCT, finish_run, observe, stage, start_run
+from rate_limiter import log_rate_summary
 
 # Utworzenie folderu output, jeśli nie istnieje
 os.makedirs("output", exist_ok=True)
@@ -16,15 +22,73 @@ today_date = datetime.today().strftime("%Y-%m-%d")
 csv_filename = f"output/{shop_name}_{today_date}.csv"
 log_filename = f"output/log_{shop_name}_{today_date}.log"
 
-# Funkcja od pobierania zawartości strony z uwzględnieniem możliwości problemów z łączem
-def fetch_page(url):
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.text
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Błąd podczas pobierania strony {url}: {e}")
-        return None
+# Wspólna sesja HTTP – ponowne użycie połączeń i równoległe pobieranie stron
+fetcher = HttpFetcher()
+price_history = PriceHistory()
+product_index = ProductIndex(shop_name)
+
+# Liczba stron listingu pobieranych naraz (nadmiarowe strony za ostatnią są odrzucane)
+listing_window = 4
+
+def page_url(link, page):
+    # Aktualnie wszystkie smartfony chwilowo niedostępne, dlatego ustawiłem stacjonarne
+    return f"https://elektromarket.pl/kategorie/{link}?priceFrom=&priceTill=&orderBy=priceHit&perPage=20&page={page}"
+
+# Zapis produktów z jednej strony listingu do pliku CSV
+def scrape_listing_page(soup):
+    products = soup.find_all(class_='left')
+
+    page_rows = []
+    for product in products:
+        parse_started = time.perf_counter()
+        availability = False
+        price_text = "0"
+        product_info = product.find_next_sibling(class_="right")
+        try:
+            # Pobranie tytułu oraz linku produktu
+            link_element = product.find('a')
+            title = link_element.get('title', 'Brak tytułu')
+            product_link = link_element.get('href', '')
+
+            # Pomijanie pobierania ceny niedostępnych elementów
+            if product_info.find('span', class_='boxRed'):
+                logger.info(f"  Produkt chwilowo niedostępny: {title}")
+
+            # Pobranie ceny produktu
+            else:
+                availability = True
+                try:
+                    price_element = product_info.find(class_="priceCurrent")
+                    if price_element and price_element.contents:
+                        price_text = f"{price_element.contents[0]}.{price_element.find('sup').text}"
+                except Exception as e:
+                    logger.error(f"Błąd przy sprawdzaniu ceny: {e}")
+
+            # Zapis do pliku CSV
+            row = {
+                "title": title,
+                "date": today_date,
+                "price": price_text,
+                "product_link": shop_url + product_link,
+                "availability": availability
+            }
+            observe(PARSE_PRODUCT, time.perf_counter() - parse_started)
+            # Ten sam produkt mógł już wystąpić na wcześniejszej stronie lub w innej kategorii (product_index.py)
+            if not product_index.claim(row["product_link"]):
+                logger.info("Pominięto duplikat: {}", row["product_link"])
+                continue
+            with stage(CSV_WRITE):
+                writer.writerow(row)
+                csvfile.flush()
+            page_rows.append(row)
+            logger.info(f"  Scraped: {title}")
+        except Exception as e:
+            logger.error(f"Błąd przy przetwarzaniu produktu: {e}")
+    # Historia cen zapisywana raz na stronę – ceny i oceny normalizowane całą kolumną (normalize.py)
+    with stage(HISTORY_WRITE):
+        price_history.record_many(shop_name, today_date, page_rows)
+    product_index.commit()
+
 
 # Konfiguracja logowania przy użyciu loguru:
 logger.remove()
@@ -32,6 +96,8 @@ log_format = "{time:YYYY-MM-DD HH:mm:ss,SSS} - {level} - {message}"
 logger.add(log_filename, level="INFO", format=log_format, encoding="utf-8")
 logger.add(lambda msg: print(msg, end=""), level="INFO", format=log_format)
 
+# Pomiary czasu etapów (metrics.py) trafiają do przebiegu listingu tego sklepu
+start_run(shop_name, LISTING)
 logger.info("Rozpoczęto scraping.")
 logger.info("Plik CSV: {}", csv_filename)
 logger.info("Plik logu: {}", log_filename)
@@ -39,70 +105,54 @@ logger.info("Plik logu: {}", log_filename)
 # Definiujemy pola CSV
 fieldnames = ["date", "title", "price", "product_link", "availability"]
 
-with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
-
-    links = ["telefony-100/telefony-stacjonarne-101.html", "telefony-100/telefony-komorkowe-i-smartfony-102.html"]
-
-    for link in links:
-        page = 1
-
-        while True:
-            # Aktualnie wszystkie smartfony chwilowo niedostępne, dlatego ustawiłem stacjonarne
-            url = f"https://elektromarket.pl/kategorie/{link}?priceFrom=&priceTill=&orderBy=priceHit&perPage=20&page={page}"
-
-            page_content = fetch_page(url)
-            if not page_content:
-                break
-            soup = BeautifulSoup(page_content, "html.parser")
-
-            products = soup.find_all(class_='left')
-
-            for product in products:
-                availability = False
-                price_text = "0"
-                product_info = product.find_next_sibling(class_="right")
-                try:
-                    # Pobranie tytułu oraz linku produktu
-                    link_element = product.find('a')
-                    title = link_element.get('title', 'Brak tytułu')
-                    product_link = link_element.get('href', '')
-
-                    # Pomijanie pobierania ceny niedostępnych elementów
-                    if product_info.find('span', class_='boxRed'):
-                        logger.info(f"  Produkt chwilowo niedostępny: {title}")
-
-                    # Pobranie ceny produktu
-                    else:
-                        availability = True
-                        try:
-                            price_element = product_info.find(class_="priceCurrent")
-                            if price_element and price_element.contents:
-                                price_text = f"{price_element.contents[0]}.{price_element.find('sup').text}"
-                        except Exception as e:
-                            logger.error(f"Błąd przy sprawdzaniu ceny: {e}")
-
-                    # Zapis do pliku CSV
-                    writer.writerow({
-                        "title": title,
-                        "date": today_date,
-                        "price": price_text,
-                        "product_link": shop_url + product_link,
-                        "availability": availability
-                    })
-                    logger.info(f"  Scraped: {title}")
-                except Exception as e:
-                    logger.error(f"Błąd przy przetwarzaniu produktu: {e}")
-
-            try:
-                if not soup.find(class_='forward'):
-                    logger.info("Brak przycisku 'następna strona' – zakończono scraping.")
-                    break
-            except Exception as e:
-                logger.error(f"Błąd przy sprawdzaniu następnej strony: {e}")
-                break
-
-            page += 1
+try:
+    with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        csvfile.flush()
+        # Wpis "running" pozwala skryptowi danych technicznych czytać listing w trakcie zapisu (tryb strumieniowy)
+        record_run(shop_name, LISTING, today_date, csv_filename, status="running", rows=0)
+
+        links = ["telefony-100/telefony-stacjonarne-101.html", "telefony-100/telefony-komorkowe-i-smartfony-102.html"]
+
+        for link in links:
+            page = 1
+            finished = False
+
+            while not finished:
+                # Pobieramy kilka kolejnych stron naraz i przetwarzamy je po kolei
+                urls = [page_url(link, number) for number in range(page, page + listing_window)]
+                for url, page_content in fetcher.fetch_many(urls):
+                    if not page_content:
+                        finished = True
+                        break
+                    with stage(HTML_PARSE):
+                        soup = BeautifulSoup(page_content, "html.parser")
+                    scrape_listing_page(soup)
+
+                    try:
+                        if not soup.find(class_='forward'):
+                            logger.info("Brak przycisku 'następna strona' – zakończono scraping.")
+                            finished = True
+                            break
+                    except Exception as e:
+                        logger.error(f"Błąd przy sprawdzaniu następnej strony: {e}")
+                        finished = True
+                        break
+
+                    page += 1
+except Exception:
+    # Przerwany listing nie może zostać najnowszym udanym wynikiem (dane techniczne, run_all.py)
+    record_run(shop_name, LISTING, today_date, csv_filename, status="failed")
+    raise
+else:
+    # Plik CSV jest już zamknięty, więc rejestr przebiegów widzi wszystkie wiersze
+    record_run(shop_name, LISTING, today_date, csv_filename)
+finally:
+    fetcher.close()
+    price_history.close()
+    product_index.close()
+    log_rate_summary()
+    finish_run()
     logger.complete()
-    logger.info(f"Zakończono scraping. Dane zapisane w pliku: {csv_filename}")
\ No newline at end of file
+    logger.info(f"Zakończono scraping. Dane zapisane w pliku: {csv_filename}")
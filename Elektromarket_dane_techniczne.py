@@ -1,12 +1,17 @@
 # Biblioteki
 from loguru import logger
-import csv
 import os
-import glob
-import json
 from datetime import datetime
-import requests
 from bs4 import BeautifulSoup
+from http_fetch import HttpFetcher
+from checkpoint import CheckpointJournal
+from listing_stream import read_listing
+from run_manifest import TECH_DETAILS, latest_listing_file, record_run
+from tech_cache import TechDetailsCache, write_tech_details
+from spec_store import SpecStore
+from product_index import ProductIndex
+from metrics import PARSE_PRODUCT, finish_run, stage, start_run
+from rate_limiter import log_rate_summary
 
 # Utworzenie folderu output, jeśli nie istnieje
 output_folder = "output"
@@ -24,54 +29,30 @@ log_format = "{time:YYYY-MM-DD HH:mm:ss,SSS} - {level} - {message}"
 logger.add(log_filename, level="INFO", format="{time} - {level} - {message}", encoding="utf-8")
 logger.add(lambda msg: print(msg, end=""), level="INFO", format=log_format)
 
+# Pomiary czasu etapów (metrics.py) trafiają do przebiegu danych technicznych tego sklepu
+start_run(shop_name, TECH_DETAILS)
 logger.info("Rozpoczęcie skryptu pobierania szczegółów technicznych.")
 logger.info("Plik CSV: {}", csv_filename)
 logger.info("Plik logu: {}", log_filename)
 
 
-# Wyszukanie najnowszego pliku CSV wygenerowanego przez pierwszy skrypt
-csv_pattern = os.path.join(output_folder, f"{shop_name}_*.csv")
-csv_files = glob.glob(csv_pattern)
-if not csv_files:
-    logger.error("Nie znaleziono plików CSV pasujących do wzorca {}", csv_pattern)
+# Najnowszy udany listing z rejestru przebiegów (bez przeszukiwania folderu output)
+latest_csv_file = latest_listing_file(shop_name, output_folder)
+if not latest_csv_file:
+    logger.error("Nie znaleziono pliku CSV z listingiem sklepu {}", shop_name)
     exit(1)
-
-def extract_date(filename):
-    base = os.path.basename(filename)
-    date_str = base.replace(f"{shop_name}_", "").replace(".csv", "")
-    try:
-        return datetime.strptime(date_str, "%Y-%m-%d")
-    except ValueError:
-        return None
-
-csv_files_with_date = [(file, extract_date(file)) for file in csv_files if extract_date(file) is not None]
-if not csv_files_with_date:
-    logger.error("Żaden z plików CSV nie ma poprawnego formatu daty.")
-    exit(1)
-csv_files_with_date.sort(key=lambda x: x[1], reverse=True)
-latest_csv_file = csv_files_with_date[0][0]
 logger.info("Wybrany plik CSV: {}", latest_csv_file)
+product_data = read_listing(latest_csv_file)
 
-# Wczytanie linków produktów z CSV
-product_data = []
-with open(latest_csv_file, mode="r", encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        if row.get("product_link"):
-            product_data.append({
-                "product_link": row["product_link"],
-            })
-logger.info("Znaleziono {} produktów do przetworzenia.", len(product_data))
-
-def scrape_tech_details(url):
+def scrape_tech_details(url, page_content):
     """
-    Funkcja otwiera stronę produktu i próbuje pobrać wszystkie detale techniczne.
+    Funkcja przetwarza pobraną stronę produktu i próbuje odczytać wszystkie detale techniczne.
     """
     tech_details = {}
+    if page_content is None:
+        return tech_details
     try:
-        requested_page = requests.get(url)
-        requested_page.raise_for_status()
-        soup = BeautifulSoup(requested_page.text, 'html.parser')
+        soup = BeautifulSoup(page_content, 'html.parser')
 
 
         # Szukanie obiektu zawierającego między innymi dane techniczne
@@ -95,7 +76,7 @@ def scrape_tech_details(url):
                             logger.warning("Błąd podczas odczytywania parametrów, niepoprawna ilość kolumn: {}", url)
 
     except Exception as e:
-        logger.error("Błąd przy otwieraniu URL {}: {}", url, e)
+        logger.error("Błąd przy przetwarzaniu URL {}: {}", url, e)
     return tech_details
 
 
@@ -103,20 +84,47 @@ def scrape_tech_details(url):
 tech_csv_filename = os.path.join(output_folder, f"tech_details_{shop_name}_{today_date}.csv")
 output_fieldnames = ["product_link", "tech_details"]
 
-with open(tech_csv_filename, mode="w", newline="", encoding="utf-8") as tech_csvfile:
-    writer = csv.DictWriter(tech_csvfile, fieldnames=output_fieldnames)
-    writer.writeheader()
-    for item in product_data:
-        url = item["product_link"]
-        logger.info("Przetwarzanie: {}", url)
-        details = scrape_tech_details(url)
-        writer.writerow({
-            "product_link": url,
-            "tech_details": json.dumps(details, ensure_ascii=False)
-        })
+# Dziennik postępu pozwala wznowić przerwany przebieg bez ponownego pobierania gotowych produktów
+journal = CheckpointJournal(os.path.join(output_folder, f"checkpoint_tech_details_{shop_name}_{today_date}.txt"), tech_csv_filename)
+# Ten sam produkt pod różnymi linkami (parametry śledzące, inny identyfikator) pobieramy tylko raz
+product_index = ProductIndex(shop_name, persist=False)
+product_data = product_index.unique(product_data)
+product_data = journal.pending(product_data)
+# Dane techniczne trafiają też do wspólnej bazy ze słownikami atrybutów i wartości (spec_store.py)
+spec_store = SpecStore()
+# Produkty z aktualnym wpisem w pamięci podręcznej nie są ponownie otwierane
+cache = TechDetailsCache(shop_name)
+cached_details, to_scrape = cache.split(product_data)
 
 
-# Zamknięcie przeglądarki
+def fetch_tech_details(fetcher):
+    """
+    Generator pobiera równolegle strony produktów spoza cache przez wspólną sesję HTTP
+    i zwraca pary (item, dane techniczne) w kolejności z pliku CSV.
+    """
+    for item, (url, page_content) in zip(to_scrape, fetcher.fetch_many(item["product_link"] for item in to_scrape)):
+        logger.info("Przetwarzanie: {}", url)
+        # Strona bez zmian (304) – dane techniczne z poprzedniego przebiegu, bez ponownego parsowania
+        details = cache.get(url, ignore_ttl=True) if fetcher.not_modified(url) else None
+        if details is None:
+            with stage(PARSE_PRODUCT):
+                details = scrape_tech_details(url, page_content)
+        yield item, details
+
+
+tech_csvfile, writer = journal.open_output(output_fieldnames)
+with tech_csvfile, HttpFetcher() as fetcher:
+    # Wyniki z cache i pobrane zapisujemy w kolejności z pliku CSV
+    results = cache.in_order(product_data, cached_details, fetch_tech_details(fetcher))
+    write_tech_details(results, writer, tech_csvfile, journal, cache, spec_store, shop_name, today_date)
+
+journal.close()
+record_run(shop_name, TECH_DETAILS, today_date, tech_csv_filename)
+cache.close()
+spec_store.close()
+product_index.close()
+log_rate_summary()
+finish_run()
 logger.complete()
 logger.info("Zakończono pobieranie szczegółów technicznych. Dane zapisane w pliku: {}", tech_csv_filename)
 
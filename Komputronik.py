@@ -2,8 +2,16 @@ import csv
 import os
 from datetime import datetime
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service
+from urllib.parse import urljoin
+from browser_manager import BrowserManager, log_startup_summary
+from lean_profile import apply_lean_profile
+from page_snapshot import take_snapshot, text_of
+from structured_data import StructuredDataExtractor
+from price_history import PriceHistory
+from product_index import ProductIndex, product_id_of
+from run_manifest import LISTING, record_run
+from metrics import CSV_WRITE, HISTORY_WRITE, PARSE_PRODUCT, finish_run, stage, start_run
+from rate_limiter import log_rate_summary
 from loguru import logger
 
 # Utworzenie folderu output, jeśli nie istnieje
@@ -22,89 +30,158 @@ log_format = "{time:YYYY-MM-DD HH:mm:ss,SSS} - {level} - {message}"
 logger.add(log_filename, level="INFO", format="{time} - {level} - {message}", encoding="utf-8")
 logger.add(lambda msg: print(msg, end=""), level="INFO", format=log_format)
 
+# Pomiary czasu etapów (metrics.py) trafiają do przebiegu listingu tego sklepu
+start_run(shop_name, LISTING)
 logger.info("Rozpoczęto scraping.")
 logger.info("Plik CSV: {}", csv_filename)
 logger.info("Plik logu: {}", log_filename)
 
 # Konfiguracja Firefoksa i Geckodrivera
-service = Service("/usr/local/bin/geckodriver")
+geckodriver_path = "/usr/local/bin/geckodriver"
 options = webdriver.FirefoxOptions()
 options.add_argument("--headless")
-driver = webdriver.Firefox(service=service, options=options)
+apply_lean_profile(options, shop_name)
+browser = BrowserManager(geckodriver_path, options)
+
+structured_data = StructuredDataExtractor(shop_name)
+price_history = PriceHistory()
+product_index = ProductIndex(shop_name)
+
+
+def parse_product(product, page_url):
+    """
+    Funkcja odczytuje dane jednego produktu ze zrzutu strony (BeautifulSoup) i zwraca wiersz CSV.
+    """
+    # Pobranie tytułu oraz linku produktu
+    link_element = product.select_one("a[title]")
+    title = link_element["title"]
+    product_link = urljoin(page_url, link_element["href"])
+
+    # Pobranie ceny produktu
+    price = text_of(product, 'div[data-name="listingPrice"] div[data-price-type="final"]')
+    if price is None:
+        raise ValueError(f"brak ceny dla produktu '{title}'")
+
+    # Pobranie URL obrazka produktu
+    image_url = urljoin(page_url, product.find("img")["src"])
+
+    # Pobieranie opinii (łączenie oceny oraz liczby opinii)
+    try:
+        review_element = product.select_one('p[class*="text-base"][class*="leading-none"]')
+        rating = text_of(review_element, 'span[class*="font-bold"]')
+        opinions = text_of(review_element, 'span:not([class*="font-bold"])')
+        if rating is None or opinions is None:
+            raise ValueError("brak opinii")
+        reviews = f"{rating} {opinions}"
+    except Exception as e:
+        reviews = ""
+        logger.info("Brak opinii dla produktu '{}'.", title)
+
+    return {
+        "title": title,
+        "product_link": product_link,
+        "price": price,
+        "image_url": image_url,
+        "reviews": reviews,
+    }
+
+
+def row_from_structured(item, page_url):
+    """
+    Funkcja zamienia produkt z danych strukturalnych na wiersz CSV w formacie parse_product.
+    """
+    reviews = ""
+    if item["rating"] is not None:
+        reviews = f"{item['rating']} ({item['review_count'] or 0})"
+    return {
+        "title": item["name"],
+        "product_link": urljoin(page_url, item["url"]),
+        "price": f"{item['price']:.2f} zł" if item["price"] is not None else None,
+        "image_url": urljoin(page_url, item["image"]) if item["image"] else "",
+        "reviews": reviews,
+    }
+
 
 # Definiujemy pola CSV
 fieldnames = ["title", "product_link", "price", "image_url", "reviews"]
 
-with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
-
-    page = 1
-    while True:
-        # Ustalanie URL: dla pierwszej strony używamy podstawowego adresu, a kolejne strony mają parametr ?p=
-        if page == 1:
-            url = "https://www.komputronik.pl/category/1596/telefony.html"
-        else:
-            url = f"https://www.komputronik.pl/category/1596/telefony.html?p={page}"
-        logger.info("Scraping strony {}: {}", page, url)
-
-        driver.get(url)
-        products = driver.find_elements(By.XPATH, '//div[@data-name="listingTile"]')
-        if not products:
-            logger.info("Brak produktów na stronie, kończę scraping.")
-            break
-
-        # Iteracja po produktach na stronie
-        for product in products:
-            try:
-                # Pobranie tytułu oraz linku produktu
-                link_element = product.find_element(By.XPATH, './/a[@title]')
-                title = link_element.get_attribute("title")
-                product_link = link_element.get_attribute("href")
-
-                # Pobranie ceny produktu
-                price_element = product.find_element(By.XPATH, './/div[@data-name="listingPrice"]//div[@data-price-type="final"]')
-                price = price_element.text.strip()
-
-                # Pobranie URL obrazka produktu
-                img_element = product.find_element(By.XPATH, './/img')
-                image_url = img_element.get_attribute("src")
-
-                # Pobieranie opinii (łączenie oceny oraz liczby opinii)
+try:
+    with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        csvfile.flush()
+        # Wpis "running" pozwala skryptowi danych technicznych czytać listing w trakcie zapisu (tryb strumieniowy)
+        record_run(shop_name, LISTING, today, csv_filename, status="running", rows=0)
+
+        page = 1
+        while True:
+            # Ustalanie URL: dla pierwszej strony używamy podstawowego adresu, a kolejne strony mają parametr ?p=
+            if page == 1:
+                url = "https://www.komputronik.pl/category/1596/telefony.html"
+            else:
+                url = f"https://www.komputronik.pl/category/1596/telefony.html?p={page}"
+            logger.info("Scraping strony {}: {}", page, url)
+
+            driver = browser.get(url)
+            # Jeden zrzut strony, dalej parsujemy w Pythonie
+            soup = take_snapshot(driver, scroll=False)
+            products = soup.select('div[data-name="listingTile"]')
+            if not products:
+                logger.info("Brak produktów na stronie, kończę scraping.")
+                break
+
+            # Dane strukturalne (JSON-LD itp.) mają pierwszeństwo, jeśli obejmują wszystkie produkty ze strony
+            structured = structured_data.extract(soup, expected=len(products))
+            if structured:
+                parse, items = row_from_structured, structured
+            else:
+                parse, items = parse_product, products
+
+            # Iteracja po produktach na stronie
+            page_rows = []
+            for item in items:
                 try:
-                    review_element = product.find_element(By.XPATH, './/p[contains(@class, "text-base") and contains(@class, "leading-none")]')
-                    rating = review_element.find_element(By.XPATH, './/span[contains(@class, "font-bold")]').text.strip()
-                    opinions = review_element.find_element(By.XPATH, './/span[not(contains(@class, "font-bold"))]').text.strip()
-                    reviews = f"{rating} {opinions}"
+                    # Zapis do pliku CSV
+                    with stage(PARSE_PRODUCT):
+                        row = parse(item, url)
+                    # Ten sam produkt mógł już wystąpić na wcześniejszej stronie lub w innej kategorii (product_index.py)
+                    if not product_index.claim(row["product_link"], product_id_of(item)):
+                        logger.info("Pominięto duplikat: {}", row["product_link"])
+                        continue
+                    with stage(CSV_WRITE):
+                        writer.writerow(row)
+                        csvfile.flush()
+                    page_rows.append(row)
+                    logger.info("Scraped: {}", row["title"])
                 except Exception as e:
-                    reviews = ""
-                    logger.info("Brak opinii dla produktu '{}'.", title)
-
-                # Zapis do pliku CSV
-                writer.writerow({
-                    "title": title,
-                    "product_link": product_link,
-                    "price": price,
-                    "image_url": image_url,
-                    "reviews": reviews,
-                })
-                logger.info("Scraped: {}", title)
-            except Exception as e:
-                logger.error("Błąd przy przetwarzaniu produktu: {}", e)
-
-        # Sprawdzenie, czy przycisk „nawiguj do następnej strony” jest dostępny
-        try:
-            next_arrow = driver.find_elements(By.XPATH, '//a[@aria-label="nawiguj do następnej strony"]')
+                    logger.error("Błąd przy przetwarzaniu produktu: {}", e)
+            # Historia cen zapisywana raz na stronę – ceny i oceny normalizowane całą kolumną (normalize.py)
+            with stage(HISTORY_WRITE):
+                price_history.record_many(shop_name, today, page_rows)
+            product_index.commit()
+
+            # Sprawdzenie, czy przycisk „nawiguj do następnej strony” jest dostępny
+            next_arrow = soup.select('a[aria-label="nawiguj do następnej strony"]')
             if not next_arrow:
                 logger.info("Brak przycisku 'następna strona' – zakończono scraping.")
                 break
-        except Exception as e:
-            logger.error("Błąd przy sprawdzaniu następnej strony: {}", e)
-            break
-
-        page += 1
 
-# Zamknięcie przeglądarki
-driver.quit()
-logger.complete()
-logger.info("Zakończono scraping. Dane zapisane w pliku: {}", csv_filename)
+            page += 1
+except Exception:
+    # Przerwany listing nie może zostać najnowszym udanym wynikiem (dane techniczne, run_all.py)
+    record_run(shop_name, LISTING, today, csv_filename, status="failed")
+    raise
+else:
+    # Plik CSV jest już zamknięty, więc rejestr przebiegów widzi wszystkie wiersze
+    record_run(shop_name, LISTING, today, csv_filename)
+finally:
+    # Zamknięcie przeglądarki
+    browser.quit()
+    price_history.close()
+    product_index.close()
+    log_startup_summary()
+    structured_data.log_summary()
+    log_rate_summary()
+    finish_run()
+    logger.complete()
+    logger.info("Zakończono scraping. Dane zapisane w pliku: {}", csv_filename)
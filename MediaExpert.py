@@ -7,16 +7,22 @@ import time
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import StaleElementReferenceException
-
-# Konfiguracja Firefoksa i Geckodrivera
-service = Service("/usr/local/bin/geckodriver")
-options = webdriver.FirefoxOptions()
-options.add_argument("--headless")
-driver = webdriver.Firefox(service=service, options=options)
+from urllib.parse import urljoin
+from browser_manager import BrowserManager, log_startup_summary
+from lean_profile import apply_lean_profile
+from fetch_backends import FetchBackend
+from listing_pages import fan_out_pages
+from page_snapshot import take_snapshot, text_of
+from structured_data import StructuredDataExtractor
+from price_history import PriceHistory
+from product_index import ProductIndex, product_id_of
+from run_manifest import LISTING, record_run
+from metrics import CSV_WRITE, HISTORY_WRITE, PARSE_PRODUCT, WAIT, finish_run, stage, start_run
+from rate_limiter import log_rate_summary
+from waits import log_wait_summary
+from lazy_load import log_lazy_load_summary
 
 # Konfiguracja folderu output
 output_folder = "output"
@@ -38,147 +44,219 @@ log_format = "{time:YYYY-MM-DD HH:mm:ss,SSS} - {level} - {message}"
 logger.add(log_filename, level="INFO", format="{time} - {level} - {message}", encoding="utf-8")
 logger.add(lambda msg: print(msg, end=""), level="INFO", format=log_format)
 
+# Konfiguracja Firefoksa i Geckodrivera
+geckodriver_path = "/usr/local/bin/geckodriver"
+options = webdriver.FirefoxOptions()
+options.add_argument("--headless")
+apply_lean_profile(options, shop_name)
+browser = BrowserManager(geckodriver_path, options)
+
+# Pomiary czasu etapów (metrics.py) trafiają do przebiegu listingu tego sklepu
+start_run(shop_name, LISTING)
 logger.info("Rozpoczęto scraping.")
 logger.info("Plik CSV: {}", csv_filename)
 logger.info("Plik logu: {}", log_filename)
 
+structured_data = StructuredDataExtractor(shop_name)
+price_history = PriceHistory()
+product_index = ProductIndex(shop_name)
+# Najpierw zwykłe HTTP, przeglądarka tylko dla stron bez pełnej strony kafelków w HTML (FETCH_BACKEND zmienia tryb)
+backend = FetchBackend(shop_name, required=(("div.offer-box h2.name a", 20),))
 
-with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
+base_url = "https://www.mediaexpert.pl/smartfony-i-zegarki/smartfony"
 
-    page = 1
-    while True:
-        # Ustalanie URL: dla pierwszej strony używamy podstawowego adresu, a kolejne strony mają parametr ?p=
-        if page == 1:
-            url = "https://www.mediaexpert.pl/smartfony-i-zegarki/smartfony"
-        else:
-            url = f"https://www.mediaexpert.pl/smartfony-i-zegarki/smartfony?page={page}"
-        logger.info("Scraping strony {}: {}", page, url)
+def parse_product(product, page_url):
+    """
+    Funkcja odczytuje dane jednego produktu ze zrzutu strony (BeautifulSoup), bez zapytań do przeglądarki.
+    """
+    # Pobierz nazwę produktu (jeśli brak – prawdopodobnie to nie jest właściwy produkt)
+    product_name = text_of(product, "h2.name a")
+    if not product_name:
+        return None
 
-        driver.get(url)
+    # Pobierz ocenę, uwzględniając pełne oraz połowkowe gwiazdki
+    rating_element = product.select_one("div.product-rating")
+    if rating_element is not None:
+        # Pełne gwiazdki (np. <i class="icon-star01 is-filled">)
+        full_stars = rating_element.select("i.icon-star01.is-filled")
+        # Połowkowe gwiazdki (np. <svg class="is-half-filled">)
+        half_stars = rating_element.select("svg.is-half-filled")
+        rating = len(full_stars) + 0.5 * len(half_stars)
+        # Pobierz liczbę opinii
+        reviews_element = rating_element.select_one("span.count-number")
+        reviews = reviews_element.get_text(strip=True) if reviews_element else "0"
+    else:
+        rating = None
+        reviews = None
+        logger.info("Brak opinii dla produktu '{}'.", product_name)
 
-        try:
-            # Czekamy aż produkty się załadują
-            wait = WebDriverWait(driver, 10)
+    # Pobranie linku produktu (href w zrzucie może być względny)
+    link_element = product.select_one("h2.name a.ui-link")
+    if link_element is None or not link_element.get("href"):
+        logger.error("Problem z pobraniem")
+        return None
+    product_link = urljoin(page_url, link_element["href"])
+
+    # Pobranie ceny produktu
+    price_parts = [product.select_one(f'span[class="{name}"]') for name in ("whole", "cents", "currency")]
+    if all(price_parts):
+        cala, grosze, waluta = (part.get_text(strip=True) for part in price_parts)
+        price_text = f"{cala}.{grosze}{waluta}"
+    else:
+        price_text = None
+        logger.info("Nie wykryto ceny: {}",product_name)
+
+    return product_name, rating, reviews, price_text, product_link
+
+
+def product_from_structured(item, page_url):
+    """
+    Funkcja zamienia produkt z danych strukturalnych na ten sam zestaw pól co parse_product.
+    """
+    price_text = f"{item['price']:.2f}zł" if item["price"] is not None else None
+    reviews = str(item["review_count"]) if item["review_count"] is not None else None
+    return item["name"], item["rating"], reviews, price_text, urljoin(page_url, item["url"])
+
+
+def page_url(page):
+    # Dla pierwszej strony używamy podstawowego adresu, a kolejne strony mają parametr ?page=
+    return base_url if page == 1 else f"{base_url}?page={page}"
+
+
+def browser_page(worker, url, page):
+    """
+    Funkcja otwiera stronę listingu w przeglądarce workera i zwraca zrzut strony (albo None, gdy produkty się nie załadowały).
+    """
+    driver = worker.get(url)
+
+    try:
+        # Czekamy aż produkty się załadują
+        wait = WebDriverWait(driver, 10)
+        with stage(WAIT):
             wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.offer-box")))
-        except Exception as e:
-            logger.error("Błąd oczekiwania na produkty: {}",e)
-            break
-        # time.sleep(1)
-
-        products = driver.find_elements(By.CSS_SELECTOR, "div.offer-box")
-        products_count = len(products)
-        logger.info("Znaleziono {} produktów.", products_count)
-
-        if not products:
-            logger.info("Brak produktów na stronie, kończę scraping.")
-            break
-
-        def process_product(index, retries=3):
-            for attempt in range(retries):
-                try:
-                    # Pobierz aktualną listę produktów, aby nie operować na "starych" referencjach
-                    products = driver.find_elements(By.CSS_SELECTOR, "div.offer-box")
-                    product = products[index]
-
-                    # Przewiń produkt do widoku – wymusza załadowanie lazy-loaded elementów
-                    driver.execute_script("arguments[0].scrollIntoView(true);", product)
-                    time.sleep(1)
-
-                    # Pobierz nazwę produktu (jeśli brak – prawdopodobnie to nie jest właściwy produkt)
-                    product_name_elements = product.find_elements(By.CSS_SELECTOR, "h2.name a")
-                    if not product_name_elements:
-                        return None
-                    product_name = product_name_elements[0].text.strip()
-
-                    # Pobierz ocenę, uwzględniając pełne oraz połowkowe gwiazdki
-                    try:
-                        rating_element = product.find_element(By.CSS_SELECTOR, "div.product-rating")
-                        # Pełne gwiazdki (np. <i class="icon-star01 is-filled">)
-                        full_stars = rating_element.find_elements(By.CSS_SELECTOR, "i.icon-star01.is-filled")
-                        # Połowkowe gwiazdki (np. <svg class="is-half-filled">)
-                        half_stars = rating_element.find_elements(By.CSS_SELECTOR, "svg.is-half-filled")
-                        rating = len(full_stars) + 0.5 * len(half_stars)
-                        # Pobierz liczbę opinii
-                        reviews_elements = rating_element.find_elements(By.CSS_SELECTOR, "span.count-number")
-                        reviews = reviews_elements[0].text.strip() if reviews_elements else "0"
-                    except Exception:
-                        rating = None
-                        reviews = None
-                        logger.info("Brak opinii dla produktu '{}'.", product_name)
-
-                    try:
-                        # Pobranie tytułu oraz linku produktu
-                        link_element = product.find_element(By.CSS_SELECTOR, 'h2.name a.ui-link')
-                        product_link = link_element.get_attribute("href")
-
-                        # Pobranie ceny produktu
-                        try:
-                            cala = product.find_element(By.XPATH, './/span[@class="whole"]').text.strip()
-                            grosze = product.find_element(By.XPATH, './/span[@class="cents"]').text.strip()
-                            waluta = product.find_element(By.XPATH, './/span[@class="currency"]').text.strip()
-                            price_text = f"{cala}.{grosze}{waluta}"
-                        except:
-                            price_text = None
-                            logger.info("Nie wykryto ceny: {}",product_name)
-
-                        return product_name, rating, reviews, price_text, product_link
-                    except:
-                        logger.error("Problem z pobraniem")
-
-                except StaleElementReferenceException:
-                    if attempt < retries - 1:
-                        # time.sleep(1)
-                        continue  # ponów próbę
-                    else:
-                        raise
-
-        seen_products = set()
-
-        for i in range(products_count):
-            try:
-                result = process_product(i)
-                if result is None:
-                    continue  # pomijamy elementy, które nie zawierają danych produktu
-                product_name, rating, reviews, price_text, product_link = result
-
-                # Sprawdzanie duplikatów
-                if product_name in seen_products:
-                    logger.info("Produkt '{}' został już przetworzony, pomijam duplikat.", product_name)
-                    continue
-                seen_products.add(product_name)
-
-                # Usuwanie NNBSP (Unicode U+202F) z ceny
-                price_text = price_text.replace("\u202F", "")
-
-                # Zapis do pliku CSV
-                writer.writerow({
-                    "date": today_date,
-                    "title": product_name,
-                    "price": price_text,
-                    "rating": rating,
-                    "num_of_opinions": reviews,
-                    "product_link": product_link
-                })
-                logger.info("Scraped: {}", product_name)
+    except Exception as e:
+        logger.error("Błąd oczekiwania na produkty na stronie {}: {}", page, e)
+        return None
 
-            except Exception as e:
-                logger.error("Błąd przy przetwarzaniu produktu: {}", e)
+    # Jeden zrzut strony po doczytaniu leniwej zawartości, dalej parsujemy już w Pythonie
+    return take_snapshot(driver, item_selector="div.offer-box", label="mediaexpert")
+
+
+def fetch_page(worker, page):
+    """
+    Funkcja zwraca zrzut strony listingu z HTML pobranego przez HTTP, a gdy brakuje w nim kafelków produktów –
+    z przeglądarki workera (fetch_backends.py; przeglądarka startuje dopiero przy pierwszej takiej stronie).
+    """
+    url = page_url(page)
+    logger.info("Scraping strony {}: {}", page, url)
+    # Ostatnia strona ma zwykle mniej produktów niż wymagane minimum
+    required = backend.last_page_required() if page > 1 and page == last_page else None
+    return backend.fetch(url, lambda: browser_page(worker, url, page), required)
+
+
+def save_page(page, soup, writer, csvfile):
+    """
+    Funkcja zapisuje produkty z jednego zrzutu strony do CSV i historii cen.
+    """
+    url = page_url(page)
+    started = time.perf_counter()
+    products = soup.select("div.offer-box") if soup is not None else []
+    products_count = len(products)
+    logger.info("Znaleziono {} produktów.", products_count)
+
+    if not products:
+        logger.info("Brak produktów na stronie {}.", page)
+        return
 
-        # Sprawdzenie, czy przycisk kolejnej strony jest dostępny
+    # Dane strukturalne (JSON-LD itp.) mają pierwszeństwo, jeśli obejmują wszystkie produkty ze strony
+    structured = structured_data.extract(soup, expected=len(soup.select("div.offer-box h2.name a")))
+    if structured:
+        parse, items = product_from_structured, structured
+    else:
+        parse, items = parse_product, products
+
+    page_rows = []
+    for item in items:
         try:
-            number = driver.find_element(By.XPATH, '//div[@class="lastpage-button"]').text
-            # print(number)
-            if int(number) <= page:
-                logger.info("Ostatnia strona – zakończono scraping.")
-                break
+            with stage(PARSE_PRODUCT):
+                result = parse(item, url)
+            if result is None:
+                continue  # pomijamy elementy, które nie zawierają danych produktu
+            product_name, rating, reviews, price_text, product_link = result
+
+            # Usuwanie NNBSP (Unicode U+202F) z ceny
+            price_text = price_text.replace("\u202F", "")
+
+            # Zapis do pliku CSV
+            row = {
+                "date": today_date,
+                "title": product_name,
+                "price": price_text,
+                "rating": rating,
+                "num_of_opinions": reviews,
+                "product_link": product_link
+            }
+            # Ten sam produkt mógł już wystąpić na wcześniejszej stronie lub w innej kategorii (product_index.py)
+            if not product_index.claim(row["product_link"], product_id_of(item)):
+                logger.info("Pominięto duplikat: {}", row["product_link"])
+                continue
+            with stage(CSV_WRITE):
+                writer.writerow(row)
+                csvfile.flush()
+            page_rows.append(row)
+            logger.info("Scraped: {}", product_name)
+
         except Exception as e:
-            logger.error("Błąd przy sprawdzaniu następnej strony: {}",e)
-            break
+            logger.error("Błąd przy przetwarzaniu produktu: {}", e)
+    # Historia cen zapisywana raz na stronę – ceny i oceny normalizowane całą kolumną (normalize.py)
+    with stage(HISTORY_WRITE):
+        price_history.record_many(shop_name, today_date, page_rows)
+    product_index.commit()
+    logger.info("Wyodrębniono dane ze strony {} w {:.3f} s.", page, time.perf_counter() - started)
 
-        page += 1
 
-driver.quit()
-logger.complete()
-logger.info(f"Zakończono scraping. Dane zapisane w pliku: {csv_filename}")
\ No newline at end of file
+try:
+    with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        csvfile.flush()
+        # Wpis "running" pozwala skryptowi danych technicznych czytać listing w trakcie zapisu (tryb strumieniowy)
+        record_run(shop_name, LISTING, today_date, csv_filename, status="running", rows=0)
+
+        # Pierwsza strona w głównej przeglądarce – przycisk ostatniej strony podaje liczbę stron
+        soup = fetch_page(browser, 1)
+        last_page = 1
+        if soup is not None:
+            try:
+                last_page = int(soup.select_one('div[class="lastpage-button"]').get_text(strip=True))
+                logger.info("Liczba stron: {}", last_page)
+            except Exception as e:
+                logger.error("Błąd przy sprawdzaniu liczby stron: {}", e)
+        save_page(1, soup, writer, csvfile)
+
+        # Strony 2..N pobierane równolegle (listing_pages.py), zapisywane w kolejności stron
+        pages = fan_out_pages(
+            lambda: BrowserManager(geckodriver_path, options), fetch_page, range(2, last_page + 1), reuse=browser
+        )
+        for page, soup in pages:
+            save_page(page, soup, writer, csvfile)
+except Exception:
+    # Przerwany listing nie może zostać najnowszym udanym wynikiem (dane techniczne, run_all.py)
+    record_run(shop_name, LISTING, today_date, csv_filename, status="failed")
+    raise
+else:
+    # Plik CSV jest już zamknięty, więc rejestr przebiegów widzi wszystkie wiersze
+    record_run(shop_name, LISTING, today_date, csv_filename)
+finally:
+    browser.quit()
+    backend.close()
+    price_history.close()
+    product_index.close()
+    log_startup_summary()
+    structured_data.log_summary()
+    log_wait_summary()
+    log_lazy_load_summary()
+    log_rate_summary()
+    finish_run()
+    logger.complete()
+    logger.info(f"Zakończono scraping. Dane zapisane w pliku: {csv_filename}")
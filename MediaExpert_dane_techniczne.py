@@ -1,15 +1,23 @@
-import csv
-import json
-import glob
 import os
-import time
 import gc
 from datetime import datetime
 from loguru import logger
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service
+from selenium.webdriver.support import expected_conditions as EC
+from browser_manager import BrowserManager, log_startup_summary
+from lean_profile import apply_lean_profile
+from driver_pool import DriverPool
+from waits import log_wait_summary, wait_for
+from checkpoint import CheckpointJournal
+from listing_stream import follow_listing, read_listing, stream_enabled
+from run_manifest import TECH_DETAILS, latest_listing_file, record_run
+from tech_cache import TechDetailsCache, write_tech_details
+from spec_store import SpecStore
+from product_index import ProductIndex
+from metrics import ELEMENT_LOOKUP, finish_run, stage, start_run
+from rate_limiter import log_rate_summary
 
 # Konfiguracja folderu output
 output_folder = "output"
@@ -27,97 +35,105 @@ log_format = "{time:YYYY-MM-DD HH:mm:ss,SSS} - {level} - {message}"
 logger.add(log_filename, level="INFO", format="{time} - {level} - {message}", encoding="utf-8")
 logger.add(lambda msg: print(msg, end=""), level="INFO", format=log_format)
 
+# Pomiary czasu etapów (metrics.py) trafiają do przebiegu danych technicznych tego sklepu
+start_run(shop_name, TECH_DETAILS)
 logger.info("Rozpoczęcie skryptu pobierania szczegółów technicznych.")
 logger.info("Plik CSV: {}", csv_filename)
 logger.info("Plik logu: {}", log_filename)
 
-# Wyszukanie najnowszego pliku CSV wygenerowanego przez pierwszy skrypt
-csv_pattern = os.path.join(output_folder, f"{shop_name}_*.csv")
-csv_files = glob.glob(csv_pattern)
-if not csv_files:
-    logger.error("Nie znaleziono plików CSV pasujących do wzorca {}", csv_pattern)
-    exit(1)
-
-# Ponieważ format nazwy pliku to mediaExpert_YYYY-MM-DD.csv, wystarczy wybrać najnowszy plik
-latest_csv_file = max(csv_files)
-logger.info("Wybrany plik CSV: {}", latest_csv_file)
-
-# Wczytanie linków produktów z CSV
-product_data = []
-with open(latest_csv_file, mode="r", encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        if row.get("product_link"):
-            product_data.append({
-                "product_link": row["product_link"],
-            })
-logger.info("Znaleziono {} produktów do przetworzenia.", len(product_data))
+if stream_enabled():
+    # Tryb strumieniowy: linki z listingu, który właśnie trwa (run_all.py --stream)
+    product_data = follow_listing(shop_name, today, output_folder)
+else:
+    # Najnowszy udany listing z rejestru przebiegów (bez przeszukiwania folderu output)
+    latest_csv_file = latest_listing_file(shop_name, output_folder)
+    if not latest_csv_file:
+        logger.error("Nie znaleziono pliku CSV z listingiem sklepu {}", shop_name)
+        exit(1)
+    logger.info("Wybrany plik CSV: {}", latest_csv_file)
+    product_data = read_listing(latest_csv_file)
 
 # Konfiguracja Firefoksa i Geckodrivera
-service = Service("/usr/local/bin/geckodriver")
+geckodriver_path = "/usr/local/bin/geckodriver"
 options = webdriver.FirefoxOptions()
 options.add_argument("--headless")
-driver = webdriver.Firefox(service=service, options=options)
+apply_lean_profile(options, shop_name)
+
+# Liczba stron po których BrowserManager restartuje driver (liczona osobno dla każdego workera)
+restart_interval = 10
+
+pool = DriverPool(lambda: BrowserManager(geckodriver_path, options, restart_interval=restart_interval))
 
-def scrape_tech_details_mediaexpert(url):
+def scrape_tech_details_mediaexpert(worker, item):
     """
     Funkcja otwiera stronę produktu MediaExpert i pobiera dane techniczne z tabeli.
     """
+    url = item["product_link"]
+    logger.info("Przetwarzanie: {}", url)
     tech_details = {}
     try:
-        driver.get(url)
-        time.sleep(2)  # oczekiwanie na załadowanie strony
+        driver = worker.get(url)
+        # Czekamy na tabelę z atrybutami zamiast stałego opóźnienia
+        wait_for(driver, EC.presence_of_element_located((By.CSS_SELECTOR, 'table.list.attributes')),
+                 label="mediaexpert: tabela atrybutów", replaces=2)
 
         # Szukanie tabeli z atrybutami
-        table = driver.find_element(By.CSS_SELECTOR, 'table.list.attributes')
-        rows = table.find_elements(By.TAG_NAME, 'tr')
-        for row in rows:
-            try:
-                th_elements = row.find_elements(By.TAG_NAME, 'th')
-                td_elements = row.find_elements(By.TAG_NAME, 'td')
-                if not th_elements or not td_elements:
-                    continue
-                # Pobieramy nazwę atrybutu i usuwamy zbędne znaki
-                key = th_elements[0].text.replace(":", "").strip()
-                # Pobieramy wartość atrybutu
-                value = td_elements[0].text.strip()
-                tech_details[key] = value
-            except Exception as inner_e:
-                logger.info("Błąd przy przetwarzaniu detalu: {}", inner_e)
+        with stage(ELEMENT_LOOKUP):
+            table = driver.find_element(By.CSS_SELECTOR, 'table.list.attributes')
+            rows = table.find_elements(By.TAG_NAME, 'tr')
+            for row in rows:
+                try:
+                    th_elements = row.find_elements(By.TAG_NAME, 'th')
+                    td_elements = row.find_elements(By.TAG_NAME, 'td')
+                    if not th_elements or not td_elements:
+                        continue
+                    # Pobieramy nazwę atrybutu i usuwamy zbędne znaki
+                    key = th_elements[0].text.replace(":", "").strip()
+                    # Pobieramy wartość atrybutu
+                    value = td_elements[0].text.strip()
+                    tech_details[key] = value
+                except Exception as inner_e:
+                    logger.info("Błąd przy przetwarzaniu detalu: {}", inner_e)
     except Exception as e:
         logger.error("Błąd przy otwieraniu URL {}: {}", url, e)
+
+    # Czyszczenie ciasteczek i wywołanie garbage collectora
+    try:
+        worker.driver.delete_all_cookies()
+    except Exception:
+        pass
+    gc.collect()
     return tech_details
 
 # Przygotowanie pliku wynikowego z danymi technicznymi w folderze output
 tech_csv_filename = os.path.join(output_folder, f"tech_details_{shop_name}_{today}.csv")
 fieldnames = ["product_link", "tech_details"]
 
-# Liczba stron po których restartujemy driver
-restart_interval = 10
-
-with open(tech_csv_filename, mode="w", newline="", encoding="utf-8") as tech_csvfile:
-    writer = csv.DictWriter(tech_csvfile, fieldnames=fieldnames)
-    writer.writeheader()
-    for i, item in enumerate(product_data, start=1):
-        url = item["product_link"]
-        logger.info("Przetwarzanie: {}", url)
-        details = scrape_tech_details_mediaexpert(url)
-        writer.writerow({
-            "product_link": url,
-            "tech_details": json.dumps(details, ensure_ascii=False)
-        })
-
-        # Czyszczenie ciasteczek i wywołanie garbage collectora
-        driver.delete_all_cookies()
-        gc.collect()
-
-        # Restart driver co restart_interval stron
-        if i % restart_interval == 0:
-            logger.info("Restartowanie przeglądarki po {} stronach", i)
-            driver.quit()
-            driver = webdriver.Firefox(service=service, options=options)
-
-# Zamknięcie przeglądarki
-driver.quit()
+# Dziennik postępu pozwala wznowić przerwany przebieg bez ponownego pobierania gotowych produktów
+journal = CheckpointJournal(os.path.join(output_folder, f"checkpoint_tech_details_{shop_name}_{today}.txt"), tech_csv_filename)
+# Ten sam produkt pod różnymi linkami (parametry śledzące, inny identyfikator) pobieramy tylko raz
+product_index = ProductIndex(shop_name, persist=False)
+product_data = product_index.unique(product_data)
+product_data = journal.pending(product_data)
+# Dane techniczne trafiają też do wspólnej bazy ze słownikami atrybutów i wartości (spec_store.py)
+spec_store = SpecStore()
+# Produkty z aktualnym wpisem w pamięci podręcznej nie są ponownie otwierane
+cache = TechDetailsCache(shop_name)
+
+tech_csvfile, writer = journal.open_output(fieldnames)
+with tech_csvfile:
+    # Cache sprawdzany w puli – wyniki z cache i pobrane przychodzą w kolejności z pliku CSV
+    results = pool.imap(cache.through(scrape_tech_details_mediaexpert), product_data)
+    write_tech_details(results, writer, tech_csvfile, journal, cache, spec_store, shop_name, today)
+
+journal.close()
+record_run(shop_name, TECH_DETAILS, today, tech_csv_filename)
+cache.close()
+spec_store.close()
+product_index.close()
+log_startup_summary()
+log_wait_summary()
+log_rate_summary()
+finish_run()
 logger.complete()
 logger.info("Zakończono pobieranie szczegółów technicznych. Dane zapisane w pliku: {}", tech_csv_filename)
\ No newline at end of file
@@ -3,12 +3,19 @@ import csv
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from browser_manager import BrowserManager, log_startup_summary
+from lean_profile import apply_lean_profile
+from structured_data import StructuredDataExtractor
+from price_history import PriceHistory
+from product_index import ProductIndex, product_id_of
+from run_manifest import LISTING, record_run
+from metrics import CSV_WRITE, HISTORY_WRITE, HTML_PARSE, PAGE_SOURCE, WAIT, finish_run, stage, start_run
+from rate_limiter import log_rate_summary
+from replay import record_snapshot
 from bs4 import BeautifulSoup
 from loguru import logger
-import json
 
 # Tworzenie folderu output
 os.makedirs("output", exist_ok=True)
@@ -24,79 +31,105 @@ logger.remove()  # Usuwa domyślne ustawienia
 logger.add(log_filename, level="INFO", format="{time} - {level} - {message}", encoding="utf-8")
 logger.add(lambda msg: print(msg, end=""), level="INFO", format="{time} - {level} - {message}")
 
+# Pomiary czasu etapów (metrics.py) trafiają do przebiegu listingu tego sklepu
+start_run(shop_name, LISTING)
 logger.info("Rozpoczęto scraping.")
 logger.info("Plik CSV: {}", csv_filename)
 logger.info("Plik logu: {}", log_filename)
 
 # Konfiguracja przeglądarki Firefox
 firefox_binary_path = "C:\\Program Files\\Mozilla Firefox\\firefox.exe"
-service = Service("geckodriver.exe")
+geckodriver_path = "geckodriver.exe"
 options = webdriver.FirefoxOptions()
 options.add_argument("--headless")
 options.binary_location = firefox_binary_path
+apply_lean_profile(options, shop_name)
+
+# Nowa przeglądarka dla każdej strony, bo przy ponownym driver.get(url) mediamarkt pokazuje captche
+browser = BrowserManager(geckodriver_path, options, restart_interval=1)
+
+structured_data = StructuredDataExtractor(shop_name)
+price_history = PriceHistory()
+product_index = ProductIndex(shop_name)
 
 # Nagłówki kolumn w pliku CSV
 fieldnames = ["title", "product_link", "price", "num_of_opinions", "rating"]
 
 # Otwarcie pliku CSV do zapisu
-with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
-
-    page = 1
-    while True:
-        # Inicjalizacja nowego webdrivera za każdym razem, bo driver.get(url) nie działa bo mediamarkt ma captche
-        driver = webdriver.Firefox(service=service, options=options)
-
-        url = f"https://mediamarkt.pl/pl/category/smartfony-25983.html?page={page}"
-        logger.info(f"Przetwarzanie strony: {url}")
+try:
+    with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        csvfile.flush()
+        # Wpis "running" pozwala skryptowi danych technicznych czytać listing w trakcie zapisu (tryb strumieniowy)
+        record_run(shop_name, LISTING, today, csv_filename, status="running", rows=0)
 
-        # Otwórz stronę
-        driver.get(url)
-        driver.execute_script("document.body.style.transform = 'scale(0.3)'")
-        try:
-            # Czekaj na załadowanie produktów
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_all_elements_located((By.XPATH, '//div[@data-test="mms-product-card"]'))
-            )
+        page = 1
+        while True:
+            url = f"https://mediamarkt.pl/pl/category/smartfony-25983.html?page={page}"
+            logger.info(f"Przetwarzanie strony: {url}")
 
-            page_source = driver.page_source
-            soup = BeautifulSoup(page_source, "html.parser")
-            json_scripts = soup.find_all('script', type='application/ld+json')
+            # Otwórz stronę
+            driver = browser.get(url)
+            driver.execute_script("document.body.style.transform = 'scale(0.3)'")
+            try:
+                # Czekaj na załadowanie produktów
+                with stage(WAIT):
+                    WebDriverWait(driver, 15).until(
+                        EC.presence_of_all_elements_located((By.XPATH, '//div[@data-test="mms-product-card"]'))
+                    )
 
-            for script in json_scripts:
-                try:
-                    json_data = json.loads(script.string)
-                    
-                    if json_data.get('@type') == 'ItemList':
-                        for item in json_data.get('itemListElement', []):
-                            product = item.get('item', {})
-                            
-                            # Odczytanie danych
-                            name = product.get('name').replace("Smartfon ", "")
-                            price = product.get('offers', {}).get('price')
-                            rating_value = product.get('aggregateRating', {}).get('ratingValue')
-                            review_count = product.get('aggregateRating', {}).get('reviewCount')
-                            url = product.get('url')
-                            
-                            writer.writerow({
-                                "title": name,
-                                "product_link": url,
-                                "price": price,
-                                "num_of_opinions": review_count,
-                                "rating": rating_value,
-                            })
-                            logger.info(f"Zapisano produkt: {name}")
-                except json.JSONDecodeError as e:
-                    logger.error(f"Błąd podczas parsowania JSON: {e}")
-                    continue
-            driver.quit()
-            page += 1
+                # Mediamarkt udostępnia listę produktów jako JSON-LD (ItemList) – wspólny ekstraktor danych strukturalnych
+                with stage(PAGE_SOURCE):
+                    html = driver.page_source
+                # Nagranie (REPLAY_RECORD) po załadowaniu kafelków produktów
+                record_snapshot(driver, html)
+                with stage(HTML_PARSE):
+                    soup = BeautifulSoup(html, "html.parser")
+                page_rows = []
+                for product in structured_data.extract(soup) or []:
+                    # Odczytanie danych
+                    name = product["name"].replace("Smartfon ", "")
 
-        except Exception as e:
-            logger.error(f"Błąd podczas przetwarzania strony {page}: {e}")
-            driver.quit()
-            break
+                    row = {
+                        "title": name,
+                        "product_link": product["url"],
+                        "price": product["price"],
+                        "num_of_opinions": product["review_count"],
+                        "rating": product["rating"],
+                    }
+                    # Ten sam produkt mógł już wystąpić na wcześniejszej stronie lub w innej kategorii (product_index.py)
+                    if not product_index.claim(row["product_link"], product_id_of(product)):
+                        logger.info("Pominięto duplikat: {}", row["product_link"])
+                        continue
+                    with stage(CSV_WRITE):
+                        writer.writerow(row)
+                        csvfile.flush()
+                    page_rows.append(row)
+                    logger.info(f"Zapisano produkt: {name}")
+                # Historia cen zapisywana raz na stronę – ceny i oceny normalizowane całą kolumną (normalize.py)
+                with stage(HISTORY_WRITE):
+                    price_history.record_many(shop_name, today, page_rows)
+                product_index.commit()
+                page += 1
 
-# Zamknij przeglądarkę po zakończeniu
-logger.info("Zakończono scraping.")
\ No newline at end of file
+            except Exception as e:
+                logger.error(f"Błąd podczas przetwarzania strony {page}: {e}")
+                break
+except Exception:
+    # Przerwany listing nie może zostać najnowszym udanym wynikiem (dane techniczne, run_all.py)
+    record_run(shop_name, LISTING, today, csv_filename, status="failed")
+    raise
+else:
+    # Plik CSV jest już zamknięty, więc rejestr przebiegów widzi wszystkie wiersze
+    record_run(shop_name, LISTING, today, csv_filename)
+finally:
+    # Zamknij przeglądarkę po zakończeniu
+    browser.quit()
+    price_history.close()
+    product_index.close()
+    log_startup_summary()
+    structured_data.log_summary()
+    log_rate_summary()
+    finish_run()
+    logger.info("Zakończono scraping.")
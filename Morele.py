@@ -4,12 +4,23 @@ import glob
 from loguru import logger
 import re
 import csv
+import time
 from datetime import datetime
+from urllib.parse import urljoin
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from browser_manager import BrowserManager, log_startup_summary
+from lean_profile import apply_lean_profile
+from fetch_backends import FetchBackend
+from listing_pages import prefetch_pages
+from page_snapshot import take_snapshot
+from structured_data import StructuredDataExtractor
+from price_history import PriceHistory
+from product_index import ProductIndex, product_id_of
+from run_manifest import LISTING, record_run
+from metrics import CSV_WRITE, HISTORY_WRITE, PARSE_PRODUCT, finish_run, stage, start_run
+from rate_limiter import log_rate_summary
+from waits import log_wait_summary
+from lazy_load import log_lazy_load_summary
 
 # Konfiguracja Firefoksa i Geckodrivera
 # Dla osób z windowsem https://github.com/mozilla/geckodriver/releases/download/v0.35.0/geckodriver-v0.35.0-win32.zip
@@ -31,17 +42,30 @@ log_format = "{time:YYYY-MM-DD HH:mm:ss,SSS} - {level} - {message}"
 logger.add(log_filename, level="INFO", format="{time} - {level} - {message}", encoding="utf-8")
 logger.add(lambda msg: print(msg, end=""), level="INFO", format=log_format)
 
+# Pomiary czasu etapów (metrics.py) trafiają do przebiegu listingu tego sklepu
+start_run(shop_name, LISTING)
 logger.info("Rozpoczęto scraping.")
 logger.info("Plik CSV: {}", csv_filename)
 logger.info("Plik logu: {}", log_filename)
 
 
 firefox_binary_path = "C:\\Program Files\\Mozilla Firefox\\firefox.exe"
-service = Service("geckodriver.exe")
+geckodriver_path = "geckodriver.exe"
 options = webdriver.FirefoxOptions()
 options.add_argument("--headless")
 options.binary_location = firefox_binary_path
-driver = webdriver.Firefox(service=service, options=options)
+apply_lean_profile(options, shop_name)
+browser = BrowserManager(geckodriver_path, options)
+structured_data = StructuredDataExtractor(shop_name)
+price_history = PriceHistory()
+product_index = ProductIndex(shop_name)
+# Najpierw zwykłe HTTP, przeglądarka tylko dla stron bez pełnej strony kafelków w HTML (FETCH_BACKEND zmienia tryb);
+# ostatnia strona (bez strzałki do następnej) może mieć mniej produktów
+backend = FetchBackend(
+    shop_name,
+    required=(('div[class="cat-product card"]', 20),),
+    next_page='a[class="pagination-btn"]:has(> i[class="icon-arrow-right"])',
+)
 
 
 
@@ -49,93 +73,181 @@ driver = webdriver.Firefox(service=service, options=options)
 fieldnames = ["title", "product_link", "price", "num_of_opinions", "rating", "additional_info"] 
 
 
-with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
-
-    page = 1
-    while True:
-        # Ustalanie URL: dla pierwszej strony używamy podstawowego adresu, a kolejne strony mają parametr ?p=
-        if page == 1:
-            url = "https://www.morele.net/kategoria/smartfony-280/"
-        else:
-            url = f"https://www.morele.net/kategoria/smartfony-280/,,,,,,,,0,,,,/{page}/"
-        print(f"Scraping strony {page}: {url}")
-
-        driver.get(url)
-        products = driver.find_elements(By.XPATH,
-                                        '//div[@class="cat-product card"]')
-
-        if not products:
-            logger.info("Brak produktów na stronie, kończę scraping.")
-            break
-
-        # Iteracja po produktach na stronie
-        for product in products:
-            try:
-                # Pobranie tytułu oraz linku produktu
-                link_element = product.find_element(By.XPATH, './/a[@class="productLink"]')
-                title = link_element.get_attribute("title")
-                product_link = link_element.get_attribute("href")
-                title = title.replace("Smartfon", "").strip()  # Obcięcie słowa "smartfon" z nazwy
-                przed_gb, po_gb = (re.split(r'GB\s*', title, maxsplit=1) + [""])[:2]
-                lista_po_gb = po_gb.split()
-                lista_po_gb = [x for x in lista_po_gb if x!= "-"]
-
-                # Pobranie ceny
-                try:
-                    price_element = WebDriverWait(product, 1).until(
-                        EC.presence_of_element_located((By.XPATH, './/div[@class="price-new"]'))
-                    )
-                    price = price_element.text.strip()
-                    price = re.sub(r'[^\d,]', '', price)
-                    price = price.replace(',', '.')
-                    price = float(price)
-                except:
-                    price = 0
-                    logger.info(f"Nie wykryto ceny dla: {title}")
+def split_title(title):
+    """
+    Funkcja obcina słowo "Smartfon" z nazwy i dzieli ją na część przed "GB" oraz listę dodatkowych informacji.
+    """
+    title = title.replace("Smartfon", "").strip()  # Obcięcie słowa "smartfon" z nazwy
+    przed_gb, po_gb = (re.split(r'GB\s*', title, maxsplit=1) + [""])[:2]
+    lista_po_gb = po_gb.split()
+    lista_po_gb = [x for x in lista_po_gb if x!= "-"]
+    return title, przed_gb, lista_po_gb
+
+
+def parse_product(product, page_url):
+    """
+    Funkcja odczytuje dane jednego produktu ze zrzutu strony (BeautifulSoup) i zwraca wiersz CSV.
+    """
+    # Pobranie tytułu oraz linku produktu
+    link_element = product.select_one('a[class="productLink"]')
+    product_link = urljoin(page_url, link_element["href"])
+    title, przed_gb, lista_po_gb = split_title(link_element.get("title"))
+
+    # Pobranie ceny
+    try:
+        price = product.select_one('div[class="price-new"]').get_text(strip=True)
+        price = re.sub(r'[^\d,]', '', price)
+        price = price.replace(',', '.')
+        price = float(price)
+    except:
+        price = 0
+        logger.info(f"Nie wykryto ceny dla: {title}")
+
+    try:
+        num_of_opinions = product.select_one('span[class="rating-count"]').get_text(strip=True)
+        match = re.search(r"\d+", num_of_opinions)
+        num_of_opinions = int(match.group()) if match else 0
+    except:
+        num_of_opinions = 0
+        logger.info(f"Nie wykryto liczby opinii dla: {title}")
+
+    try:
+        rating = product.select_one('input[type="radio"][checked]')["value"]
+    except:
+        rating = 0
+        logger.info(f"Nie wykryto oceny dla: {title}")
+
+    return {
+        "title": przed_gb,
+        "product_link": product_link,
+        "price": price,
+        "num_of_opinions": num_of_opinions,
+        "rating": rating,
+        "additional_info": lista_po_gb,
+    }
+
+
+def row_from_structured(item, page_url):
+    """
+    Funkcja zamienia produkt z danych strukturalnych na wiersz CSV w formacie parse_product.
+    """
+    _, przed_gb, lista_po_gb = split_title(item["name"])
+    return {
+        "title": przed_gb,
+        "product_link": urljoin(page_url, item["url"]),
+        "price": item["price"] or 0,
+        "num_of_opinions": item["review_count"] or 0,
+        "rating": item["rating"] or 0,
+        "additional_info": lista_po_gb,
+    }
+
+
+def page_url(page):
+    # Dla pierwszej strony używamy podstawowego adresu, a kolejne strony mają numer w ścieżce
+    if page == 1:
+        return "https://www.morele.net/kategoria/smartfony-280/"
+    return f"https://www.morele.net/kategoria/smartfony-280/,,,,,,,,0,,,,/{page}/"
+
+
+def browser_page(worker, url, page):
+    """
+    Funkcja otwiera stronę listingu w przeglądarce workera i zwraca zrzut strony po doczytaniu leniwej zawartości.
+    """
+    driver = worker.get(url)
+    return take_snapshot(driver, item_selector='div[class="cat-product card"]', label="morele")
+
+
+def fetch_page(worker, page):
+    """
+    Funkcja zwraca zrzut strony listingu z HTML pobranego przez HTTP, a gdy brakuje w nim kafelków produktów –
+    z przeglądarki workera (fetch_backends.py; przeglądarka startuje dopiero przy pierwszej takiej stronie).
+    """
+    url = page_url(page)
+    logger.info("Scraping strony {}: {}", page, url)
+    return backend.fetch(url, lambda: browser_page(worker, url, page))
+
+
+try:
+    with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        csvfile.flush()
+        # Wpis "running" pozwala skryptowi danych technicznych czytać listing w trakcie zapisu (tryb strumieniowy)
+        record_run(shop_name, LISTING, today, csv_filename, status="running", rows=0)
+
+        # Liczba stron nie jest znana z góry – kolejna strona pobiera się w drugiej przeglądarce,
+        # zanim skończymy przetwarzać bieżącą (listing_pages.py)
+        pages = prefetch_pages(lambda: BrowserManager(geckodriver_path, options), fetch_page, reuse=browser)
+        for page, soup in pages:
+            url = page_url(page)
+            started = time.perf_counter()
+            products = soup.select('div[class="cat-product card"]') if soup is not None else []
+
+            if not products:
+                logger.info("Brak produktów na stronie, kończę scraping.")
+                break
 
-                try:
-                    num_of_opinions = product.find_element(By.XPATH, './/span[@class="rating-count"]').text
-                    match = re.search(r"\d+", num_of_opinions)
-                    num_of_opinions = int(match.group()) if match else 0
-                except:
-                    num_of_opinions = 0
-                    logger.info(f"Nie wykryto liczby opinii dla: {title}")
+            # Dane strukturalne (JSON-LD itp.) mają pierwszeństwo, jeśli obejmują wszystkie produkty ze strony
+            structured = structured_data.extract(soup, expected=len(products))
+            if structured:
+                parse, items = row_from_structured, structured
+            else:
+                parse, items = parse_product, products
 
+            # Iteracja po produktach na stronie
+            page_rows = []
+            for item in items:
                 try:
-                    rating = product.find_element(By.XPATH,'.//input[@type="radio" and @checked="checked"]').get_attribute("value")
-                except:
-                    rating = 0
-                    logger.info(f"Nie wykryto oceny dla: {title}")
-
-                # Zapis do pliku CSV
-                writer.writerow({
-                    "title": przed_gb,
-                    "product_link": product_link,
-                    "price": price,
-                    "num_of_opinions": num_of_opinions,
-                    "rating": rating,
-                    "additional_info": lista_po_gb,
-                })
-                logger.info("Scraped: {}", title)
+                    # Zapis do pliku CSV
+                    with stage(PARSE_PRODUCT):
+                        row = parse(item, url)
+                    # Ten sam produkt mógł już wystąpić na wcześniejszej stronie lub w innej kategorii (product_index.py)
+                    if not product_index.claim(row["product_link"], product_id_of(item)):
+                        logger.info("Pominięto duplikat: {}", row["product_link"])
+                        continue
+                    with stage(CSV_WRITE):
+                        writer.writerow(row)
+                        csvfile.flush()
+                    page_rows.append(row)
+                    logger.info("Scraped: {}", row["title"])
             
+                except Exception as e:
+                    logger.error(f"Błąd podczas przetwarzania produktu: {str(e)}")
+            # Historia cen zapisywana raz na stronę – ceny i oceny normalizowane całą kolumną (normalize.py)
+            with stage(HISTORY_WRITE):
+                price_history.record_many(shop_name, today, page_rows)
+            product_index.commit()
+            logger.info("Wyodrębniono dane ze strony {} w {:.3f} s.", page, time.perf_counter() - started)
+
+            # Sprawdzenie, czy przycisk „nawiguj do następnej strony” jest dostępny
+            try:
+                next_arrow = soup.select('a[class="pagination-btn"]:has(> i[class="icon-arrow-right"])')
+
+                if not next_arrow:
+                    logger.info("Brak przycisku 'następna strona' – zakończono scraping.")
+                    break
             except Exception as e:
-                logger.error(f"Błąd podczas przetwarzania produktu: {str(e)}")
-    
-        # Sprawdzenie, czy przycisk „nawiguj do następnej strony” jest dostępny
-        try:
-            next_arrow = driver.find_elements(By.XPATH, '//a[@class="pagination-btn" and i[@class="icon-arrow-right"]]')
-
-            if not next_arrow:
-                logger.info("Brak przycisku 'następna strona' – zakończono scraping.")
+                logger.error("Błąd przy sprawdzaniu następnej strony: {}", e)
                 break
-        except Exception as e:
-            logger.error("Błąd przy sprawdzaniu następnej strony: {}", e)
-            break
-
-        page += 1
-
-driver.quit()
-logger.complete()
-logger.info("Zakończono scraping. Dane zapisane w pliku: {}",csv_filename)
\ No newline at end of file
+        # Zamyka pulę – strona pobrana na zapas za ostatnią nie jest już potrzebna
+        pages.close()
+except Exception:
+    # Przerwany listing nie może zostać najnowszym udanym wynikiem (dane techniczne, run_all.py)
+    record_run(shop_name, LISTING, today, csv_filename, status="failed")
+    raise
+else:
+    # Plik CSV jest już zamknięty, więc rejestr przebiegów widzi wszystkie wiersze
+    record_run(shop_name, LISTING, today, csv_filename)
+finally:
+    browser.quit()
+    backend.close()
+    price_history.close()
+    product_index.close()
+    log_startup_summary()
+    structured_data.log_summary()
+    log_wait_summary()
+    log_lazy_load_summary()
+    log_rate_summary()
+    finish_run()
+    logger.complete()
+    logger.info("Zakończono scraping. Dane zapisane w pliku: {}",csv_filename)
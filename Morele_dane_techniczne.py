@@ -1,14 +1,21 @@
 # Biblioteki
 import os
-import glob
 from loguru import logger
-import json
 import time
-import csv
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service
+from browser_manager import BrowserManager, log_startup_summary
+from lean_profile import apply_lean_profile
+from driver_pool import DriverPool
+from checkpoint import CheckpointJournal
+from listing_stream import follow_listing, read_listing, stream_enabled
+from run_manifest import TECH_DETAILS, latest_listing_file, record_run
+from tech_cache import TechDetailsCache, write_tech_details
+from spec_store import SpecStore
+from product_index import ProductIndex
+from metrics import ELEMENT_LOOKUP, finish_run, stage, start_run
+from rate_limiter import log_rate_summary
 
 # Konfiguracja Firefoksa i Geckodrivera
 # Dla osób z windowsem https://github.com/mozilla/geckodriver/releases/download/v0.35.0/geckodriver-v0.35.0-win32.zip
@@ -28,77 +35,64 @@ log_format = "{time:YYYY-MM-DD HH:mm:ss,SSS} - {level} - {message}"
 logger.add(log_filename, level="INFO", format="{time} - {level} - {message}", encoding="utf-8")
 logger.add(lambda msg: print(msg, end=""), level="INFO", format=log_format)
 
+# Pomiary czasu etapów (metrics.py) trafiają do przebiegu danych technicznych tego sklepu
+start_run(shop_name, TECH_DETAILS)
 logger.info("Rozpoczęto scraping.")
 logger.info("Plik CSV: {}", csv_filename)
 logger.info("Plik logu: {}", log_filename)
 
-csv_pattern = os.path.join(output_folder, f"{shop_name}_*.csv")
-csv_files = glob.glob(csv_pattern)
-if not csv_files:
-    logger.error("Nie znaleziono plików CSV pasujących do wzorca {}", csv_pattern)
-    exit(1)
-
-def extract_date(filename):
-    base = os.path.basename(filename)
-    date_str = base.replace(f"{shop_name}_","").replace(".csv","")
-    try:
-        return datetime.strptime(date_str, "%Y-%m-%d")
-    except ValueError:
-        return None
-csv_files_with_date = [(file, extract_date(file)) for file in csv_files if extract_date(file) is not None]
-if not csv_files_with_date:
-    logger.error("Żaden z plików CSV nie ma poprawnego formatu daty.")
-    exit(1)
-csv_files_with_date.sort(key=lambda x: x[1], reverse=True)
-latest_csv_file = csv_files_with_date[0][0]
-logger.info("Wybrany plik CSV: {}", latest_csv_file)
-
-product_data = []
-with open(latest_csv_file, mode="r", encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        if row.get("product_link"):
-            product_data.append({
-                "product_link": row["product_link"],
-                })
-logger.info("Znaleziono {} produktów do przetworzenia.", len(product_data))
+if stream_enabled():
+    # Tryb strumieniowy: linki z listingu, który właśnie trwa (run_all.py --stream)
+    product_data = follow_listing(shop_name, today, output_folder)
+else:
+    # Najnowszy udany listing z rejestru przebiegów (bez przeszukiwania folderu output)
+    latest_csv_file = latest_listing_file(shop_name, output_folder)
+    if not latest_csv_file:
+        logger.error("Nie znaleziono pliku CSV z listingiem sklepu {}", shop_name)
+        exit(1)
+    logger.info("Wybrany plik CSV: {}", latest_csv_file)
+    product_data = read_listing(latest_csv_file)
 
 firefox_binary_path = "C:\\Program Files\\Mozilla Firefox\\firefox.exe"
-service = Service("geckodriver.exe")
+geckodriver_path = "geckodriver.exe"
 options = webdriver.FirefoxOptions()
 options.add_argument("--headless")
 options.binary_location = firefox_binary_path
-driver = webdriver.Firefox(service=service, options=options)
+apply_lean_profile(options, shop_name)
+pool = DriverPool(lambda: BrowserManager(geckodriver_path, options))
 
-def scrape_tech_details(url):
+def scrape_tech_details(worker, item):
+    url = item["product_link"]
+    logger.info("Przetwarzanie: {}", url)
     tech_details = {}
     tech_details2 = {}
     try:
-        driver.get(url)
+        driver = worker.get(url)
         # time.sleep(2) może się przyda, może nie
-        attributes_container = driver.find_element(By.CSS_SELECTOR, '#specification')
-        expert_recom = attributes_container.find_element(By.CSS_SELECTOR, 'div > div.product-specification__wrapper > div.expert-table.c-label-description--orange > ul')
-        data_phone = expert_recom.find_elements(By.XPATH, './/li')
+        with stage(ELEMENT_LOOKUP):
+            attributes_container = driver.find_element(By.CSS_SELECTOR, '#specification')
+            expert_recom = attributes_container.find_element(By.CSS_SELECTOR, 'div > div.product-specification__wrapper > div.expert-table.c-label-description--orange > ul')
+            data_phone = expert_recom.find_elements(By.XPATH, './/li')
 
 
-        tech_data = []
-        for i in data_phone:
-            tech_data.append(i.text.strip())
+            tech_data = []
+            for i in data_phone:
+                tech_data.append(i.text.strip())
 
-        tech_details = {item.split("\n", 1)[0]: item.split("\n", 1)[1] for item in tech_data}
-        tech_data.clear()
+            tech_details = {item.split("\n", 1)[0]: item.split("\n", 1)[1] for item in tech_data}
+            tech_data.clear()
         
-        spec_table = attributes_container.find_element(By.CSS_SELECTOR,'div > div.product-specification__wrapper > div.product-specification__table')
-        data_phone = spec_table.find_elements(By.XPATH,'.//div[@class="group__specification"]')
+            spec_table = attributes_container.find_element(By.CSS_SELECTOR,'div > div.product-specification__wrapper > div.product-specification__table')
+            data_phone = spec_table.find_elements(By.XPATH,'.//div[@class="group__specification"]')
 
-        for j in data_phone:
-            tech_data.append(j.text.strip())
+            for j in data_phone:
+                tech_data.append(j.text.strip())
             
-        for item in tech_data:  # Iterujemy po elementach listy
-            text = item.split('\n')  # Rozdzielamy na klucze i wartości
-            for j in range(0, len(text) - 1, 2):  # Przechodzimy co dwa elementy
-                tech_details2[text[j]] = text[j + 1]  # Dodajemy do słownika
-        tech_details.update(tech_details2)
+            for item in tech_data:  # Iterujemy po elementach listy
+                text = item.split('\n')  # Rozdzielamy na klucze i wartości
+                for j in range(0, len(text) - 1, 2):  # Przechodzimy co dwa elementy
+                    tech_details2[text[j]] = text[j + 1]  # Dodajemy do słownika
+            tech_details.update(tech_details2)
     except Exception as e:
             logger.error("Błąd przy otwieraniu URL {}: {}", url, e)
     return tech_details
@@ -106,18 +100,30 @@ def scrape_tech_details(url):
 tech_csv_filename = os.path.join(output_folder, f"tech_details_{shop_name}_{today}.csv")
 fieldnames = ["product_link", "tech_details"]
 
-with open(tech_csv_filename, mode="w", newline="", encoding="utf-8") as tech_csvfile:
-    writer = csv.DictWriter(tech_csvfile, fieldnames=fieldnames)
-    writer.writeheader()
-    for item in product_data:
-        url = item["product_link"]
-        logger.info("Przetwarzanie: {}", url)
-        details = scrape_tech_details(url)
-        writer.writerow({
-            "product_link": url,
-            "tech_details": json.dumps(details, ensure_ascii=False)
-        })
-
-driver.quit()
+# Dziennik postępu pozwala wznowić przerwany przebieg bez ponownego pobierania gotowych produktów
+journal = CheckpointJournal(os.path.join(output_folder, f"checkpoint_tech_details_{shop_name}_{today}.txt"), tech_csv_filename)
+# Ten sam produkt pod różnymi linkami (parametry śledzące, inny identyfikator) pobieramy tylko raz
+product_index = ProductIndex(shop_name, persist=False)
+product_data = product_index.unique(product_data)
+product_data = journal.pending(product_data)
+# Dane techniczne trafiają też do wspólnej bazy ze słownikami atrybutów i wartości (spec_store.py)
+spec_store = SpecStore()
+# Produkty z aktualnym wpisem w pamięci podręcznej nie są ponownie otwierane
+cache = TechDetailsCache(shop_name)
+
+tech_csvfile, writer = journal.open_output(fieldnames)
+with tech_csvfile:
+    # Cache sprawdzany w puli – wyniki z cache i pobrane przychodzą w kolejności z pliku CSV
+    results = pool.imap(cache.through(scrape_tech_details), product_data)
+    write_tech_details(results, writer, tech_csvfile, journal, cache, spec_store, shop_name, today)
+
+journal.close()
+record_run(shop_name, TECH_DETAILS, today, tech_csv_filename)
+cache.close()
+spec_store.close()
+product_index.close()
+log_startup_summary()
+log_rate_summary()
+finish_run()
 logger.complete()
 logger.info("Zakończono pobieranie szczegółów technicznych. Dane zapisane w pliku: {}", tech_csv_filename)
\ No newline at end of file
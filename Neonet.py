@@ -4,10 +4,22 @@ import time
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from urllib.parse import urljoin
+from browser_manager import BrowserManager, log_startup_summary
+from lean_profile import apply_lean_profile
+from fetch_backends import FetchBackend
+from listing_pages import fan_out_pages
+from page_snapshot import take_snapshot, text_of
+from structured_data import StructuredDataExtractor
+from price_history import PriceHistory
+from product_index import ProductIndex, product_id_of
+from run_manifest import LISTING, record_run
+from metrics import CSV_WRITE, HISTORY_WRITE, PARSE_PRODUCT, WAIT, finish_run, stage, start_run
+from rate_limiter import log_rate_summary
+from waits import log_wait_summary
+from lazy_load import log_lazy_load_summary
 from loguru import logger
 
 # Utworzenie folderu output, jeśli nie istnieje
@@ -25,124 +37,224 @@ log_format = "{time:YYYY-MM-DD HH:mm:ss,SSS} - {level} - {message}"
 logger.add(log_filename, level="INFO", format="{time} - {level} - {message}", encoding="utf-8")
 logger.add(lambda msg: print(msg, end=""), level="INFO", format=log_format)
 
+# Pomiary czasu etapów (metrics.py) trafiają do przebiegu listingu tego sklepu
+start_run(shop_name, LISTING)
 logger.info("Rozpoczęto scraping.")
 logger.info("Plik CSV: {}", csv_filename)
 logger.info("Plik logu: {}", log_filename)
 
 # Konfiguracja Firefoksa i Geckodrivera
 firefox_binary_path = "C:\\Program Files\\Mozilla Firefox\\firefox.exe"
-service = Service("geckodriver.exe")
+geckodriver_path = "geckodriver.exe"
 options = webdriver.FirefoxOptions()
 options.add_argument("--headless")
 options.binary_location = firefox_binary_path
-driver = webdriver.Firefox(service=service, options=options)
+apply_lean_profile(options, shop_name)
+browser = BrowserManager(geckodriver_path, options)
 
-with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
-    fieldnames = ["title", "product_link", "price", "image_url", "reviews"]
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
+structured_data = StructuredDataExtractor(shop_name)
+price_history = PriceHistory()
+product_index = ProductIndex(shop_name)
 
-    base_url = "https://www.neonet.pl/smartfony-i-navi/smartfony.html"
+base_url = "https://www.neonet.pl/smartfony-i-navi/smartfony.html"
+PRODUCT_SELECTOR = "section[data-neonet-product-id]"
+PAGINATION_SELECTOR = "section.listingPaginationScss-paginationSection-1VV input[type='number']"
+# Najpierw zwykłe HTTP, przeglądarka tylko dla stron bez pełnej strony kafelków w HTML (FETCH_BACKEND zmienia tryb)
+backend = FetchBackend(shop_name, required=((PRODUCT_SELECTOR, 20),))
+
+
+def parse_product(product, page_url):
+    """
+    Funkcja odczytuje dane jednego produktu ze zrzutu strony (BeautifulSoup) i zwraca wiersz CSV.
+    """
+    title_element = product.select_one('h2[class*="listingItemHeaderScss-name"]')
+    title = text_of(title_element)
+    link_element = title_element.find_parent("a")
+    product_link = urljoin(page_url, link_element["href"])
+    price = text_of(product, 'span[data-marker="UIPriceSimple"]')
+    if price is None:
+        raise ValueError(f"brak ceny dla produktu '{title}'")
+
+    img_element = product.find("img")
+    if img_element is not None and img_element.get("src"):
+        image_url = urljoin(page_url, img_element["src"])
+    else:
+        image_url = ""
+        logger.info("Brak obrazka dla produktu '{}'.", title)
 
-    # Pobieramy maksymalną liczbę stron z paginacji
-    driver.get(base_url)
     try:
-        pagination_input = WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located(
-                (By.CSS_SELECTOR, "section.listingPaginationScss-paginationSection-1VV input[type='number']")
-            )
-        )
-        max_page = int(pagination_input.get_attribute("max"))
-        logger.info("Maksymalna liczba stron: {}", max_page)
+        review_section = product.select_one("section.ratingStarsScss-wrapper-1mq")
+        rating_span = review_section.select_one("span.ratingStarsScss-rating-3xe")
+        style_attr = rating_span.get("style")  # np. "width: 100%;"
+        rating_percent = style_attr.split("width:")[1].split("%")[0].strip()
+        rating_value = round(float(rating_percent) / 20, 1)
+        review_count_text = text_of(review_section, "span.ratingStarsScss-count-1T-")
+        review_count = review_count_text.strip("()")
+        reviews = f"{rating_value}/5 ({review_count} opinii)"
     except Exception as e:
-        logger.error("Nie udało się pobrać maksymalnej liczby stron: {}", e)
-        max_page = 1
+        reviews = ""
+        logger.info("Brak opinii dla produktu '{}'.", title)
 
-    page = 1
-    while page <= max_page:
-        url = base_url if page == 1 else f"{base_url}?p={page}"
-        logger.info("Scraping strony {}: {}", page, url)
-        driver.get(url)
+    return {
+        "title": title,
+        "product_link": product_link,
+        "price": price,
+        "image_url": image_url,
+        "reviews": reviews,
+    }
 
-        # czekamy na pojawienie się przynajmniej jednego produktu
-        try:
+
+def row_from_structured(item, page_url):
+    """
+    Funkcja zamienia produkt z danych strukturalnych na wiersz CSV w formacie parse_product.
+    """
+    reviews = ""
+    if item["rating"] is not None:
+        reviews = f"{item['rating']}/5 ({item['review_count'] or 0} opinii)"
+    return {
+        "title": item["name"],
+        "product_link": urljoin(page_url, item["url"]),
+        "price": f"{item['price']:.2f} zł" if item["price"] is not None else None,
+        "image_url": urljoin(page_url, item["image"]) if item["image"] else "",
+        "reviews": reviews,
+    }
+
+
+def page_url(page):
+    return base_url if page == 1 else f"{base_url}?p={page}"
+
+
+def browser_page(worker, url, page):
+    """
+    Funkcja otwiera stronę listingu w przeglądarce workera, doczytuje produkty i zwraca zrzut strony (BeautifulSoup).
+    """
+    driver = worker.get(url)
+
+    # czekamy na pojawienie się przynajmniej jednego produktu
+    try:
+        with stage(WAIT):
             WebDriverWait(driver, 5).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "section[data-neonet-product-id]"))
             )
+    except Exception as e:
+        logger.error("Produkty nie załadowały się na stronie {}: {}", page, e)
+
+    # Na pierwszej stronie potrzebna jest też paginacja, z której odczytujemy liczbę stron
+    if page == 1:
+        try:
+            with stage(WAIT):
+                WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, PAGINATION_SELECTOR)))
         except Exception as e:
-            logger.error("Produkty nie załadowały się na stronie {}: {}", page, e)
+            logger.error("Nie znaleziono paginacji: {}", e)
+
+    # Przewijanie ekran po ekranie, aż liczba produktów przestanie rosnąć (lazy_load.py), potem jeden zrzut strony
+    return take_snapshot(driver, item_selector="section[data-neonet-product-id]", label="neonet")
+
+
+def fetch_page(worker, page):
+    """
+    Funkcja zwraca zrzut strony listingu z HTML pobranego przez HTTP, a gdy brakuje w nim kafelków produktów –
+    z przeglądarki workera (fetch_backends.py; przeglądarka startuje dopiero przy pierwszej takiej stronie).
+    """
+    url = page_url(page)
+    logger.info("Scraping strony {}: {}", page, url)
+    if page == 1:
+        required = backend.required + (PAGINATION_SELECTOR,)
+    elif page == max_page:
+        # Ostatnia strona ma zwykle mniej niż 20 produktów
+        required = backend.last_page_required()
+    else:
+        required = None
+    return backend.fetch(url, lambda: browser_page(worker, url, page), required)
+
+
+def save_page(page, soup, writer, csvfile):
+    """
+    Funkcja zapisuje produkty z jednego zrzutu strony do CSV i historii cen.
+    """
+    url = page_url(page)
+    started = time.perf_counter()
+    products = soup.select(PRODUCT_SELECTOR) if soup is not None else []
+    if not products:
+        logger.info("Brak produktów na stronie {}, przechodzę do kolejnej.", page)
+        return
 
-        # Szybsze scrollowanie – skracamy opóźnienia do 0.5 sekundy
+    # Dane strukturalne (JSON-LD itp.) mają pierwszeństwo, jeśli obejmują wszystkie produkty ze strony
+    structured = structured_data.extract(soup, expected=len(products))
+    if structured:
+        parse, items = row_from_structured, structured
+    else:
+        parse, items = parse_product, products
+
+    # Iteracja po produktach
+    page_rows = []
+    for item in items:
         try:
-            body = driver.find_element(By.TAG_NAME, "body")
-            for _ in range(2):
-                body.send_keys(Keys.END)
-                time.sleep(0.5)
-                body.send_keys(Keys.HOME)
-                time.sleep(0.5)
-            body.send_keys(Keys.END)
-            time.sleep(0.5)
+            with stage(PARSE_PRODUCT):
+                row = parse(item, url)
+            if row["price"] is None:
+                raise ValueError(f"brak ceny dla produktu '{row['title']}'")
+            # Ten sam produkt mógł już wystąpić na wcześniejszej stronie lub w innej kategorii (product_index.py)
+            if not product_index.claim(row["product_link"], product_id_of(item, "data-neonet-product-id")):
+                logger.info("Pominięto duplikat: {}", row["product_link"])
+                continue
+            with stage(CSV_WRITE):
+                writer.writerow(row)
+                csvfile.flush()
+            page_rows.append(row)
+            logger.info("Scraped: {}", row["title"])
         except Exception as e:
-            logger.error("Błąd podczas wysyłania klawiszy END/HOME: {}", e)
+            logger.error("Błąd przy przetwarzaniu produktu: {}", e)
+    # Historia cen zapisywana raz na stronę – ceny i oceny normalizowane całą kolumną (normalize.py)
+    with stage(HISTORY_WRITE):
+        price_history.record_many(shop_name, today, page_rows)
+    product_index.commit()
+    logger.info("Wyodrębniono dane ze strony {} w {:.3f} s.", page, time.perf_counter() - started)
+
 
-        # Czekamy do 5 sekund, aż załadują się przynajmniej 20 produktów
+try:
+    with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
+        fieldnames = ["title", "product_link", "price", "image_url", "reviews"]
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        csvfile.flush()
+        # Wpis "running" pozwala skryptowi danych technicznych czytać listing w trakcie zapisu (tryb strumieniowy)
+        record_run(shop_name, LISTING, today, csv_filename, status="running", rows=0)
+
+        # Pierwsza strona w głównej przeglądarce – z jej paginacji odczytujemy maksymalną liczbę stron
+        max_page = None
+        soup = fetch_page(browser, 1)
         try:
-            WebDriverWait(driver, 5).until(
-                lambda d: len(d.find_elements(By.CSS_SELECTOR, "section[data-neonet-product-id]")) >= 20
-            )
+            max_page = int(soup.select_one(PAGINATION_SELECTOR)["max"])
+            logger.info("Maksymalna liczba stron: {}", max_page)
         except Exception as e:
-            logger.info("Nie udało się załadować pełnej liczby produktów, pobieram to co jest dostępne.")
-
-        products = driver.find_elements(By.CSS_SELECTOR, "section[data-neonet-product-id]")
-        if not products:
-            logger.info("Brak produktów na stronie, przechodzę do kolejnej.")
-            page += 1
-            continue
-
-        # Iteracja po produktach
-        for product in products:
-            try:
-                title_element = product.find_element(By.XPATH, './/h2[contains(@class, "listingItemHeaderScss-name")]')
-                title = title_element.text.strip()
-                link_element = title_element.find_element(By.XPATH, "./ancestor::a")
-                product_link = link_element.get_attribute("href")
-                price_element = product.find_element(By.XPATH, './/span[@data-marker="UIPriceSimple"]')
-                price = price_element.text.strip()
-
-                try:
-                    img_element = product.find_element(By.XPATH, './/img')
-                    image_url = img_element.get_attribute("src")
-                except Exception as e:
-                    image_url = ""
-                    logger.info("Brak obrazka dla produktu '{}'.", title)
-
-                try:
-                    review_section = product.find_element(By.CSS_SELECTOR, "section.ratingStarsScss-wrapper-1mq")
-                    rating_span = review_section.find_element(By.CSS_SELECTOR, "span.ratingStarsScss-rating-3xe")
-                    style_attr = rating_span.get_attribute("style")  # np. "width: 100%;"
-                    rating_percent = style_attr.split("width:")[1].split("%")[0].strip()
-                    rating_value = round(float(rating_percent) / 20, 1)
-                    count_span = review_section.find_element(By.CSS_SELECTOR, "span.ratingStarsScss-count-1T-")
-                    review_count_text = count_span.text.strip()
-                    review_count = review_count_text.strip("()")
-                    reviews = f"{rating_value}/5 ({review_count} opinii)"
-                except Exception as e:
-                    reviews = ""
-                    logger.info("Brak opinii dla produktu '{}'.", title)
-
-                writer.writerow({
-                    "title": title,
-                    "product_link": product_link,
-                    "price": price,
-                    "image_url": image_url,
-                    "reviews": reviews,
-                })
-                logger.info("Scraped: {}", title)
-            except Exception as e:
-                logger.error("Błąd przy przetwarzaniu produktu: {}", e)
-
-        page += 1
-
-driver.quit()
-logger.info("Zakończono scraping. Dane zapisane w pliku: {}", csv_filename)
-logger.complete()
+            logger.error("Nie udało się pobrać maksymalnej liczby stron: {}", e)
+            max_page = 1
+        save_page(1, soup, writer, csvfile)
+
+        # Strony 2..N pobierane równolegle (listing_pages.py), zapisywane w kolejności stron
+        pages = fan_out_pages(
+            lambda: BrowserManager(geckodriver_path, options), fetch_page, range(2, max_page + 1), reuse=browser
+        )
+        for page, soup in pages:
+            save_page(page, soup, writer, csvfile)
+except Exception:
+    # Przerwany listing nie może zostać najnowszym udanym wynikiem (dane techniczne, run_all.py)
+    record_run(shop_name, LISTING, today, csv_filename, status="failed")
+    raise
+else:
+    # Plik CSV jest już zamknięty, więc rejestr przebiegów widzi wszystkie wiersze
+    record_run(shop_name, LISTING, today, csv_filename)
+finally:
+    browser.quit()
+    backend.close()
+    price_history.close()
+    product_index.close()
+    log_startup_summary()
+    structured_data.log_summary()
+    log_wait_summary()
+    log_lazy_load_summary()
+    log_rate_summary()
+    finish_run()
+    logger.info("Zakończono scraping. Dane zapisane w pliku: {}", csv_filename)
+    logger.complete()
@@ -1,15 +1,29 @@
 import os
 import csv
+import time
 from datetime import datetime
+from urllib.parse import urljoin
 
 from loguru import logger
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
+from browser_manager import BrowserManager, log_startup_summary
+from lean_profile import apply_lean_profile
+from fetch_backends import FetchBackend
+from listing_pages import prefetch_pages
+from page_snapshot import take_snapshot, text_of
+from structured_data import StructuredDataExtractor
+from price_history import PriceHistory
+from product_index import ProductIndex, product_id_of
+from run_manifest import LISTING, record_run
+from metrics import CSV_WRITE, HISTORY_WRITE, PARSE_PRODUCT, WAIT, finish_run, stage, start_run
+from rate_limiter import log_rate_summary
+from waits import log_wait_summary
+from lazy_load import log_lazy_load_summary
 
 # Konfiguracja folderu output
 output_folder = "output"
@@ -29,99 +43,196 @@ logger.add(log_filename, level="INFO", format="{time} - {level} - {message}", en
 logger.add(lambda msg: print(msg, end=""), level="INFO", format=log_format)
 
 # Konfiguracja Firefoksa i Geckodrivera
-service = Service("geckodriver.exe")
+geckodriver_path = "geckodriver.exe"
 options = webdriver.FirefoxOptions()
 options.binary_location = "C:\\Program Files\\Mozilla Firefox\\firefox.exe"
 options.add_argument("--headless")
+apply_lean_profile(options, SHOP_NAME)
 
 
+# Pomiary czasu etapów (metrics.py) trafiają do przebiegu listingu tego sklepu
+start_run(SHOP_NAME, LISTING)
 logger.info("Rozpoczęto scraping.")
 logger.info("Plik CSV: {}", csv_filename)
 logger.info("Plik logu: {}", log_filename)
 
-driver = webdriver.Firefox(service=service, options=options)
+browser = BrowserManager(geckodriver_path, options)
+structured_data = StructuredDataExtractor(SHOP_NAME)
+price_history = PriceHistory()
+product_index = ProductIndex(SHOP_NAME)
+# Najpierw zwykłe HTTP, przeglądarka tylko dla stron bez pełnej strony kafelków w HTML (FETCH_BACKEND zmienia tryb);
+# ostatnia strona (bez przycisku 'Załaduj więcej') może mieć mniej produktów
+backend = FetchBackend(
+    SHOP_NAME,
+    required=(('div[class="product-medium-box"]', 16),),
+    next_page='a[data-aut-id="show-more-products-button"]',
+)
+
+
+def parse_product(product, page_url):
+    """
+    Funkcja odczytuje dane jednego produktu ze zrzutu strony (BeautifulSoup) i zwraca wiersz CSV.
+    """
+    # Pobranie tytułu oraz linku
+    link_element = product.select_one('a[class="product-medium-box-intro__link"]')
+    title = text_of(link_element)
+    product_link = urljoin(page_url, link_element["href"])
+
+    # Pobranie ceny
+    parted_price_total = product.select_one('span[class="parted-price-total"]')
+    parted_price_decimal = product.select_one('span[class="parted-price-decimal"]')
+
+    price_total_text = f"{parted_price_total.get_text(strip=True)},{parted_price_decimal.get_text(strip=True)}"
+
+    # Pobieranie oceny
+    try:
+        rating_text = text_of(product, 'span[class="client-rate__rate"]')
+        if rating_text is None:
+            raise ValueError("brak oceny")
+        rating = "{}/5".format(rating_text)
+        num_of_opinions = text_of(product, 'span[class="client-rate__opinions"]').split()[0]
+    except Exception as e:
+        logger.warning(f"Brak oceny lub opinii dla produktu: {title}")
+        rating = "Brak opinii"
+        num_of_opinions = "Brak opinii"
+
+    return {
+        "title": title,
+        "date": today_date,
+        "price": price_total_text,
+        "product_link": product_link,
+        "rating": rating,
+        "num_of_opinions": num_of_opinions,
+    }
+
+
+def row_from_structured(item, page_url):
+    """
+    Funkcja zamienia produkt z danych strukturalnych na wiersz CSV w formacie parse_product.
+    """
+    has_rating = item["rating"] is not None
+    return {
+        "title": item["name"],
+        "date": today_date,
+        "price": f"{item['price']:.2f}".replace(".", ",") if item["price"] is not None else None,
+        "product_link": urljoin(page_url, item["url"]),
+        "rating": f"{item['rating']}/5" if has_rating else "Brak opinii",
+        "num_of_opinions": item["review_count"] if has_rating else "Brak opinii",
+    }
+
+
+def page_url(page):
+    if page == 1:
+        return "https://www.euro.com.pl/telefony-komorkowe.bhtml"
+    return f"https://www.euro.com.pl/telefony-komorkowe,strona-{page}.bhtml"
+
+
+def browser_page(worker, url, page):
+    """
+    Funkcja otwiera stronę listingu w przeglądarce workera, czeka na produkty i zwraca zrzut strony.
+    """
+    driver = worker.get(url)
+
+    #Czekamy na załadowanie produktów
+    try:
+        with stage(WAIT):
+            WebDriverWait(driver, 10).until(
+                EC.visibility_of_all_elements_located((By.CLASS_NAME, "product-medium-box"))
+            )
+    except TimeoutException:
+        logger.warning("Element 'product-medium-box' nie pojawił się")
 
-try:
-    with open(csv_filename , mode="w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
+    # Jeden zrzut strony po doczytaniu leniwej zawartości, dalej parsujemy w Pythonie
+    return take_snapshot(driver, item_selector="div.product-medium-box", label="rtv_euro_agd")
 
-        page = 1
-        while True: 
-            if page == 1:
-                url = "https://www.euro.com.pl/telefony-komorkowe.bhtml"
-            else:
-                url = f"https://www.euro.com.pl/telefony-komorkowe,strona-{page}.bhtml"
-            logger.info(f"Scraping strony {page}: {url}")
 
-            driver.get(url)
+def fetch_page(worker, page):
+    """
+    Funkcja zwraca zrzut strony listingu z HTML pobranego przez HTTP, a gdy brakuje w nim kafelków produktów –
+    z przeglądarki workera (fetch_backends.py; przeglądarka startuje dopiero przy pierwszej takiej stronie).
+    """
+    url = page_url(page)
+    logger.info(f"Scraping strony {page}: {url}")
+    return backend.fetch(url, lambda: browser_page(worker, url, page))
 
-            #Czekamy na załadowanie produktów
-            try:
-                WebDriverWait(driver, 10).until(
-                EC.visibility_of_all_elements_located((By.CLASS_NAME, "product-medium-box"))
-            )
-            except TimeoutException:
-                logger.warning("Element 'product-medium-box' nie pojawił się")
-            
 
-            # Pobieramy wszystkie produkty na stronie
-            products = driver.find_elements(By.XPATH,
-                                            '//div[@class="product-medium-box"]')    
+try:
+    with open(csv_filename , mode="w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        csvfile.flush()
+        # Wpis "running" pozwala skryptowi danych technicznych czytać listing w trakcie zapisu (tryb strumieniowy)
+        record_run(SHOP_NAME, LISTING, today_date, csv_filename, status="running", rows=0)
+
+        # Liczba stron nie jest znana z góry – kolejna strona pobiera się w drugiej przeglądarce,
+        # zanim skończymy przetwarzać bieżącą (listing_pages.py)
+        pages = prefetch_pages(lambda: BrowserManager(geckodriver_path, options), fetch_page, reuse=browser)
+        for page, soup in pages:
+            url = page_url(page)
+            started = time.perf_counter()
+            products = soup.select('div[class="product-medium-box"]') if soup is not None else []
             if not products:
                 logger.info("Brak produktów na stronie, kończę scraping.")
                 break
 
+            # Dane strukturalne (JSON-LD itp.) mają pierwszeństwo, jeśli obejmują wszystkie produkty ze strony
+            structured = structured_data.extract(soup, expected=len(products))
+            if structured:
+                parse, items = row_from_structured, structured
+            else:
+                parse, items = parse_product, products
+
             # Iteracja po produktach na stronie
-            for product in products:
+            page_rows = []
+            for item in items:
 
                 try:
-                    # Pobranie tytułu oraz linku
-                    link_element = product.find_element(By.XPATH, './/a[@class="product-medium-box-intro__link"]')
-                    title = link_element.text
-                    product_link = link_element.get_attribute("href")
-
-                    # Pobranie ceny
-                    parted_price_total = product.find_element(By.XPATH, './/span[@class="parted-price-total"]')
-                    parted_price_decimal = product.find_element(By.XPATH, './/span[@class="parted-price-decimal"]')
-
-                    price_total_text = f"{parted_price_total.text.strip()},{parted_price_decimal.text.strip()}"
-
-                    # Pobieranie oceny
-                    try:
-                        rating = "{}/5".format(product.find_element(By.XPATH, './/span[@class="client-rate__rate"]').text)
-                        num_of_opinions = product.find_element(By.XPATH, './/span[@class="client-rate__opinions"]').text.split()[0]
-                    except Exception as e:
-                            logger.warning(f"Brak oceny lub opinii dla produktu: {title}")
-                            rating = "Brak opinii"
-                            num_of_opinions = "Brak opinii"
-                    
                     # Zapis do pliku CSV
-                    writer.writerow({
-                        "title": title,
-                        "date": today_date,
-                        "price": price_total_text,
-                        "product_link": product_link,
-                        "rating": rating,
-                        "num_of_opinions": num_of_opinions,
-                    })
-                    logger.info(f"Scraped: {title}")
+                    with stage(PARSE_PRODUCT):
+                        row = parse(item, url)
+                    # Ten sam produkt mógł już wystąpić na wcześniejszej stronie lub w innej kategorii (product_index.py)
+                    if not product_index.claim(row["product_link"], product_id_of(item)):
+                        logger.info("Pominięto duplikat: {}", row["product_link"])
+                        continue
+                    with stage(CSV_WRITE):
+                        writer.writerow(row)
+                        csvfile.flush()
+                    page_rows.append(row)
+                    logger.info(f"Scraped: {row['title']}")
                     
                 except Exception as e:
                     logger.error(f"Błąd przy przetwarzaniu produktu: {e}")
-
-            # Czekamy na przycisk 'Załaduj więcej'
-            try:
-                next_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, '//a[@data-aut-id="show-more-products-button"]'))
-                )
-                logger.info("Przechodzę na następną stronę....")
-                page += 1
-            except Exception:
+            # Historia cen zapisywana raz na stronę – ceny i oceny normalizowane całą kolumną (normalize.py)
+            with stage(HISTORY_WRITE):
+                price_history.record_many(SHOP_NAME, today_date, page_rows)
+            product_index.commit()
+            logger.info("Wyodrębniono dane ze strony {} w {:.3f} s.", page, time.perf_counter() - started)
+
+            # Przycisk 'Załaduj więcej' w zrzucie strony oznacza, że jest kolejna strona
+            if soup.select_one('a[data-aut-id="show-more-products-button"]') is None:
                 logger.info("Brak przycisku 'Załaduj więcej' – zakończono scraping.")
                 break
+            logger.info("Przechodzę na następną stronę....")
+        # Zamyka pulę – strona pobrana na zapas za ostatnią nie jest już potrzebna
+        pages.close()
+except Exception:
+    # Przerwany listing nie może zostać najnowszym udanym wynikiem (dane techniczne, run_all.py)
+    record_run(SHOP_NAME, LISTING, today_date, csv_filename, status="failed")
+    raise
+else:
+    # Plik CSV jest już zamknięty, więc rejestr przebiegów widzi wszystkie wiersze
+    record_run(SHOP_NAME, LISTING, today_date, csv_filename)
 finally:
     #Zamknięcie przeglądarki
-    driver.quit()
+    browser.quit()
+    backend.close()
+    price_history.close()
+    product_index.close()
+    log_startup_summary()
+    structured_data.log_summary()
+    log_wait_summary()
+    log_lazy_load_summary()
+    log_rate_summary()
+    finish_run()
     logger.complete()
     logger.info(f"Zakończono scraping. Dane zapisane w pliku: {csv_filename }")
\ No newline at end of file
@@ -1,19 +1,27 @@
-import glob
 import os
-import csv
-import json
 from datetime import datetime
-import time
 
 from loguru import logger
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 
+from browser_manager import BrowserManager, log_startup_summary
+from lean_profile import apply_lean_profile
+from driver_pool import DriverPool
+from waits import dom_stable, log_wait_summary, wait_for
+from checkpoint import CheckpointJournal
+from listing_stream import follow_listing, read_listing, stream_enabled
+from run_manifest import TECH_DETAILS, latest_listing_file, record_run
+from tech_cache import TechDetailsCache, write_tech_details
+from spec_store import SpecStore
+from product_index import ProductIndex
+from metrics import ELEMENT_LOOKUP, WAIT, finish_run, stage, start_run
+from rate_limiter import log_rate_summary
+
 # Konfiguracja folderu output
 output_folder = "output"
 os.makedirs(output_folder, exist_ok=True)
@@ -31,70 +39,52 @@ logger.add(log_filename, level="INFO", format="{time} - {level} - {message}", en
 logger.add(lambda msg: print(msg, end=""), level="INFO", format=log_format)
 
 # Konfiguracja Firefoksa i Geckodrivera
-service = Service("geckodriver.exe")
+geckodriver_path = "geckodriver.exe"
 options = webdriver.FirefoxOptions()
 options.set_preference("general.useragent.override", 
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/109.0")
 options.binary_location = "C:\\Program Files\\Mozilla Firefox\\firefox.exe"
 options.add_argument("--headless")
+apply_lean_profile(options, SHOP_NAME)
 
+# Pomiary czasu etapów (metrics.py) trafiają do przebiegu danych technicznych tego sklepu
+start_run(SHOP_NAME, TECH_DETAILS)
 logger.info("Rozpoczęcie skryptu pobierania szczegółów technicznych.")
 logger.info("Plik CSV: {}", csv_filename)
 logger.info("Plik logu: {}", log_filename)
 
-driver = webdriver.Firefox(service=service, options=options)
+pool = DriverPool(lambda: BrowserManager(geckodriver_path, options))
 
 try:
-    csv_pattern = os.path.join(output_folder, f"{SHOP_NAME}_*.csv")
-    csv_files = glob.glob(csv_pattern)
-    if not csv_files:
-        logger.error("Nie znaleziono plików CSV pasujących do wzorca {}", csv_pattern)
-        exit(1)
-
-
-    def extract_date(filename):
-        base = os.path.basename(filename)
-        # Zakładamy, że nazwa pliku ma format: RTV-EURO-AGD_YYYY-MM-DD.csv
-        date_str = base.replace(f"{SHOP_NAME}_", "").replace(".csv", "")
-        try:
-            return datetime.strptime(date_str, "%Y-%m-%d")
-        except ValueError:
-            logger.error("Nie udało się przekształcić daty z formatu '{}' na '%Y-%m-%d'. Sprawdzony ciąg: {}", "%Y-%m-%d", date_str)
-            return None    
-        
-    csv_files_with_date = [(file, extract_date(file)) for file in csv_files if extract_date(file) is not None]
-    if not csv_files_with_date:
-        logger.error("Żaden z plików CSV nie ma poprawnego formatu daty.")
-        exit(1)
-    csv_files_with_date.sort(key=lambda x: x[1], reverse=True)
-    latest_csv_file = csv_files_with_date[0][0]
-    logger.info("Wybrany plik CSV: {}", latest_csv_file)
-
-    # Wczytanie linków produktów z CSV
-    product_data = []
-    with open(latest_csv_file, mode="r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row.get("product_link"):
-                product_data.append({
-                    "product_link": row["product_link"],
-                })
-    logger.info("Znaleziono {} produktów do przetworzenia.", len(product_data))
+    if stream_enabled():
+        # Tryb strumieniowy: linki z listingu, który właśnie trwa (run_all.py --stream)
+        product_data = follow_listing(SHOP_NAME, today_date, output_folder)
+    else:
+        # Najnowszy udany listing z rejestru przebiegów (bez przeszukiwania folderu output)
+        latest_csv_file = latest_listing_file(SHOP_NAME, output_folder)
+        if not latest_csv_file:
+            logger.error("Nie znaleziono pliku CSV z listingiem sklepu {}", SHOP_NAME)
+            exit(1)
+        logger.info("Wybrany plik CSV: {}", latest_csv_file)
+        product_data = read_listing(latest_csv_file)
 
 
 
 
-    def scrape_tech_details(url):
+    def scrape_tech_details(worker, item):
         """
         Funkcja otwiera stronę produktu i próbuje pobrać wszystkie detale techniczne.
         """
-        driver.get(url)
+        url = item["product_link"]
+        logger.info("Przetwarzanie: {}", url)
+        driver = worker.get(url)
         
         #Oczekiwanie na pojawienie się diva "technical-attributes" co oznacza załądowanie się strony
         try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, '//div[@class="technical-attributes"]'))
-            )
+            with stage(WAIT):
+                WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.XPATH, '//div[@class="technical-attributes"]'))
+                )
         except TimeoutException:
             logger.error("Strona nie załadowała się w ciągu 10 sekund.")
             return {}
@@ -102,16 +92,19 @@ try:
         tech_details = {}
         try:
             
-            WebDriverWait(driver, 10).until(
-                EC.invisibility_of_element_located((By.CLASS_NAME, "onetrust-pc-dark-filter"))
-            )
+            with stage(WAIT):
+                WebDriverWait(driver, 10).until(
+                    EC.invisibility_of_element_located((By.CLASS_NAME, "onetrust-pc-dark-filter"))
+                )
 
             #Zamknięcie banera z cookies który zasłania przycisk "Rozwiń pełne dane techniczne"
-            time.sleep(3)
+            # Zamiast stałych 3 s czekamy, aż DOM przestanie się zmieniać (baner zdąży się pojawić)
+            wait_for(driver, dom_stable(), label="rtv: baner cookies", replaces=3)
             try:
-                cookie_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, '//button[contains(@id, "onetrust-accept-btn-handler")]'))
-                )
+                with stage(WAIT):
+                    cookie_button = WebDriverWait(driver, 10).until(
+                        EC.element_to_be_clickable((By.XPATH, '//button[contains(@id, "onetrust-accept-btn-handler")]'))
+                    )
                 cookie_button.click()
                 logger.info("Kliknięto przycisk akceptacji cookies.")
             except TimeoutException:
@@ -119,43 +112,46 @@ try:
 
             # Sprawdzenie, czy przycisk "Rozwiń pełne dane techniczne" jest obecny, a jeśli tak, kliknięcie w niego
             try:
-                WebDriverWait(driver, 10).until(
-                    EC.invisibility_of_element_located((By.CLASS_NAME, "onetrust-pc-dark-filter"))
-                )
-                show_more_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, '//button[contains(@class, "cta") and .//span[contains(text(), "Rozwiń pełne dane techniczne")]]'))
-                )
+                with stage(WAIT):
+                    WebDriverWait(driver, 10).until(
+                        EC.invisibility_of_element_located((By.CLASS_NAME, "onetrust-pc-dark-filter"))
+                    )
+                    show_more_button = WebDriverWait(driver, 10).until(
+                        EC.element_to_be_clickable((By.XPATH, '//button[contains(@class, "cta") and .//span[contains(text(), "Rozwiń pełne dane techniczne")]]'))
+                    )
                 driver.execute_script("arguments[0].scrollIntoView();", show_more_button)  # Przewinięcie do przycisku
                 show_more_button.click()
             except TimeoutException:
                 logger.warning("Nie znaleziono przycisku 'Rozwiń pełne dane techniczne', kontynuujemy bez klikania")
     
-            time.sleep(4)  # krótkie oczekiwanie na załadowanie strony
-            attributes_container = driver.find_element(By.XPATH, '//div[@class="technical-attributes"]')
-            detail_elements = attributes_container.find_elements(By.XPATH, './/div[@class="technical-attributes__section"]')
-            for element in detail_elements:
-                try:
-                    tr_elements = element.find_elements(By.TAG_NAME, 'tr')
-                    if tr_elements:
-                        for tr_element in tr_elements:
-                            #Pomijamy elementy z linkami do pobrania plików (instrukcji, gwarancji itd.)
-                            if tr_element.find_elements(By.TAG_NAME, 'a'):
-                                logger.info(f"Pominięto element '{key}', ponieważ zawiera link.")
-                                continue
-                            try:
-                                key_element = tr_element.find_elements(By.TAG_NAME, 'th')
-                                value_element = tr_element.find_elements(By.TAG_NAME, 'span')
-
-                                if key_element and value_element:
-                                    key = key_element[0].text.replace(":", "").strip()
-                                    value = value_element[0].text.strip()
-                                    tech_details[key] = value
-                                else:
-                                    logger.warning("Pominięto wiersz, ponieważ brakuje 'th' lub 'span'.")
-                            except Exception as inner_e:
-                                logger.warning("Błąd przy przetwarzaniu detalu: {}", inner_e)
-                except Exception as inner_e:
-                    logger.warning("Błąd przy przetwarzaniu detalu: {}", inner_e)
+            # Czekamy na rozwinięcie tabeli danych technicznych zamiast stałych 4 s
+            wait_for(driver, dom_stable(), label="rtv: pełne dane techniczne", replaces=4)
+            with stage(ELEMENT_LOOKUP):
+                attributes_container = driver.find_element(By.XPATH, '//div[@class="technical-attributes"]')
+                detail_elements = attributes_container.find_elements(By.XPATH, './/div[@class="technical-attributes__section"]')
+                for element in detail_elements:
+                    try:
+                        tr_elements = element.find_elements(By.TAG_NAME, 'tr')
+                        if tr_elements:
+                            for tr_element in tr_elements:
+                                #Pomijamy elementy z linkami do pobrania plików (instrukcji, gwarancji itd.)
+                                if tr_element.find_elements(By.TAG_NAME, 'a'):
+                                    logger.info(f"Pominięto element '{key}', ponieważ zawiera link.")
+                                    continue
+                                try:
+                                    key_element = tr_element.find_elements(By.TAG_NAME, 'th')
+                                    value_element = tr_element.find_elements(By.TAG_NAME, 'span')
+
+                                    if key_element and value_element:
+                                        key = key_element[0].text.replace(":", "").strip()
+                                        value = value_element[0].text.strip()
+                                        tech_details[key] = value
+                                    else:
+                                        logger.warning("Pominięto wiersz, ponieważ brakuje 'th' lub 'span'.")
+                                except Exception as inner_e:
+                                    logger.warning("Błąd przy przetwarzaniu detalu: {}", inner_e)
+                    except Exception as inner_e:
+                        logger.warning("Błąd przy przetwarzaniu detalu: {}", inner_e)
         except Exception as e:
             logger.error("Błąd przy otwieraniu URL {}: {}", url, e)
         return tech_details        
@@ -165,20 +161,34 @@ try:
     fieldnames = ["product_link", "tech_details"]
 
 
-    with open(tech_csv_filename, mode="w", newline="", encoding="utf-8") as tech_csvfile:
-        writer = csv.DictWriter(tech_csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for item in product_data:
-            url = item["product_link"]
-            logger.info("Przetwarzanie: {}", url)
-            details = scrape_tech_details(url)
-            writer.writerow({
-                "product_link": url,
-                "tech_details": json.dumps(details, ensure_ascii=False)
-            })
+    # Dziennik postępu pozwala wznowić przerwany przebieg bez ponownego pobierania gotowych produktów
+    journal = CheckpointJournal(os.path.join(output_folder, f"checkpoint_tech_details_{SHOP_NAME}_{today_date}.txt"), tech_csv_filename)
+    # Ten sam produkt pod różnymi linkami (parametry śledzące, inny identyfikator) pobieramy tylko raz
+    product_index = ProductIndex(SHOP_NAME, persist=False)
+    product_data = product_index.unique(product_data)
+    product_data = journal.pending(product_data)
+    # Dane techniczne trafiają też do wspólnej bazy ze słownikami atrybutów i wartości (spec_store.py)
+    spec_store = SpecStore()
+    # Produkty z aktualnym wpisem w pamięci podręcznej nie są ponownie otwierane
+    cache = TechDetailsCache(SHOP_NAME)
+
+    tech_csvfile, writer = journal.open_output(fieldnames)
+    with tech_csvfile:
+        # Cache sprawdzany w puli – wyniki z cache i pobrane przychodzą w kolejności z pliku CSV
+        results = pool.imap(cache.through(scrape_tech_details), product_data)
+        write_tech_details(results, writer, tech_csvfile, journal, cache, spec_store, SHOP_NAME, today_date)
+
+    journal.close()
+    record_run(SHOP_NAME, TECH_DETAILS, today_date, tech_csv_filename)
+    cache.close()
+    spec_store.close()
+    product_index.close()
     
 finally:
-    #Zamknięcie przeglądarki
-    driver.quit()
+    # Przeglądarki workerów są zamykane przez pulę
+    log_startup_summary()
+    log_wait_summary()
+    log_rate_summary()
+    finish_run()
     logger.complete()
     logger.info("Zakończono pobieranie szczegółów technicznych. Dane zapisane w pliku: {}", tech_csv_filename)
\ No newline at end of file
@@ -0,0 +1,66 @@
+# Porównanie czasu startu przeglądarki: pusty profil tymczasowy vs kopia szablonu profilu (profile_template.py)
+# Uruchomienie z katalogu głównego repozytorium: python benchmarks/bench_browser_startup.py --geckodriver geckodriver.exe
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from selenium import webdriver
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from browser_manager import BrowserManager  # noqa: E402
+from lean_profile import apply_lean_profile  # noqa: E402
+
+
+def make_options(firefox_binary):
+    options = webdriver.FirefoxOptions()
+    options.add_argument("--headless")
+    if firefox_binary:
+        options.binary_location = firefox_binary
+    return apply_lean_profile(options)
+
+
+def measure(geckodriver, firefox_binary, repeats, template):
+    """
+    Funkcja zwraca czasy startu (uruchomienie + pierwsza strona about:blank) dla kolejnych nowych przeglądarek.
+    """
+    os.environ["PROFILE_TEMPLATE"] = "1" if template else "0"
+    samples = []
+    for _ in range(repeats):
+        browser = BrowserManager(geckodriver, make_options(firefox_binary))
+        started = time.perf_counter()
+        browser.start()
+        browser.driver.get("about:blank")
+        samples.append(time.perf_counter() - started)
+        browser.quit()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark startu przeglądarki z szablonem profilu")
+    parser.add_argument("--geckodriver", default="geckodriver")
+    parser.add_argument("--firefox-binary", default=None)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_profile_") as folder:
+        os.environ["PROFILE_TEMPLATE_DIR"] = folder
+        # Pierwsze uruchomienie buduje szablon – nie wliczamy go do pomiaru
+        measure(args.geckodriver, args.firefox_binary, 1, template=True)
+        results = {
+            "pusty profil": measure(args.geckodriver, args.firefox_binary, args.repeats, template=False),
+            "szablon": measure(args.geckodriver, args.firefox_binary, args.repeats, template=True),
+        }
+
+    print(f"{'profil':14s} {'mediana [s]':>12s} {'min [s]':>8s} {'maks [s]':>9s}")
+    for name, samples in results.items():
+        print(f"{name:14s} {statistics.median(samples):12.2f} {min(samples):8.2f} {max(samples):9.2f}")
+    cold, warm = (statistics.median(samples) for samples in results.values())
+    print(f"Szablon skraca medianę startu o {100 * (cold - warm) / cold:.0f}%.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# Porównanie pobierania stron: requests.get jedno po drugim vs HttpFetcher (sesja + równoległość)
+# Uruchomienie z katalogu głównego repozytorium: python benchmarks/bench_http_fetch.py
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_fetch import HttpFetcher  # noqa: E402
+
+PAGE = ("<html><body>" + "<div class='left'><a href='/p' title='Produkt'></a></div>" * 200 + "</body></html>").encode()
+
+
+def make_handler(connect_delay, response_delay):
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1, żeby klient mógł utrzymywać połączenie (keep-alive)
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            # Symulacja kosztu nawiązania nowego połączenia TCP/TLS
+            time.sleep(connect_delay)
+            super().setup()
+
+        def do_GET(self):
+            time.sleep(response_delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def run_sequential(urls):
+    for url in urls:
+        requests.get(url, timeout=10).raise_for_status()
+
+
+def run_fetcher(urls, workers, per_host):
+    with HttpFetcher(workers=workers, per_host=per_host) as fetcher:
+        for _url, text in fetcher.fetch_many(urls):
+            assert text is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark warstwy HTTP na lokalnym serwerze")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--connect-delay", type=float, default=0.03, help="koszt nowego połączenia [s]")
+    parser.add_argument("--response-delay", type=float, default=0.05, help="czas odpowiedzi serwera [s]")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--per-host", type=int, default=8)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.connect_delay, args.response_delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/produkt/{i}" for i in range(args.pages)]
+
+    results = {}
+    for name, runner in (
+        ("requests.get (sekwencyjnie)", lambda: run_sequential(urls)),
+        (f"HttpFetcher ({args.workers} wątków)", lambda: run_fetcher(urls, args.workers, args.per_host)),
+    ):
+        started = time.perf_counter()
+        runner()
+        results[name] = time.perf_counter() - started
+        print(f"{name:35s} {results[name]:7.2f} s  {args.pages / results[name]:7.1f} stron/s")
+
+    baseline, pooled = results.values()
+    print(f"Przyspieszenie: {baseline / pooled:.1f}x")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Porównanie pełnego i odchudzonego profilu Firefoksa: przesłane bajty i czas ładowania stron listingu
+# Uruchomienie z katalogu głównego repozytorium: python benchmarks/bench_lean_profile.py --geckodriver geckodriver.exe
+import argparse
+import os
+import statistics
+import sys
+
+from selenium import webdriver
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from browser_manager import BrowserManager  # noqa: E402
+from lean_profile import BLOCKED_HOSTS, apply_lean_profile, page_metrics  # noqa: E402
+from waits import network_idle, wait_for  # noqa: E402
+
+SHOP_URLS = {
+    "komputronik": "https://www.komputronik.pl/category/1596/telefony.html",
+    "MediaExpert": "https://www.mediaexpert.pl/smartfony-i-zegarki/smartfony",
+    "mediamarkt": "https://mediamarkt.pl/pl/category/smartfony-25983.html?page=1",
+    "morele": "https://www.morele.net/kategoria/smartfony-280/",
+    "neonet": "https://www.neonet.pl/smartfony-i-navi/smartfony.html",
+    "rtv_euro_agd": "https://www.euro.com.pl/telefony-komorkowe.bhtml",
+}
+
+
+# Zasoby z hostów z BLOCKED_HOSTS, które mimo blokady dostały odpowiedź (w odchudzonym profilu powinno być 0)
+BLOCKED_RESPONSES_SCRIPT = """
+const hosts = arguments[0];
+return performance.getEntriesByType("resource").filter((entry) => {
+    const host = new URL(entry.name).hostname;
+    return entry.responseStart > 0 && hosts.some((blocked) => host === blocked || host.endsWith("." + blocked));
+}).length;
+"""
+
+
+def make_options(firefox_binary, shop_name, lean):
+    options = webdriver.FirefoxOptions()
+    options.add_argument("--headless")
+    if firefox_binary:
+        options.binary_location = firefox_binary
+    return apply_lean_profile(options, shop_name, enabled=lean)
+
+
+def measure(geckodriver, firefox_binary, shop_name, url, lean, repeats):
+    samples = []
+    for _ in range(repeats):
+        # Nowa przeglądarka przy każdym pomiarze, żeby pamięć podręczna nie zaniżała wyników
+        with BrowserManager(geckodriver, make_options(firefox_binary, shop_name, lean)) as browser:
+            driver = browser.get(url)
+            wait_for(driver, network_idle(1000), timeout=30, label="benchmark: bezczynność sieci")
+            sample = page_metrics(driver)
+            sample["blocked_responses"] = driver.execute_script(BLOCKED_RESPONSES_SCRIPT, list(BLOCKED_HOSTS))
+            samples.append(sample)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark odchudzonego profilu przeglądarki")
+    parser.add_argument("--geckodriver", default="geckodriver")
+    parser.add_argument("--firefox-binary", default=None)
+    parser.add_argument("--shop", action="append", choices=sorted(SHOP_URLS), help="domyślnie wszystkie sklepy")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'sklep':14s} {'profil':10s} {'KB':>9s} {'zasoby':>7s} {'ładowanie [ms]':>15s} {'z blokowanych':>14s}")
+    for shop_name in args.shop or sorted(SHOP_URLS):
+        results = {}
+        for lean in (False, True):
+            samples = measure(args.geckodriver, args.firefox_binary, shop_name, SHOP_URLS[shop_name], lean, args.repeats)
+            kilobytes = statistics.median(sample["bytes"] for sample in samples) / 1024
+            resources = statistics.median(sample["resources"] for sample in samples)
+            load_ms = statistics.median(sample["load_ms"] for sample in samples)
+            blocked = max(sample["blocked_responses"] for sample in samples)
+            results[lean] = (kilobytes, load_ms)
+            profile = "lean" if lean else "pełny"
+            print(f"{shop_name:14s} {profile:10s} {kilobytes:9.0f} {resources:7.0f} {load_ms:15.0f} {blocked:14d}")
+            if lean and blocked:
+                print(f"{shop_name:14s} UWAGA: {blocked} zasobów z blokowanych hostów załadowało się w profilu lean")
+        (full_kb, full_ms), (lean_kb, lean_ms) = results[False], results[True]
+        print(f"{shop_name:14s} {'różnica':10s} {100 * (1 - lean_kb / max(full_kb, 1)):8.0f}% {'':7s} {100 * (1 - lean_ms / max(full_ms, 1)):14.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Benchmark end-to-end: skrypty listingu i danych technicznych na nagranych stronach (replay.py) zamiast na żywych sklepach
+# Uruchomienie z katalogu głównego repozytorium:
+#   python benchmarks/bench_replay.py --fixtures fixtures --latency-ms 80 --save benchmarks/baseline.json
+#   python benchmarks/bench_replay.py --fixtures fixtures --latency-ms 80 --baseline benchmarks/baseline.json
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import replay  # noqa: E402
+from run_all import MANIFEST_NAMES, SHOPS  # noqa: E402
+from run_manifest import LISTING, TECH_DETAILS, RunManifest  # noqa: E402
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_script(script, workdir, base_url, stats_path):
+    """
+    Funkcja uruchamia skrypt w osobnym katalogu roboczym (własny folder output) z adresami przekierowanymi na serwer.
+    """
+    env = dict(
+        os.environ,
+        REPLAY_URL=base_url,
+        REPLAY_STATS=stats_path,
+        # Każdy pomiar od zera: bez wznawiania i bez pamięci podręcznej danych technicznych
+        CHECKPOINT_RESET="1",
+        TECH_CACHE_REFRESH="1",
+    )
+    env.pop("REPLAY_RECORD", None)
+    started = time.perf_counter()
+    with open(os.path.join(workdir, f"{os.path.splitext(script)[0]}.out"), "w", encoding="utf-8") as out:
+        returncode = subprocess.run(
+            [sys.executable, os.path.join(ROOT, script)], cwd=workdir, env=env, stdout=out, stderr=subprocess.STDOUT
+        ).returncode
+    return returncode, time.perf_counter() - started
+
+
+def output_rows(workdir, shop, run_type):
+    manifest = RunManifest(os.path.join(workdir, "output", "run_manifest.sqlite"))
+    try:
+        entry = manifest.latest(MANIFEST_NAMES.get(shop, shop), run_type)
+    finally:
+        manifest.close()
+    return entry["rows"] if entry else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scraperów na nagranych stronach")
+    parser.add_argument("shops", nargs="*", help="domyślnie wszystkie sklepy")
+    parser.add_argument("--fixtures", default=replay.DEFAULT_FIXTURES)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--save", help="zapis wyników do pliku JSON (np. jako punkt odniesienia)")
+    parser.add_argument("--baseline", help="plik JSON z poprzednim wynikiem do porównania")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="dopuszczalny spadek stron/s (ułamek)")
+    args = parser.parse_args()
+
+    server, base_url = replay.start_server(args.fixtures, 0, args.latency_ms, args.jitter_ms, args.error_rate)
+    results = {}
+    print(f"{'krok':48s} {'kod':>4s} {'czas [s]':>9s} {'strony/s':>9s} {'produkty/s':>11s} {'p50 [ms]':>9s} {'p95 [ms]':>9s}")
+    with tempfile.TemporaryDirectory(prefix="bench_replay_") as tmp:
+        for shop in args.shops or sorted(SHOPS):
+            workdir = os.path.join(tmp, shop)
+            os.makedirs(os.path.join(workdir, "output"))
+            for script, _uses_browser, is_tech in SHOPS[shop]:
+                stats_path = os.path.join(workdir, f"{script}.latency")
+                returncode, elapsed = run_script(script, workdir, base_url, stats_path)
+                latencies = []
+                if os.path.exists(stats_path):
+                    with open(stats_path, encoding="utf-8") as f:
+                        latencies = [float(line) for line in f if line.strip()]
+                rows = output_rows(workdir, shop, TECH_DETAILS if is_tech else LISTING)
+                result = {
+                    "returncode": returncode,
+                    "seconds": round(elapsed, 2),
+                    "pages": len(latencies),
+                    "pages_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+                    "products_per_s": round(rows / elapsed, 2) if elapsed else 0.0,
+                    "p50_ms": round(1000 * statistics.median(latencies), 1) if latencies else 0.0,
+                    "p95_ms": round(1000 * percentile(latencies, 0.95), 1),
+                }
+                results[f"{shop}/{script}"] = result
+                print(f"{shop + '/' + script:48s} {returncode:4d} {result['seconds']:9.2f} {result['pages_per_s']:9.2f} "
+                      f"{result['products_per_s']:11.2f} {result['p50_ms']:9.1f} {result['p95_ms']:9.1f}")
+    server.shutdown()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"latency_ms": args.latency_ms, "error_rate": args.error_rate, "results": results}, f, indent=2)
+
+    exit_code = 0 if all(result["returncode"] == 0 for result in results.values()) else 1
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        for key, result in results.items():
+            previous = baseline.get(key)
+            if not previous or not previous["pages_per_s"]:
+                continue
+            change = result["pages_per_s"] / previous["pages_per_s"] - 1
+            if change < -args.tolerance:
+                print(f"REGRESJA {key}: {previous['pages_per_s']:.2f} -> {result['pages_per_s']:.2f} stron/s ({change:+.0%})")
+                exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
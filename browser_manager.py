@@ -0,0 +1,237 @@
+# Wspólne zarządzanie cyklem życia przeglądarki Firefox dla wszystkich skryptów Selenium
+import atexit
+import os
+import threading
+import time
+import weakref
+
+from loguru import logger
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.firefox.service import Service
+
+import metrics
+import profile_template
+import rate_limiter
+import replay
+
+# Statystyki uruchomień przeglądarek w całym procesie (wspólne dla wszystkich workerów)
+_stats_lock = threading.Lock()
+_stats = {"launches": 0, "startup_seconds": 0.0, "recycles": 0}
+_run_started = time.monotonic()
+_active_managers = weakref.WeakSet()
+
+# Błędy, po których przeglądarkę trzeba uruchomić od nowa
+CRASH_MESSAGES = (
+    "Browsing context has been discarded",
+    "Failed to decode response from marionette",
+    "Tried to run command without establishing a connection",
+    "invalid session id",
+    "Connection refused",
+)
+
+
+def _env_int(name):
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("Niepoprawna wartość zmiennej {}: {}", name, value)
+        return None
+
+
+def _process_tree_rss_mb(root_pid):
+    """
+    Funkcja sumuje pamięć RSS procesu Firefoksa i jego procesów potomnych (tylko Linux).
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    children = {}
+    rss = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status", encoding="utf-8") as f:
+                fields = dict(line.split(":", 1) for line in f if ":" in line)
+        except OSError:
+            continue
+        pid = int(entry)
+        children.setdefault(int(fields.get("PPid", "0").strip()), []).append(pid)
+        rss[pid] = int(fields.get("VmRSS", "0 kB").split()[0])
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total / 1024
+
+
+class BrowserManager:
+    """
+    Jedna zarządzana przeglądarka: leniwe uruchomienie, kontrola stanu,
+    restart po awarii, co restart_interval stron lub po przekroczeniu limitu pamięci
+    oraz bezpieczne zamknięcie.
+    """
+
+    def __init__(self, executable_path, options, restart_interval=None, max_memory_mb=None):
+        self.executable_path = executable_path
+        self.options = options
+        self.restart_interval = restart_interval or _env_int("BROWSER_RESTART_INTERVAL")
+        self.max_memory_mb = max_memory_mb or _env_int("BROWSER_MAX_MEMORY_MB")
+        self.pages = 0
+        self._service = None
+        self._driver = None
+        self._profile_clone = None
+        _active_managers.add(self)
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self.start()
+        return self._driver
+
+    def start(self):
+        started = time.monotonic()
+        # Każda przeglądarka ma własny Service, bo geckodriver nie może być współdzielony
+        self._service = Service(self.executable_path)
+        options = self.options
+        if profile_template.profile_template_enabled():
+            # Kopia gotowego szablonu profilu zamiast pustego profilu tymczasowego (profile_template.py)
+            options, self._profile_clone = profile_template.clone_profile(self.executable_path, self.options)
+        self._driver = webdriver.Firefox(service=self._service, options=options)
+        elapsed = time.monotonic() - started
+        metrics.observe(metrics.BROWSER_START, elapsed)
+        self.pages = 0
+        with _stats_lock:
+            _stats["launches"] += 1
+            _stats["startup_seconds"] += elapsed
+        logger.info("Uruchomiono przeglądarkę w {:.2f} s.", elapsed)
+
+    def is_healthy(self):
+        # Sprawdzenie bez dodatkowego zapytania do przeglądarki: czy proces geckodrivera żyje
+        if self._driver is None or self._service is None:
+            return False
+        process = getattr(self._service, "process", None)
+        return process is None or process.poll() is None
+
+    def memory_mb(self):
+        if self._driver is None:
+            return None
+        pid = self._driver.capabilities.get("moz:processID")
+        if not pid:
+            return None
+        return _process_tree_rss_mb(int(pid))
+
+    def _recycle_reason(self):
+        if self._driver is None:
+            return None
+        if not self.is_healthy():
+            return "przeglądarka nie odpowiada"
+        if self.restart_interval and self.pages >= self.restart_interval:
+            return f"po {self.pages} stronach"
+        if self.max_memory_mb:
+            memory = self.memory_mb()
+            if memory is not None and memory > self.max_memory_mb:
+                return f"zużycie pamięci {memory:.0f} MB"
+        return None
+
+    def recycle(self, reason):
+        logger.info("Restartowanie przeglądarki: {}", reason)
+        with _stats_lock:
+            _stats["recycles"] += 1
+        self.quit()
+        self.start()
+
+    def get(self, url):
+        """
+        Funkcja otwiera adres w przeglądarce i zwraca aktualny driver.
+        Przed nawigacją przeglądarka jest restartowana, jeśli wymaga tego stan lub limity.
+        """
+        if self._driver is not None:
+            replay.flush_page(self._driver)
+        reason = self._recycle_reason()
+        if reason:
+            self.recycle(reason)
+        # Przy REPLAY_URL strony są pobierane z lokalnego serwera odtwarzającego (replay.py)
+        target = replay.rewrite_url(url)
+        for attempt in range(2):
+            try:
+                slot = self._navigate(url, target)
+            except WebDriverException as e:
+                if not any(message in str(e) for message in CRASH_MESSAGES):
+                    raise
+                # Restart przeglądarki odbywa się poza miejscem od limitera – nie blokuje innych zapytań do domeny
+                # i nie zawyża opóźnienia sklepu
+                self.recycle(f"awaria ({e.msg})")
+                slot = self._navigate(url, target)
+            if not slot.blocked or attempt:
+                break
+            # Nowa sesja przeglądarki (bez ciasteczek) i jedno ponowienie po przerwie limitera
+            self.recycle("captcha / blokada")
+        # Przy REPLAY_RECORD strona jest nagrywana dopiero w pełni załadowana (zrzut strony albo kolejna nawigacja)
+        replay.remember_page(self._driver, url)
+        self.pages += 1
+        return self._driver
+
+    def _navigate(self, url, target):
+        """
+        Funkcja wykonuje jedną nawigację w miejscu przydzielonym przez limiter i zwraca to miejsce (slot.blocked).
+        """
+        # Uruchomienie przeglądarki (po restarcie) nie zajmuje miejsca w limiterze
+        driver = self.driver
+        # Wspólne tempo zapytań do domeny (rate_limiter.py); po captchy limiter robi przerwę dla całej domeny
+        with rate_limiter.request_slot(url) as slot:
+            started = time.monotonic()
+            driver.get(target)
+            elapsed = time.monotonic() - started
+            metrics.observe(metrics.DRIVER_GET, elapsed)
+            replay.record_latency(elapsed)
+            slot.blocked = rate_limiter.rate_limit_enabled() and rate_limiter.page_blocked(driver)
+        return slot
+
+    def quit(self):
+        if self._driver is not None:
+            replay.flush_page(self._driver)
+            try:
+                self._driver.quit()
+            except Exception:
+                pass
+        self._driver = None
+        self._service = None
+        profile_template.remove_clone(self._profile_clone)
+        self._profile_clone = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.quit()
+
+
+def startup_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def log_startup_summary():
+    """
+    Funkcja zapisuje w logu, ile czasu przebiegu zajęło uruchamianie przeglądarek.
+    """
+    stats = startup_stats()
+    elapsed = time.monotonic() - _run_started
+    share = 100 * stats["startup_seconds"] / elapsed if elapsed else 0
+    logger.info(
+        "Uruchomienia przeglądarek: {} (restartów: {}), łączny czas startu {:.1f} s ({:.1f}% czasu działania).",
+        stats["launches"], stats["recycles"], stats["startup_seconds"], share
+    )
+
+
+@atexit.register
+def _quit_all():
+    # Zamknięcie przeglądarek pozostawionych np. po exit(1) w środku skryptu
+    for manager in list(_active_managers):
+        manager.quit()
@@ -0,0 +1,65 @@
+# Dziennik postępu (checkpoint) dla skryptów *_dane_techniczne.py – wznowienie po awarii
+import csv
+import os
+import threading
+
+from loguru import logger
+
+
+class CheckpointJournal:
+    """
+    Plik tylko do dopisywania z linkami produktów, których dane zostały już zapisane.
+    Ponowne uruchomienie tego samego dnia pomija te produkty i dopisuje wyniki do istniejącego pliku CSV.
+    """
+
+    def __init__(self, path, output_path):
+        self.path = path
+        self.output_path = output_path
+        self.done = set()
+        # Wznowienie ma sens tylko, gdy istnieje też plik wynikowy; CHECKPOINT_RESET=1 wymusza start od zera
+        reset = os.environ.get("CHECKPOINT_RESET") == "1"
+        if os.path.exists(path) and os.path.exists(output_path) and not reset:
+            with open(path, encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        self.resumed = bool(self.done)
+        self._file = open(path, "a" if self.resumed else "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        if self.resumed:
+            logger.info("Wznawianie przebiegu: {} produktów już przetworzonych ({}).", len(self.done), path)
+
+    def __contains__(self, link):
+        return link in self.done
+
+    def pending(self, items, key="product_link"):
+        """
+        Funkcja zwraca elementy, których jeszcze nie zapisano w dzienniku.
+        Dla generatora (tryb strumieniowy) filtruje elementy leniwie.
+        """
+        if not isinstance(items, list):
+            return (item for item in items if item[key] not in self.done)
+        remaining = [item for item in items if item[key] not in self.done]
+        if len(remaining) != len(items):
+            logger.info("Pominięto {} produktów zapisanych w poprzednim przebiegu.", len(items) - len(remaining))
+        return remaining
+
+    def open_output(self, fieldnames):
+        """
+        Funkcja otwiera plik wynikowy: przy wznowieniu do dopisywania, w przeciwnym razie od nowa z nagłówkiem.
+        Zwraca parę (plik, writer).
+        """
+        output_file = open(self.output_path, mode="a" if self.resumed else "w", newline="", encoding="utf-8")
+        writer = csv.DictWriter(output_file, fieldnames=fieldnames)
+        if not self.resumed:
+            writer.writeheader()
+        return output_file, writer
+
+    def mark_done(self, link):
+        # Wpis trafia na dysk od razu, żeby przetrwał przerwanie procesu
+        with self._lock:
+            self._file.write(link + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.done.add(link)
+
+    def close(self):
+        self._file.close()
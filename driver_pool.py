@@ -0,0 +1,129 @@
+# Pula równoległych przeglądarek dla skryptów *_dane_techniczne.py
+import os
+import queue
+import threading
+
+from loguru import logger
+
+# Domyślna liczba workerów, można ją nadpisać zmienną TECH_DETAILS_WORKERS
+DEFAULT_WORKERS = 4
+
+
+def get_worker_count(default=DEFAULT_WORKERS):
+    """
+    Funkcja zwraca liczbę workerów ustawioną w zmiennej środowiskowej TECH_DETAILS_WORKERS.
+    """
+    try:
+        return max(1, int(os.environ.get("TECH_DETAILS_WORKERS", default)))
+    except ValueError:
+        logger.warning("Niepoprawna wartość TECH_DETAILS_WORKERS, używam {}", default)
+        return default
+
+
+class DriverPool:
+    """
+    Ograniczona pula workerów ze wspólną kolejką zadań.
+    Każdy wątek tworzy własnego workera (np. BrowserManager) przy pierwszym zadaniu
+    i zamyka go przez quit() po zakończeniu pracy.
+    Wyniki są zwracane w tej samej kolejności, w jakiej podano elementy wejściowe.
+    """
+
+    def __init__(self, worker_factory, workers=None):
+        self.worker_factory = worker_factory
+        self.workers = workers or get_worker_count()
+
+    def imap(self, func, items):
+        """
+        Funkcja wywołuje func(worker, item) równolegle dla każdego elementu
+        i zwraca pary (item, wynik) w kolejności wejściowej.
+        Elementy są pobierane leniwie, więc items może być generatorem.
+        """
+        tasks = queue.Queue(maxsize=self.workers * 2)
+        # Ogranicza liczbę wyników czekających na wcześniejsze, wolniejsze elementy
+        window = threading.Semaphore(self.workers * 4)
+        results = {}
+        state = {"total": None, "error": None}
+        cond = threading.Condition()
+        stop = threading.Event()
+
+        def put(task):
+            while not stop.is_set():
+                try:
+                    tasks.put(task, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def feeder():
+            count = 0
+            try:
+                for item in items:
+                    while not window.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    if not put((count, item)):
+                        return
+                    count += 1
+            except Exception as e:
+                with cond:
+                    state["error"] = e
+            finally:
+                with cond:
+                    state["total"] = count
+                    cond.notify_all()
+                for _ in range(self.workers):
+                    put(None)
+
+        def run_worker():
+            worker = None
+            try:
+                while not stop.is_set():
+                    try:
+                        task = tasks.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if task is None:
+                        break
+                    index, item = task
+                    try:
+                        if worker is None:
+                            worker = self.worker_factory()
+                        outcome = (True, item, func(worker, item))
+                    except Exception as e:
+                        outcome = (False, item, e)
+                    with cond:
+                        results[index] = outcome
+                        cond.notify_all()
+            finally:
+                if worker is not None:
+                    worker.quit()
+
+        threads = [threading.Thread(target=feeder, daemon=True)]
+        threads += [threading.Thread(target=run_worker, daemon=True) for _ in range(self.workers)]
+        logger.info("Uruchamianie puli {} workerów.", self.workers)
+        for thread in threads:
+            thread.start()
+
+        next_index = 0
+        try:
+            while True:
+                with cond:
+                    while next_index not in results:
+                        if state["total"] is not None and next_index >= state["total"]:
+                            break
+                        cond.wait()
+                    if next_index not in results:
+                        if state["error"] is not None:
+                            raise state["error"]
+                        break
+                    ok, item, value = results.pop(next_index)
+                window.release()
+                next_index += 1
+                if not ok:
+                    raise value
+                yield item, value
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,148 @@
+# Wybór sposobu pobierania stron sklepu: zwykłe HTTP + parser albo przeglądarka (Selenium)
+# Tryby (zmienna FETCH_BACKEND lub parametr mode):
+#   http          – tylko requests + BeautifulSoup
+#   http+browser  – najpierw HTTP; przeglądarka, gdy w HTML brakuje wymaganych selektorów (np. kafelki renderowane w JS)
+#   browser       – tylko przeglądarka (dotychczasowe zachowanie)
+#   auto          – jak http+browser, ale po AUTO_PROBE_PAGES stronach bez ani jednego trafienia HTTP
+#                   pozostałe strony idą od razu do przeglądarki (bez zbędnego zapytania HTTP)
+import os
+import threading
+
+from bs4 import BeautifulSoup
+from loguru import logger
+
+from http_fetch import HttpFetcher
+from metrics import HTML_PARSE, stage
+
+HTTP, HTTP_BROWSER, BROWSER, AUTO = "http", "http+browser", "browser", "auto"
+MODES = (HTTP, HTTP_BROWSER, BROWSER, AUTO)
+AUTO_PROBE_PAGES = 3
+# Próba HTTP przedstawia się jak przeglądarka – domyślny User-Agent requests sklepy często blokują
+PROBE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/109.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "pl,en-US;q=0.7,en;q=0.3",
+}
+
+
+def backend_mode(shop_name, default=AUTO):
+    """
+    Funkcja zwraca tryb pobierania sklepu: FETCH_BACKEND_<SKLEP> (np. FETCH_BACKEND_NEONET), FETCH_BACKEND albo domyślny.
+    """
+    mode = os.environ.get(f"FETCH_BACKEND_{shop_name.upper()}") or os.environ.get("FETCH_BACKEND") or default
+    if mode not in MODES:
+        logger.warning("Nieznany tryb pobierania '{}', używam {}", mode, default)
+        return default
+    return mode
+
+
+def missing_selectors(soup, required):
+    """
+    Funkcja zwraca wymagane selektory, których brakuje w HTML. Element required to selektor CSS
+    albo para (selektor, minimalna liczba elementów) – np. pełna strona kafelków, a nie tylko pierwsze z nich.
+    """
+    missing = []
+    for entry in required:
+        selector, minimum = (entry, 1) if isinstance(entry, str) else entry
+        found = len(soup.select(selector, limit=minimum)) if minimum > 1 else int(soup.select_one(selector) is not None)
+        if found < minimum:
+            missing.append(selector)
+    return missing
+
+
+class FetchBackend:
+    """
+    Pobieranie stron jednego sklepu wybranym trybem ze statystyką: ile stron obsłużyło HTTP,
+    ile wymagało przeglądarki mimo próby HTTP (fallback) i ile od razu szło do przeglądarki.
+    """
+
+    def __init__(self, shop_name, required, mode=None, fetcher=None, next_page=None):
+        self.shop_name = shop_name
+        self.required = tuple(required)
+        # Selektor odnośnika do następnej strony: strona bez niego to ostatnia strona listingu,
+        # która może mieć mniej kafelków niż wymagane minimum
+        self.next_page = next_page
+        self.mode = mode or backend_mode(shop_name)
+        self._fetcher = fetcher
+        self._own_fetcher = fetcher is None
+        self._lock = threading.Lock()
+        self.stats = {"http": 0, "fallback": 0, "browser": 0}
+        self._auto_browser = False
+        logger.info("Pobieranie stron {}: tryb {}.", shop_name, self.mode)
+
+    @property
+    def fetcher(self):
+        with self._lock:
+            if self._fetcher is None:
+                self._fetcher = HttpFetcher(headers=PROBE_HEADERS, probe=True)
+            return self._fetcher
+
+    def last_page_required(self, required=None):
+        """
+        Funkcja zwraca wymagane selektory dla ostatniej strony listingu – bez minimalnych liczb elementów.
+        """
+        required = self.required if required is None else required
+        return tuple(entry if isinstance(entry, str) else entry[0] for entry in required)
+
+    def _use_http(self):
+        if self.mode == BROWSER:
+            return False
+        if self.mode != AUTO:
+            return True
+        with self._lock:
+            return not self._auto_browser
+
+    def _count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+            if (self.mode == AUTO and not self._auto_browser and not self.stats["http"]
+                    and self.stats["fallback"] >= AUTO_PROBE_PAGES):
+                self._auto_browser = True
+                logger.info("{}: {} stron bez wymaganych elementów w HTML – dalej tylko przeglądarka.",
+                            self.shop_name, self.stats["fallback"])
+
+    def fetch(self, url, browser_fetch, required=None):
+        """
+        Funkcja zwraca zrzut strony (BeautifulSoup). browser_fetch() pobiera stronę przeglądarką
+        i jest wywoływana tylko wtedy, gdy wybrany tryb tego wymaga. W trybie http zwraca None przy braku selektorów.
+        """
+        required = self.required if required is None else tuple(required)
+        if self._use_http():
+            html = self.fetcher.fetch(url)
+            if html is not None:
+                with stage(HTML_PARSE):
+                    soup = BeautifulSoup(html, "html.parser")
+                missing = missing_selectors(soup, required)
+                if missing and self.next_page and soup.select_one(self.next_page) is None:
+                    missing = missing_selectors(soup, self.last_page_required(required))
+                if not missing:
+                    self._count("http")
+                    return soup
+                logger.info("{}: w HTML brakuje {} – {}", self.shop_name, ", ".join(missing),
+                            "pomijam stronę" if self.mode == HTTP else "pobieram przeglądarką")
+            if self.mode == HTTP:
+                self._count("fallback")
+                return None
+            self._count("fallback")
+        else:
+            self._count("browser")
+        return browser_fetch()
+
+    def fallback_rate(self):
+        with self._lock:
+            tried = self.stats["http"] + self.stats["fallback"]
+            return self.stats["fallback"] / tried if tried else None
+
+    def log_summary(self):
+        rate = self.fallback_rate()
+        logger.info(
+            "Pobieranie stron {} (tryb {}): HTTP {}, przeglądarka po próbie HTTP {}, tylko przeglądarka {}; "
+            "odsetek fallbacków: {}.",
+            self.shop_name, self.mode, self.stats["http"], self.stats["fallback"], self.stats["browser"],
+            f"{100 * rate:.0f}%" if rate is not None else "-"
+        )
+
+    def close(self):
+        self.log_summary()
+        if self._own_fetcher and self._fetcher is not None:
+            self._fetcher.close()
@@ -0,0 +1,125 @@
+# Pamięć podręczna odpowiedzi HTTP na dysku (SQLite) z walidatorami ETag / Last-Modified
+# Przy kolejnym przebiegu HttpFetcher wysyła If-None-Match / If-Modified-Since, a na 304 zwraca zapisaną treść.
+# HTTP_CACHE=0 wyłącza pamięć podręczną.
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+
+from loguru import logger
+
+DEFAULT_HTTP_CACHE_PATH = os.path.join("output", "http_cache.sqlite")
+BUSY_TIMEOUT = 30
+
+
+def http_cache_enabled():
+    return os.environ.get("HTTP_CACHE", "1") != "0"
+
+
+class HttpCache:
+    """
+    Tabela http_cache: adres -> walidatory (ETag, Last-Modified) i skompresowana treść ostatniej odpowiedzi 200.
+    Zapisywane są tylko odpowiedzi z co najmniej jednym walidatorem – bez nich serwer i tak nie odpowie 304.
+    """
+
+    def __init__(self, path=DEFAULT_HTTP_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Z połączenia korzystają wątki puli HttpFetcher, dlatego jest współdzielone pod blokadą.
+        # Plik współdzielą też równoległe sklepy (run_all.py), więc zablokowana baza czeka zamiast zgłaszać błąd.
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at TEXT NOT NULL
+            )"""
+        )
+        self.connection.commit()
+        self.stats = {"requests": 0, "revalidated": 0, "hits": 0, "bytes_downloaded": 0, "bytes_saved": 0}
+
+    def conditional_headers(self, url):
+        """
+        Funkcja zwraca nagłówki warunkowego zapytania dla adresu (pusty słownik, gdy brak wpisu).
+        Błąd bazy jest traktowany jak brak wpisu – strona zostanie pobrana w całości.
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            try:
+                row = self.connection.execute(
+                    "SELECT etag, last_modified FROM http_cache WHERE url = ?", (url,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning("Pamięć podręczna HTTP niedostępna dla {}: {}", url, e)
+                return {}
+            if row is None:
+                return {}
+            self.stats["revalidated"] += 1
+        etag, last_modified = row
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def not_modified(self, url):
+        """
+        Funkcja zwraca zapisaną treść po odpowiedzi 304 (albo None, jeśli wpis zniknął lub baza jest niedostępna).
+        """
+        with self._lock:
+            try:
+                row = self.connection.execute("SELECT body, size FROM http_cache WHERE url = ?", (url,)).fetchone()
+            except sqlite3.Error as e:
+                logger.warning("Pamięć podręczna HTTP niedostępna dla {}: {}", url, e)
+                return None
+            if row is None:
+                return None
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += row[1]
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def store(self, url, response):
+        """
+        Funkcja zapisuje odpowiedź 200 razem z walidatorami (jeśli serwer je podał).
+        Nieudany zapis trafia tylko do logu – strona jest już pobrana, a przy następnym przebiegu wpis powstanie ponownie.
+        """
+        body = response.content
+        with self._lock:
+            self.stats["bytes_downloaded"] += len(body)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        text = response.text
+        with self._lock:
+            try:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, body, size, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, etag, last_modified, zlib.compress(text.encode("utf-8")), len(body),
+                     datetime.now().isoformat(timespec="seconds")),
+                )
+                self.connection.commit()
+            except sqlite3.Error as e:
+                self.connection.rollback()
+                logger.warning("Nie udało się zapisać strony {} w pamięci podręcznej HTTP: {}", url, e)
+
+    def log_summary(self):
+        stats = self.stats
+        if not stats["requests"]:
+            return
+        logger.info(
+            "Pamięć podręczna HTTP: {} zapytań, {} warunkowych, {} bez zmian (304, {:.0f}% trafień), "
+            "pobrano {:.1f} MB, zaoszczędzono {:.1f} MB.",
+            stats["requests"], stats["revalidated"], stats["hits"], 100 * stats["hits"] / stats["requests"],
+            stats["bytes_downloaded"] / 1e6, stats["bytes_saved"] / 1e6
+        )
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,134 @@
+# Wspólna warstwa pobierania stron przez HTTP (requests) z pulą połączeń i ograniczoną współbieżnością
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+from http_cache import HttpCache, http_cache_enabled
+import rate_limiter
+import replay
+
+DEFAULT_WORKERS = 8
+DEFAULT_PER_HOST = 4
+
+
+class HttpFetcher:
+    """
+    Pobieranie stron przez jedną sesję requests (połączenia keep-alive są ponownie używane)
+    z pulą wątków, limitem równoczesnych zapytań na jeden host i warunkowymi zapytaniami (http_cache.py).
+    """
+
+    def __init__(self, workers=None, per_host=None, timeout=10, cache=None, headers=None, probe=False):
+        self.workers = workers or int(os.environ.get("HTTP_WORKERS", DEFAULT_WORKERS))
+        self.per_host = per_host or int(os.environ.get("HTTP_PER_HOST", DEFAULT_PER_HOST))
+        self.timeout = timeout
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        # Próba (probe=True): 403 / captcha oznacza tylko, że stronę trzeba pobrać inaczej (np. przeglądarką),
+        # więc nie zatrzymuje wspólnego limitera domeny
+        self.probe = probe
+        retries = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.workers, max_retries=retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._host_lock = threading.Lock()
+        self._host_limits = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+        if cache is None and http_cache_enabled():
+            cache = HttpCache()
+        self.cache = cache or None
+        # Adresy, które w tym przebiegu odpowiedziały 304 – strona bez zmian od poprzedniego pobrania
+        self._not_modified = set()
+
+    def _host_limit(self, url):
+        with self._host_lock:
+            return self._host_limits[urlsplit(url).netloc]
+
+    def fetch(self, url):
+        """
+        Funkcja pobiera stronę i zwraca jej treść lub None w razie problemów z łączem.
+        """
+        try:
+            headers = self.cache.conditional_headers(url) if self.cache else {}
+            response = self._get(url, headers)
+            if response is None:
+                return None
+            if response.status_code == 304 and self.cache:
+                text = self.cache.not_modified(url)
+                if text is not None:
+                    with self._host_lock:
+                        self._not_modified.add(url)
+                    replay.record_page(url, text)
+                    return text
+                # Wpis zniknął z pamięci podręcznej – pobieramy stronę bez walidatorów (też w miejscu od limitera)
+                response = self._get(url, {})
+                if response is None:
+                    return None
+            if self.cache:
+                self.cache.store(url, response)
+            replay.record_page(url, response.text)
+            return response.text
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Błąd podczas pobierania strony {url}: {e}")
+            return None
+
+    def _get(self, url, headers):
+        """
+        Funkcja wysyła jedno zapytanie w miejscu przydzielonym przez limiter i zwraca odpowiedź
+        albo None, jeśli zamiast treści przyszła strona blokady.
+        """
+        # Tempo zapytań do domeny ustala wspólny limiter (rate_limiter.py), per_host to twardy limit tej sesji
+        with self._host_limit(url), rate_limiter.request_slot(url) as slot:
+            started = time.monotonic()
+            response = self.session.get(replay.rewrite_url(url), headers=headers, timeout=self.timeout)
+            elapsed = time.monotonic() - started
+            metrics.observe(metrics.HTTP_GET, elapsed)
+            replay.record_latency(elapsed)
+            slot.status = response.status_code
+            slot.retry_after = rate_limiter.retry_after_seconds(response.headers.get("Retry-After"))
+            blocked = response.status_code == 403 or rate_limiter.html_blocked(response.text)
+            slot.blocked = blocked and not self.probe
+        if blocked and self.probe:
+            logger.info("Strona blokady / captcha zamiast treści (próba HTTP): {}", url)
+            return None
+        response.raise_for_status()
+        if blocked:
+            logger.warning("Strona blokady / captcha zamiast treści: {}", url)
+            return None
+        return response
+
+    def not_modified(self, url):
+        """
+        Funkcja zwraca True, jeśli strona odpowiedziała w tym przebiegu 304 (treść bez zmian od poprzedniego pobrania).
+        """
+        with self._host_lock:
+            return url in self._not_modified
+
+    def fetch_many(self, urls):
+        """
+        Funkcja pobiera równolegle wiele stron i zwraca pary (url, treść) w kolejności wejściowej.
+        """
+        urls = list(urls)
+        return zip(urls, self._executor.map(self.fetch, urls))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+        if self.cache:
+            self.cache.log_summary()
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,84 @@
+# Doczytywanie leniwie ładowanej zawartości listingu (infinite scroll, kafelki i obrazki lazy-load)
+# Strona jest przewijana ekran po ekranie; po każdym kroku czekamy tylko, aż DOM się uspokoi, i liczymy produkty.
+# Przewijanie kończy się, gdy jesteśmy na dole strony, a liczba produktów i wysokość strony przestały się zmieniać.
+import threading
+import time
+
+from loguru import logger
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+import metrics
+from waits import dom_stable
+
+# Jeden krok = jedno zapytanie JS: przewinięcie o ekran, czy to już dół strony, liczba produktów i wysokość strony
+SCROLL_STEP_SCRIPT = """
+var selector = arguments[0];
+window.scrollBy(0, window.innerHeight);
+var height = document.documentElement.scrollHeight;
+var bottom = window.scrollY + window.innerHeight >= height - 2;
+return [bottom, selector ? document.querySelectorAll(selector).length : -1, height];
+"""
+
+DEFAULT_QUIET_MS = 150
+DEFAULT_STEP_TIMEOUT = 1.0
+DEFAULT_MAX_STEPS = 60
+# Tyle kolejnych kroków na dole strony bez zmiany liczby produktów i wysokości kończy przewijanie
+# (jeden to za mało – doczytanie przez sieć może trwać dłużej niż quiet_ms)
+STABLE_STEPS = 2
+
+# Statystyki: etykieta -> [liczba stron, kroki, czas]
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def scroll_until_stable(driver, item_selector=None, quiet_ms=DEFAULT_QUIET_MS, step_timeout=DEFAULT_STEP_TIMEOUT,
+                        max_steps=DEFAULT_MAX_STEPS, label="lazy-load", scroll_back=True):
+    """
+    Funkcja przewija stronę krok po kroku, aż doczyta się cała leniwa zawartość, i zwraca liczbę produktów
+    (elementów item_selector; -1 bez selektora). Po każdym kroku czeka najwyżej step_timeout s na uspokojenie DOM.
+    """
+    started = time.perf_counter()
+    count = height = None
+    stable = steps = 0
+    for steps in range(1, max_steps + 1):
+        at_bottom, new_count, new_height = driver.execute_script(SCROLL_STEP_SCRIPT, item_selector)
+        try:
+            WebDriverWait(driver, step_timeout, poll_frequency=0.05).until(dom_stable(quiet_ms))
+        except TimeoutException:
+            # Strona ciągle się zmienia (np. karuzela) – nie czekamy dłużej niż jeden krok
+            pass
+        unchanged = new_count == count and new_height == height
+        count, height = new_count, new_height
+        stable = stable + 1 if at_bottom and unchanged else 0
+        if stable >= STABLE_STEPS:
+            break
+    else:
+        logger.warning("{}: osiągnięto limit {} kroków przewijania.", label, max_steps)
+    if scroll_back:
+        driver.execute_script("window.scrollTo(0, 0);")
+    elapsed = time.perf_counter() - started
+    metrics.observe(metrics.LAZY_LOAD, elapsed)
+    with _stats_lock:
+        entry = _stats.setdefault(label, [0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += steps
+        entry[2] += elapsed
+    if item_selector:
+        logger.info("{}: {} produktów po {} krokach przewijania ({:.2f} s).", label, count, steps, elapsed)
+    else:
+        logger.info("{}: {} kroków przewijania ({:.2f} s).", label, steps, elapsed)
+    return count
+
+
+def log_lazy_load_summary():
+    """
+    Funkcja zapisuje w logu, ile kroków przewijania i czasu potrzebowała średnio jedna strona.
+    """
+    with _stats_lock:
+        stats = {label: list(values) for label, values in _stats.items()}
+    for label, (pages, steps, seconds) in sorted(stats.items()):
+        logger.info(
+            "Doczytywanie '{}': {} stron, średnio {:.1f} kroków i {:.2f} s na stronę, łącznie {:.1f} s.",
+            label, pages, steps / pages, seconds / pages, seconds
+        )
@@ -0,0 +1,135 @@
+# Odchudzony profil Firefoksa: bez obrazów, czcionek, multimediów i skryptów reklamowo-analitycznych
+import base64
+import os
+
+from loguru import logger
+
+# Zasoby, których skrypty nie potrzebują, bo odczytują tylko tekst i atrybuty HTML
+RESOURCE_PREFERENCES = {
+    # permissions.default.image = 2 blokuje pobieranie obrazów (atrybuty src w DOM pozostają)
+    "images": {"permissions.default.image": 2},
+    "fonts": {"gfx.downloadable_fonts.enabled": False},
+    "media": {
+        "media.autoplay.default": 5,
+        "media.autoplay.blocking_policy": 2,
+        "media.preload.default": 0,
+        "media.preload.auto": 0,
+        "media.mediasource.enabled": False,
+    },
+}
+
+# Ochrona przed śledzeniem wbudowana w Firefoksa (listy Disconnect)
+TRACKING_PROTECTION_PREFERENCES = {
+    "privacy.trackingprotection.enabled": True,
+    "privacy.trackingprotection.socialtracking.enabled": True,
+    "privacy.trackingprotection.cryptomining.enabled": True,
+    "privacy.trackingprotection.fingerprinting.enabled": True,
+}
+
+# Hosty reklamowe i analityczne spotykane na stronach sklepów (blokowane przez plik PAC)
+BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "facebook.net",
+    "facebook.com",
+    "hotjar.com",
+    "criteo.com",
+    "criteo.net",
+    "tiktok.com",
+    "bing.com",
+    "clarity.ms",
+    "onetrust.com",
+    "cookielaw.org",
+    "yandex.ru",
+    "sentry.io",
+    "newrelic.com",
+    "nr-data.net",
+    "dynatrace.com",
+    "trustpilot.com",
+    "salesmanago.pl",
+    "edrone.me",
+    "synerise.com",
+    "wp.pl",
+    "gemius.pl",
+)
+
+# Wyjątki dla sklepów: typy zasobów, których nie blokujemy, oraz hosty usunięte z listy blokowanych, np.
+# "mediamarkt": {"resources": ("fonts",), "hosts": ("bing.com",)}
+SHOP_ALLOWLIST = {}
+
+# Adres, na który kierujemy zablokowane hosty – port 9 (discard) odrzuca połączenie od razu
+BLACKHOLE_PROXY = "PROXY 127.0.0.1:9"
+
+PAGE_METRICS_SCRIPT = """
+var navigation = performance.getEntriesByType("navigation")[0];
+var resources = performance.getEntriesByType("resource");
+var bytes = navigation ? navigation.transferSize : 0;
+for (var i = 0; i < resources.length; i++) { bytes += resources[i].transferSize || 0; }
+var load = navigation && navigation.loadEventEnd > 0 ? navigation.loadEventEnd : performance.now();
+return {bytes: bytes, load_ms: load, resources: resources.length};
+"""
+
+
+def lean_profile_enabled():
+    # LEAN_PROFILE=0 przywraca pełne ładowanie stron (np. do porównania lub diagnozy)
+    return os.environ.get("LEAN_PROFILE", "1") != "0"
+
+
+def _pac_script(hosts):
+    conditions = " ||\n        ".join(
+        f'host == "{host}" || dnsDomainIs(host, ".{host}")' for host in hosts
+    )
+    return (
+        "function FindProxyForURL(url, host) {\n"
+        f"    if ({conditions}) {{\n"
+        f'        return "{BLACKHOLE_PROXY}";\n'
+        "    }\n"
+        '    return "DIRECT";\n'
+        "}\n"
+    )
+
+
+def apply_lean_profile(options, shop_name=None, enabled=None):
+    """
+    Funkcja ustawia w FirefoxOptions blokowanie obrazów, czcionek, multimediów i hostów reklamowo-analitycznych
+    z uwzględnieniem wyjątków sklepu z SHOP_ALLOWLIST. Zwraca te same opcje.
+    """
+    if enabled is None:
+        enabled = lean_profile_enabled()
+    if not enabled:
+        return options
+    allow = SHOP_ALLOWLIST.get(shop_name, {})
+    allowed_resources = set(allow.get("resources", ()))
+    allowed_hosts = set(allow.get("hosts", ()))
+
+    for resource, preferences in RESOURCE_PREFERENCES.items():
+        if resource in allowed_resources:
+            continue
+        for name, value in preferences.items():
+            options.set_preference(name, value)
+    for name, value in TRACKING_PROTECTION_PREFERENCES.items():
+        options.set_preference(name, value)
+
+    hosts = [host for host in BLOCKED_HOSTS if host not in allowed_hosts]
+    if hosts:
+        pac = base64.b64encode(_pac_script(hosts).encode()).decode()
+        # network.proxy.type = 2: konfiguracja proxy z pliku PAC (tu osadzonego jako data: URL)
+        options.set_preference("network.proxy.type", 2)
+        options.set_preference("network.proxy.autoconfig_url", f"data:application/x-ns-proxy-autoconfig;base64,{pac}")
+        # Bez tego Firefox po odrzuconym połączeniu z proxy ponawia zapytanie bezpośrednio i host nie jest blokowany
+        options.set_preference("network.proxy.failover_direct", False)
+
+    blocked = sorted(set(RESOURCE_PREFERENCES) - allowed_resources)
+    logger.info("Odchudzony profil przeglądarki: blokowane {} oraz {} hostów śledzących.", ", ".join(blocked), len(hosts))
+    return options
+
+
+def page_metrics(driver):
+    """
+    Funkcja zwraca liczbę bajtów przesłanych dla bieżącej strony (dokument i zasoby) oraz czas ładowania w ms.
+    Zasoby z innych domen bez nagłówka Timing-Allow-Origin raportują transferSize = 0, więc wynik jest dolnym oszacowaniem.
+    """
+    return driver.execute_script(PAGE_METRICS_SCRIPT)
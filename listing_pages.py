@@ -0,0 +1,79 @@
+# Równoległe pobieranie stron listingu
+# Gdy liczba stron jest znana po pierwszej stronie (Neonet, MediaExpert), strony 2..N trafiają do puli workerów
+# (fan_out_pages), a gdy nie jest (Morele, RTV) – następna strona jest pobierana z wyprzedzeniem, zanim skrypt
+# skończy przetwarzać bieżącą (prefetch_pages). Wyniki zawsze wracają w kolejności stron, więc CSV wygląda tak samo.
+# LISTING_WORKERS ustawia liczbę równoległych workerów (LISTING_WORKERS=1 – strony po kolei w jednej przeglądarce).
+import os
+import threading
+
+from loguru import logger
+
+from driver_pool import DriverPool
+
+DEFAULT_LISTING_WORKERS = 3
+
+
+def get_listing_workers(default=DEFAULT_LISTING_WORKERS):
+    """
+    Funkcja zwraca liczbę workerów listingu ustawioną w zmiennej środowiskowej LISTING_WORKERS.
+    """
+    try:
+        return max(1, int(os.environ.get("LISTING_WORKERS", default)))
+    except ValueError:
+        logger.warning("Niepoprawna wartość LISTING_WORKERS, używam {}", default)
+        return default
+
+
+def _reusing_factory(worker_factory, reuse):
+    # Pierwszy wątek puli przejmuje przeglądarkę, która pobrała już pierwszą stronę (bez dodatkowego startu)
+    spare = [reuse] if reuse is not None else []
+    lock = threading.Lock()
+
+    def factory():
+        with lock:
+            if spare:
+                return spare.pop()
+        return worker_factory()
+
+    return factory
+
+
+def fan_out_pages(worker_factory, fetch_page, pages, workers=None, reuse=None):
+    """
+    Funkcja pobiera strony równolegle przez fetch_page(worker, page) i zwraca pary (page, wynik) w kolejności stron.
+    Worker to np. BrowserManager – każdy wątek puli ma własnego i zamyka go przez quit() na końcu.
+    """
+    pages = list(pages)
+    if not pages:
+        return iter(())
+    workers = min(workers or get_listing_workers(), len(pages))
+    logger.info("Pobieranie stron {}–{} w {} workerach.", pages[0], pages[-1], workers)
+    return DriverPool(_reusing_factory(worker_factory, reuse), workers=workers).imap(fetch_page, pages)
+
+
+def prefetch_pages(worker_factory, fetch_page, first_page=1, ahead=1, reuse=None):
+    """
+    Funkcja zwraca kolejne pary (page, wynik) od first_page bez znanej liczby stron: gdy skrypt przetwarza
+    stronę N, strony do N+ahead są już pobierane w osobnych workerach. Skrypt kończy pętlę przez break,
+    a strony pobrane na zapas po ostatniej są pomijane.
+    """
+    ahead = min(ahead, get_listing_workers() - 1)
+    # Liczba stron pobieranych lub czekających na przetworzenie naraz (bieżąca + ahead)
+    slots = threading.Semaphore(ahead + 1)
+    done = threading.Event()
+
+    def page_numbers():
+        page = first_page
+        while not done.is_set():
+            if slots.acquire(timeout=0.1):
+                yield page
+                page += 1
+
+    results = DriverPool(_reusing_factory(worker_factory, reuse), workers=ahead + 1).imap(fetch_page, page_numbers())
+    try:
+        for page, result in results:
+            yield page, result
+            slots.release()
+    finally:
+        done.set()
+        results.close()
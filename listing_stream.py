@@ -0,0 +1,85 @@
+# Przekazywanie linków z listingu do skryptów *_dane_techniczne.py: z gotowego pliku albo strumieniowo w trakcie listingu
+import csv
+import os
+import time
+
+from loguru import logger
+
+from run_manifest import LISTING, RunManifest
+
+DEFAULT_POLL_INTERVAL = 0.5
+# Po tylu sekundach bez nowych wierszy uznajemy, że listing przerwał się bez wpisu w rejestrze
+DEFAULT_IDLE_TIMEOUT = 600
+
+
+def stream_enabled():
+    # STREAM_LISTING=1 ustawia run_all.py --stream: dane techniczne startują razem z listingiem
+    return os.environ.get("STREAM_LISTING") == "1"
+
+
+def read_listing(path, key="product_link"):
+    """
+    Funkcja wczytuje linki produktów z gotowego pliku CSV listingu.
+    """
+    product_data = []
+    with open(path, mode="r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get(key):
+                product_data.append({key: row[key]})
+    logger.info("Znaleziono {} produktów do przetworzenia.", len(product_data))
+    return product_data
+
+
+def follow_listing(shop, date, output_folder="output", key="product_link",
+                   poll_interval=DEFAULT_POLL_INTERVAL, idle_timeout=None):
+    """
+    Generator zwraca linki produktów z pliku CSV listingu, który jest jeszcze zapisywany (jak tail -f).
+    Kończy się, gdy rejestr przebiegów oznaczy listing z danego dnia jako zakończony i plik zostanie doczytany.
+    Pula (DriverPool.imap) pobiera elementy leniwie, więc tempo czytania ogranicza liczba wolnych workerów.
+    """
+    if idle_timeout is None:
+        idle_timeout = float(os.environ.get("LISTING_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT))
+    manifest = RunManifest(os.path.join(output_folder, "run_manifest.sqlite"))
+    default_path = os.path.join(output_folder, f"{shop}_{date}.csv")
+    seen = set()
+    header = None
+    buffer = ""
+    last_progress = time.monotonic()
+    path = None
+    f = None
+    try:
+        while True:
+            status, manifest_path = manifest.status(shop, LISTING, date)
+            # Plik otwieramy dopiero, gdy listing z tego dnia zgłosi się w rejestrze (nie czytamy pliku z wcześniejszego przebiegu)
+            if f is None and status is not None:
+                path = manifest_path or default_path
+                if os.path.exists(path):
+                    f = open(path, mode="r", encoding="utf-8", newline="")
+                    logger.info("Tryb strumieniowy: czytanie listingu w trakcie zapisu: {}", path)
+            chunk = f.read() if f is not None else ""
+            if chunk:
+                last_progress = time.monotonic()
+                buffer += chunk
+                # Przetwarzamy tylko pełne linie – ostatnia może być jeszcze w trakcie zapisu
+                complete, _, buffer = buffer.rpartition("\n")
+                for values in csv.reader(complete.splitlines()):
+                    if header is None:
+                        header = values
+                        continue
+                    row = dict(zip(header, values))
+                    link = row.get(key)
+                    if link and link not in seen:
+                        seen.add(link)
+                        yield {key: link}
+                continue
+            if status not in (None, "running"):
+                break
+            if time.monotonic() - last_progress > idle_timeout:
+                logger.warning("Listing {} nie zapisał nowych wierszy od {:.0f} s, kończę tryb strumieniowy.", shop, idle_timeout)
+                break
+            time.sleep(poll_interval)
+    finally:
+        if f is not None:
+            f.close()
+        manifest.close()
+        logger.info("Tryb strumieniowy: przekazano {} produktów z listingu.", len(seen))
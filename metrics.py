@@ -0,0 +1,201 @@
+# Pomiar czasu etapów scrapera (pobranie strony, oczekiwanie, wyszukiwanie elementów, parsowanie, zapis)
+# Histogramy na sklep i etap, eksport na koniec przebiegu do JSON oraz do pliku tekstowego Prometheusa
+# (output/metrics/*.prom – katalog dla textfile collectora node_exportera)
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from loguru import logger
+
+DEFAULT_METRICS_FOLDER = os.path.join("output", "metrics")
+
+# Górne granice przedziałów histogramu w sekundach (jak domyślne kubełki klienta Prometheusa, rozszerzone o 30 s)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Nazwy etapów używane przez wspólne moduły i skrypty
+BROWSER_START = "browser_start"
+DRIVER_GET = "driver_get"
+HTTP_GET = "http_get"
+RATE_LIMIT = "rate_limit"
+WAIT = "wait"
+LAZY_LOAD = "lazy_load"
+ELEMENT_LOOKUP = "element_lookup"
+PAGE_SOURCE = "page_source"
+HTML_PARSE = "html_parse"
+STRUCTURED_DATA = "structured_data"
+PARSE_PRODUCT = "parse_product"
+CSV_WRITE = "csv_write"
+HISTORY_WRITE = "history_write"
+
+_lock = threading.Lock()
+# (sklep, etap) -> [liczniki kubełków, liczba pomiarów, suma, maksimum]
+_histograms = {}
+_run = {"shop": "unknown", "run_type": "unknown", "started": time.monotonic()}
+
+
+def start_run(shop, run_type):
+    """
+    Funkcja ustawia sklep i rodzaj przebiegu, do których trafiają kolejne pomiary (jeden skrypt = jeden przebieg).
+    """
+    with _lock:
+        _run.update(shop=shop, run_type=run_type, started=time.monotonic())
+
+
+def observe(stage_name, seconds, shop=None):
+    """
+    Funkcja dopisuje pojedynczy pomiar czasu etapu do histogramu.
+    """
+    with _lock:
+        key = (shop or _run["shop"], stage_name)
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [[0] * len(BUCKETS), 0, 0.0, 0.0]
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                entry[0][index] += 1
+                break
+        entry[1] += 1
+        entry[2] += seconds
+        entry[3] = max(entry[3], seconds)
+
+
+@contextmanager
+def stage(stage_name, shop=None):
+    """
+    Menedżer kontekstu mierzący czas bloku kodu, np. with stage(CSV_WRITE): writer.writerow(row)
+    Czas jest zapisywany także wtedy, gdy blok zakończy się wyjątkiem.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage_name, time.perf_counter() - started, shop)
+
+
+def _quantile(buckets, count, fraction):
+    # Przybliżenie kwantyla górną granicą kubełka (jak histogram_quantile bez interpolacji)
+    if not count:
+        return 0.0
+    target = fraction * count
+    cumulative = 0
+    for bound, bucket_count in zip(BUCKETS, buckets):
+        cumulative += bucket_count
+        if cumulative >= target:
+            return bound
+    return float("inf")
+
+
+def _finite(value):
+    # Kwantyl powyżej ostatniego kubełka nie ma górnej granicy – w JSON zapisujemy null zamiast Infinity
+    return value if value != float("inf") else None
+
+
+def snapshot():
+    """
+    Funkcja zwraca bieżący stan pomiarów jako słownik gotowy do zapisu w JSON.
+    """
+    with _lock:
+        histograms = {key: (list(entry[0]), entry[1], entry[2], entry[3]) for key, entry in _histograms.items()}
+        run = dict(_run)
+    stages = []
+    for (shop, stage_name), (buckets, count, total, maximum) in sorted(histograms.items()):
+        stages.append({
+            "shop": shop,
+            "stage": stage_name,
+            "count": count,
+            "sum_seconds": round(total, 4),
+            "mean_seconds": round(total / count, 4) if count else 0.0,
+            "max_seconds": round(maximum, 4),
+            "p50_seconds": _finite(_quantile(buckets, count, 0.5)),
+            "p95_seconds": _finite(_quantile(buckets, count, 0.95)),
+            "buckets": dict(zip((str(bound) for bound in BUCKETS), buckets)),
+        })
+    return {
+        "shop": run["shop"],
+        "run_type": run["run_type"],
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "wall_seconds": round(time.monotonic() - run["started"], 3),
+        "stages": stages,
+    }
+
+
+def _labels(**labels):
+    # Wartości etykiet to nazwy sklepów i etapów z kodu – bez znaków wymagających escapowania
+    return ",".join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def to_prometheus(data):
+    """
+    Funkcja zamienia wynik snapshot() na format tekstowy Prometheusa (histogram skumulowany + czas przebiegu).
+    """
+    lines = [
+        "# HELP scraper_stage_duration_seconds Czas etapów scrapera.",
+        "# TYPE scraper_stage_duration_seconds histogram",
+    ]
+    for entry in data["stages"]:
+        base = {"shop": entry["shop"], "run_type": data["run_type"], "stage": entry["stage"]}
+        cumulative = 0
+        for bound, bucket_count in entry["buckets"].items():
+            cumulative += bucket_count
+            lines.append(f"scraper_stage_duration_seconds_bucket{{{_labels(**base, le=bound)}}} {cumulative}")
+        lines.append(f"scraper_stage_duration_seconds_bucket{{{_labels(**base, le='+Inf')}}} {entry['count']}")
+        lines.append(f"scraper_stage_duration_seconds_sum{{{_labels(**base)}}} {entry['sum_seconds']}")
+        lines.append(f"scraper_stage_duration_seconds_count{{{_labels(**base)}}} {entry['count']}")
+    run_labels = _labels(shop=data["shop"], run_type=data["run_type"])
+    lines += [
+        "# HELP scraper_run_duration_seconds Czas całego przebiegu skryptu.",
+        "# TYPE scraper_run_duration_seconds gauge",
+        f"scraper_run_duration_seconds{{{run_labels}}} {data['wall_seconds']}",
+        "# HELP scraper_run_finished_timestamp_seconds Czas zakończenia przebiegu (unix).",
+        "# TYPE scraper_run_finished_timestamp_seconds gauge",
+        f"scraper_run_finished_timestamp_seconds{{{run_labels}}} {int(time.time())}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    # Zapis przez plik tymczasowy – collector nigdy nie odczyta połowy pliku
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def log_summary(data=None, top=5):
+    """
+    Funkcja zapisuje w logu etapy, które zajęły najwięcej czasu w tym przebiegu.
+    Przy wielu workerach suma czasów etapów może przekraczać czas przebiegu.
+    """
+    data = data or snapshot()
+    measured = sum(entry["sum_seconds"] for entry in data["stages"])
+    if not measured:
+        return
+    logger.info("Najdłuższe etapy przebiegu {} / {} (czas działania {:.1f} s):",
+                data["shop"], data["run_type"], data["wall_seconds"])
+    for entry in sorted(data["stages"], key=lambda item: item["sum_seconds"], reverse=True)[:top]:
+        logger.info(
+            "  {}: {:.1f} s ({:.0f}% zmierzonego czasu), {} razy, średnio {:.3f} s, p95 ≤ {} s, maks. {:.2f} s",
+            entry["stage"], entry["sum_seconds"], 100 * entry["sum_seconds"] / measured, entry["count"],
+            entry["mean_seconds"], entry["p95_seconds"] if entry["p95_seconds"] is not None else f"> {BUCKETS[-1]:g}",
+            entry["max_seconds"]
+        )
+
+
+def finish_run(folder=None, top=5):
+    """
+    Funkcja zapisuje pomiary przebiegu do <sklep>_<rodzaj>_<data>.json i <sklep>_<rodzaj>.prom oraz loguje najdłuższe etapy.
+    Plik .prom jest nadpisywany przy każdym przebiegu, więc Prometheus zawsze widzi ostatni wynik sklepu.
+    """
+    folder = folder or os.environ.get("METRICS_FOLDER", DEFAULT_METRICS_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    data = snapshot()
+    name = f"{data['shop']}_{data['run_type']}"
+    json_path = os.path.join(folder, f"{name}_{datetime.now().strftime('%Y-%m-%d')}.json")
+    _write_atomic(json_path, json.dumps(data, ensure_ascii=False, indent=2))
+    _write_atomic(os.path.join(folder, f"{name}.prom"), to_prometheus(data))
+    log_summary(data, top)
+    logger.info("Metryki etapów zapisane w {}", json_path)
+    return data
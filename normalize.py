@@ -0,0 +1,148 @@
+# Wspólna normalizacja cen i ocen ze wszystkich sklepów: cena w groszach (int), ocena w skali 0–5 (float)
+# Funkcje *_column przetwarzają całą kolumnę wartości naraz; każdy powtarzający się tekst jest parsowany tylko raz (lru_cache)
+import re
+from functools import lru_cache
+
+from loguru import logger
+
+CACHE_SIZE = 8192
+RATING_SCALE = 5
+
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _price_from_text(text):
+    # Formaty sklepów: "1299.00zł" (MediaExpert), "1 299,00" (RTV), "1 299,00 zł" (Neonet), "1.299" (separator tysięcy)
+    text = re.sub(r"[^\d,.]", "", text)
+    if not text:
+        return None
+    if "," in text and "." in text:
+        # Separatorem dziesiętnym jest ten, który występuje jako ostatni
+        decimal = "," if text.rfind(",") > text.rfind(".") else "."
+        text = text.replace("." if decimal == "," else ",", "").replace(decimal, ".")
+    elif "," in text:
+        text = text.replace(",", ".")
+    elif text.count(".") == 1 and len(text.rsplit(".", 1)[1]) == 3:
+        # "1.299" to separator tysięcy, nie grosze
+        text = text.replace(".", "")
+    try:
+        return round(float(text) * 100)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _rating_from_text(text):
+    # "4.5/5", "4,5 (12)", "4.5/5 (12 opinii)", "90%" (szerokość paska gwiazdek), "Brak opinii"
+    match = NUMBER_PATTERN.search(text)
+    if not match:
+        return None
+    value = float(match.group().replace(",", "."))
+    if text[match.end():].lstrip().startswith("%"):
+        value = value * RATING_SCALE / 100
+    else:
+        scale = re.match(r"\s*/\s*(\d+)", text[match.end():])
+        if scale and int(scale.group(1)) not in (0, RATING_SCALE):
+            value = value * RATING_SCALE / int(scale.group(1))
+    return round(value, 2)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _opinions_from_text(text):
+    bracket = re.search(r"\((\d+)", text)
+    if bracket:
+        return int(bracket.group(1))
+    if "/" in text:
+        # Sama ocena ("4.5/5") bez liczby opinii
+        return None
+    match = re.fullmatch(r"\s*(\d+)(?:\s*opini\w*)?\s*", text)
+    return int(match.group(1)) if match else None
+
+
+def parse_price_grosze(value):
+    """
+    Funkcja zamienia cenę w dowolnym formacie sklepu ("1 299,00 zł", "1299.0", 1299.0) na liczbę groszy.
+    Cena 0 oznacza w skryptach brak ceny (Morele, Elektromarket), więc zwracamy dla niej None.
+    """
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        grosze = round(value * 100)
+    else:
+        grosze = _price_from_text(str(value))
+    return grosze or None
+
+
+def parse_rating(value):
+    """
+    Funkcja zwraca ocenę w skali 0–5 jako float albo None (brak oceny lub ocena 0).
+    """
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        rating = float(value)
+    else:
+        rating = _rating_from_text(str(value))
+    return rating or None
+
+
+def parse_opinions(value):
+    """
+    Funkcja zwraca liczbę opinii: z samej liczby albo z nawiasu w polu reviews ("4.5/5 (12 opinii)").
+    """
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    return _opinions_from_text(str(value))
+
+
+def parse_availability(value):
+    if value is None or value == "":
+        return None
+    return 1 if str(value).strip().lower() in ("1", "true", "tak") else 0
+
+
+def price_column(values):
+    return [parse_price_grosze(value) for value in values]
+
+
+def rating_column(values):
+    return [parse_rating(value) for value in values]
+
+
+def opinions_column(values):
+    return [parse_opinions(value) for value in values]
+
+
+def availability_column(values):
+    return [parse_availability(value) for value in values]
+
+
+def normalize_rows(rows):
+    """
+    Funkcja normalizuje wiersze listingu kolumnami i zwraca listę słowników z polami
+    price_grosze, rating, num_of_opinions, availability (w kolejności wierszy).
+    Sklepy bez osobnych kolumn rating/num_of_opinions trzymają je w polu reviews ("4.5/5 (12 opinii)").
+    """
+    prices = price_column([row.get("price") for row in rows])
+    ratings = rating_column([row.get("rating", row.get("reviews")) for row in rows])
+    opinions = opinions_column([row.get("num_of_opinions", row.get("reviews")) for row in rows])
+    availability = availability_column([row.get("availability") for row in rows])
+    return [
+        {"price_grosze": price, "rating": rating, "num_of_opinions": count, "availability": available}
+        for price, rating, count, available in zip(prices, ratings, opinions, availability)
+    ]
+
+
+def log_cache_summary():
+    """
+    Funkcja zapisuje w logu, jak często wartości tekstowe trafiały do pamięci podręcznej parserów.
+    """
+    for name, parser in (("ceny", _price_from_text), ("oceny", _rating_from_text), ("opinie", _opinions_from_text)):
+        info = parser.cache_info()
+        total = info.hits + info.misses
+        if total:
+            logger.info("Normalizacja ({}): {} wartości, {} unikalnych ({:.0f}% z pamięci podręcznej).",
+                        name, total, info.misses, 100 * info.hits / total)
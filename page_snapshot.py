@@ -0,0 +1,34 @@
+# Jednorazowy zrzut strony (page_source) do parsowania w Pythonie zamiast setek zapytań do WebDrivera
+from bs4 import BeautifulSoup
+
+import replay
+from lazy_load import scroll_until_stable
+from metrics import HTML_PARSE, PAGE_SOURCE, stage
+
+
+def take_snapshot(driver, scroll=True, item_selector=None, label="lazy-load"):
+    """
+    Funkcja (opcjonalnie) doczytuje leniwą zawartość, pobiera page_source jednym zapytaniem
+    i zwraca sparsowany obiekt BeautifulSoup.
+    item_selector – selektor kafelka produktu; przewijanie kończy się, gdy ich liczba przestaje rosnąć (lazy_load.py).
+    """
+    if scroll:
+        scroll_until_stable(driver, item_selector, label=label)
+    with stage(PAGE_SOURCE):
+        html = driver.page_source
+    # Nagranie (REPLAY_RECORD) zawiera całą doczytaną listę produktów
+    replay.record_snapshot(driver, html)
+    with stage(HTML_PARSE):
+        return BeautifulSoup(html, "html.parser")
+
+
+def text_of(element, selector=None):
+    """
+    Funkcja zwraca oczyszczony tekst elementu (lub jego potomka wskazanego selektorem CSS) albo None.
+    """
+    if element is not None and selector:
+        element = element.select_one(selector)
+    if element is None:
+        return None
+    return " ".join(element.get_text(" ", strip=True).split())
+
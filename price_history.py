@@ -0,0 +1,431 @@
+# Wspólna historia cen wszystkich sklepów w jednej bazie SQLite (zamiast jednego pliku CSV na sklep i dzień)
+# PRICE_HISTORY_DELTA=1 – zapis tylko zmian (zdarzenia + okresowe pełne stany), zamiast całego katalogu każdego dnia
+# Import starych plików:  python price_history.py [--delta] import [folder]
+# Historia produktu:     python price_history.py [--delta] history <sklep> <link> [--days 90]
+# Stan sklepu w dniu:    python price_history.py --delta snapshot <sklep> <RRRR-MM-DD>
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+from loguru import logger
+
+from normalize import log_cache_summary, normalize_rows
+from tech_cache import canonical_link
+
+DEFAULT_HISTORY_PATH = os.path.join("output", "price_history.sqlite")
+# Sklepy uruchomione równolegle (run_all.py) piszą do tej samej bazy – czekamy na blokadę zamiast od razu zgłaszać błąd
+BUSY_TIMEOUT = 30
+
+# Tryb zmian: pola śledzone w zdarzeniach (bit pola w kolumnie changed = indeks na liście)
+TRACKED_FIELDS = ("price_grosze", "rating", "num_of_opinions", "availability")
+ALL_FIELDS_MASK = (1 << len(TRACKED_FIELDS)) - 1
+APPEAR, CHANGE, DISAPPEAR = "appear", "change", "disappear"
+# Pełny stan sklepu (keyframe) co tyle dni – odtworzenie dowolnego dnia czyta keyframe i zdarzenia z kilku dni
+DEFAULT_KEYFRAME_DAYS = 7
+# Zniknięcia zapisujemy tylko, gdy przebieg objął co najmniej taką część znanego katalogu
+# (przerwany przebieg nie może "usunąć" połowy sklepu)
+DISAPPEAR_MIN_SEEN = 0.5
+
+# Kolumny CSV sprowadzane do wspólnego schematu; pozostałe trafiają do kolumny extra (JSON)
+KNOWN_COLUMNS = {"date", "title", "product_link", "price", "rating", "num_of_opinions", "reviews", "availability", "image_url"}
+
+# Pliki listingu: <sklep>_<RRRR-MM-DD>.csv (bez tech_details_*, checkpointów itp.)
+LISTING_FILE_PATTERN = re.compile(r"^(?P<shop>[A-Za-z][A-Za-z_]*?)_(?P<date>\d{4}-\d{2}-\d{2})\.csv$")
+SKIPPED_PREFIXES = ("tech_details_", "checkpoint_", "log_")
+
+
+class PriceHistory:
+    """
+    Tabela prices ze wspólnym schematem dla wszystkich sklepów i kluczem (shop, product, date).
+    Ponowny zapis tego samego produktu tego samego dnia nadpisuje wiersz (upsert), więc powtórne uruchomienie jest bezpieczne.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH, delta=None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.delta = os.environ.get("PRICE_HISTORY_DELTA") == "1" if delta is None else delta
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS prices (
+                shop TEXT NOT NULL,
+                product TEXT NOT NULL,
+                date TEXT NOT NULL,
+                title TEXT,
+                price_grosze INTEGER,
+                price_text TEXT,
+                rating REAL,
+                num_of_opinions INTEGER,
+                availability INTEGER,
+                image_url TEXT,
+                extra TEXT,
+                PRIMARY KEY (shop, product, date)
+            )"""
+        )
+        # Zapytania "wszystkie sklepy dla produktu" i "cały sklep w danym dniu"
+        self.connection.execute("CREATE INDEX IF NOT EXISTS prices_product_date ON prices (product, date)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS prices_shop_date ON prices (shop, date)")
+        if self.delta:
+            self._create_delta_tables()
+        self.connection.commit()
+        # Tryb zmian: ostatni znany stan sklepu w pamięci i produkty widziane w bieżącym przebiegu
+        self._state = {}
+        self._seen = {}
+        self._days = {}
+        self.delta_stats = {"rows": 0, "events": 0}
+
+    def _create_delta_tables(self):
+        self.connection.executescript(
+            """CREATE TABLE IF NOT EXISTS price_state (
+                shop TEXT NOT NULL,
+                product TEXT NOT NULL,
+                price_grosze INTEGER,
+                rating REAL,
+                num_of_opinions INTEGER,
+                availability INTEGER,
+                present INTEGER NOT NULL,
+                title TEXT,
+                price_text TEXT,
+                PRIMARY KEY (shop, product)
+            );
+            CREATE TABLE IF NOT EXISTS price_events (
+                shop TEXT NOT NULL,
+                product TEXT NOT NULL,
+                date TEXT NOT NULL,
+                event TEXT NOT NULL,
+                changed INTEGER NOT NULL,
+                price_grosze INTEGER,
+                rating REAL,
+                num_of_opinions INTEGER,
+                availability INTEGER,
+                PRIMARY KEY (shop, product, date)
+            );
+            CREATE INDEX IF NOT EXISTS price_events_shop_date ON price_events (shop, date);
+            CREATE TABLE IF NOT EXISTS price_keyframes (
+                shop TEXT NOT NULL,
+                date TEXT NOT NULL,
+                product TEXT NOT NULL,
+                price_grosze INTEGER,
+                rating REAL,
+                num_of_opinions INTEGER,
+                availability INTEGER,
+                PRIMARY KEY (shop, date, product)
+            );"""
+        )
+
+    def record(self, shop, day, row):
+        """
+        Funkcja zapisuje wiersz listingu (słownik jak w CSV danego sklepu) w historii cen.
+        """
+        self.record_many(shop, day, [row])
+
+    def record_many(self, shop, day, rows):
+        """
+        Funkcja zapisuje wiersze listingu (np. całą stronę) w historii cen.
+        Ceny i oceny są normalizowane kolumnami (normalize.py) przed zapisem, więc analizy nie parsują już tekstu.
+        Każda partia jest od razu zatwierdzana – blokada zapisu nie jest trzymana w czasie ładowania kolejnej strony.
+        """
+        rows = [row for row in rows if row.get("product_link")]
+        if not rows:
+            return
+        if self.delta:
+            self._record_delta(shop, day, rows)
+            return
+        values = []
+        for row, normalized in zip(rows, normalize_rows(rows)):
+            extra = {key: value for key, value in row.items() if key not in KNOWN_COLUMNS and value not in (None, "")}
+            values.append((
+                shop,
+                canonical_link(row["product_link"]),
+                row.get("date") or day,
+                row.get("title"),
+                normalized["price_grosze"],
+                None if row.get("price") is None else str(row.get("price")),
+                normalized["rating"],
+                normalized["num_of_opinions"],
+                normalized["availability"],
+                row.get("image_url") or None,
+                json.dumps(extra, ensure_ascii=False) if extra else None,
+            ))
+        self.connection.executemany(
+            """INSERT INTO prices (shop, product, date, title, price_grosze, price_text, rating, num_of_opinions,
+                                   availability, image_url, extra)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (shop, product, date) DO UPDATE SET
+                   title = excluded.title,
+                   price_grosze = excluded.price_grosze,
+                   price_text = excluded.price_text,
+                   rating = excluded.rating,
+                   num_of_opinions = excluded.num_of_opinions,
+                   availability = excluded.availability,
+                   image_url = excluded.image_url,
+                   extra = excluded.extra""",
+            values,
+        )
+        self.commit()
+
+    def commit(self):
+        self.connection.commit()
+
+    def _shop_state(self, shop):
+        state = self._state.get(shop)
+        if state is None:
+            rows = self.connection.execute(
+                "SELECT product, price_grosze, rating, num_of_opinions, availability, present FROM price_state WHERE shop = ?",
+                (shop,),
+            )
+            state = self._state[shop] = {row[0]: (row[1:5], bool(row[5])) for row in rows}
+            self._seen[shop] = set()
+        return state
+
+    def _record_delta(self, shop, day, rows):
+        """
+        Funkcja porównuje wiersze z ostatnim znanym stanem produktów i zapisuje tylko zdarzenia:
+        pojawienie się produktu (wszystkie pola) albo zmianę (maska changed + nowe wartości zmienionych pól).
+        """
+        state = self._shop_state(shop)
+        seen = self._seen[shop]
+        self._days[shop] = day
+        events = []
+        state_rows = []
+        for row, normalized in zip(rows, normalize_rows(rows)):
+            product = canonical_link(row["product_link"])
+            day_of_row = row.get("date") or day
+            values = tuple(normalized[field] for field in TRACKED_FIELDS)
+            seen.add(product)
+            previous = state.get(product)
+            if previous is None or not previous[1]:
+                event, changed = APPEAR, ALL_FIELDS_MASK
+            else:
+                event = CHANGE
+                changed = sum(1 << index for index, (old, new) in enumerate(zip(previous[0], values)) if old != new)
+                if not changed:
+                    continue
+            state[product] = (values, True)
+            events.append((shop, product, day_of_row, event, changed) + tuple(
+                value if changed & (1 << index) else None for index, value in enumerate(values)
+            ))
+            state_rows.append((shop, product) + values + (1, row.get("title"),
+                              None if row.get("price") is None else str(row.get("price"))))
+        self.delta_stats["rows"] += len(rows)
+        if not events:
+            return
+        self._write_events(events)
+        self.connection.executemany(
+            """INSERT OR REPLACE INTO price_state (shop, product, price_grosze, rating, num_of_opinions, availability,
+                                                  present, title, price_text)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            state_rows,
+        )
+        self.commit()
+
+    def _write_events(self, events):
+        # Kolejne zdarzenie tego samego dnia (np. ponowny przebieg) łączy się z wcześniejszym: maski się sumują,
+        # a pojawienie się produktu pozostaje pojawieniem
+        self.connection.executemany(
+            """INSERT INTO price_events (shop, product, date, event, changed, price_grosze, rating, num_of_opinions,
+                                         availability)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (shop, product, date) DO UPDATE SET
+                   event = CASE WHEN price_events.event = 'appear' AND excluded.event = 'change' THEN 'appear'
+                                ELSE excluded.event END,
+                   changed = price_events.changed | excluded.changed,
+                   price_grosze = CASE WHEN excluded.changed & 1 THEN excluded.price_grosze ELSE price_events.price_grosze END,
+                   rating = CASE WHEN excluded.changed & 2 THEN excluded.rating ELSE price_events.rating END,
+                   num_of_opinions = CASE WHEN excluded.changed & 4 THEN excluded.num_of_opinions
+                                          ELSE price_events.num_of_opinions END,
+                   availability = CASE WHEN excluded.changed & 8 THEN excluded.availability
+                                       ELSE price_events.availability END""",
+            events,
+        )
+        self.delta_stats["events"] += len(events)
+
+    def finish_day(self, shop, day=None):
+        """
+        Funkcja kończy dzień sklepu w trybie zmian: produkty niewidziane w tym przebiegu dostają zdarzenie zniknięcia,
+        a co PRICE_HISTORY_KEYFRAME_DAYS dni zapisywany jest pełny stan sklepu (keyframe).
+        """
+        if not self.delta or shop not in self._state:
+            return
+        day = day or self._days.get(shop) or date.today().isoformat()
+        state = self._state[shop]
+        seen = self._seen[shop]
+        present = [product for product, (_, is_present) in state.items() if is_present]
+        missing = [product for product in present if product not in seen]
+        if missing and len(seen) < DISAPPEAR_MIN_SEEN * len(present):
+            logger.warning(
+                "Historia cen [{}]: przebieg objął tylko {} z {} znanych produktów – nie zapisuję zniknięć.",
+                shop, len(seen), len(present)
+            )
+        elif missing:
+            self._write_events([(shop, product, day, DISAPPEAR, 0, None, None, None, None) for product in missing])
+            self.connection.executemany(
+                "UPDATE price_state SET present = 0 WHERE shop = ? AND product = ?",
+                [(shop, product) for product in missing],
+            )
+            for product in missing:
+                state[product] = (state[product][0], False)
+        last_keyframe = self.connection.execute(
+            "SELECT MAX(date) FROM price_keyframes WHERE shop = ? AND date <= ?", (shop, day)
+        ).fetchone()[0]
+        keyframe_days = int(os.environ.get("PRICE_HISTORY_KEYFRAME_DAYS", DEFAULT_KEYFRAME_DAYS))
+        # Keyframe z dzisiaj jest zawsze nadpisywany – snapshot() pomija zdarzenia z dnia keyframe'a,
+        # więc ponowny przebieg tego samego dnia musi trafić do keyframe'a
+        if (last_keyframe is None or last_keyframe == day
+                or (date.fromisoformat(day) - date.fromisoformat(last_keyframe)).days >= keyframe_days):
+            self.connection.execute("DELETE FROM price_keyframes WHERE shop = ? AND date = ?", (shop, day))
+            self.connection.executemany(
+                """INSERT OR REPLACE INTO price_keyframes (shop, date, product, price_grosze, rating, num_of_opinions,
+                                                          availability)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                [(shop, day, product) + values for product, (values, is_present) in state.items() if is_present],
+            )
+            logger.info("Historia cen [{}]: zapisano pełny stan z dnia {}.", shop, day)
+        self.commit()
+        self._seen[shop] = set()
+
+    def snapshot(self, shop, day):
+        """
+        Funkcja odtwarza stan sklepu w danym dniu z trybu zmian: ostatni keyframe + późniejsze zdarzenia.
+        Zwraca słownik produkt -> (cena w groszach, ocena, liczba opinii, dostępność).
+        """
+        keyframe = self.connection.execute(
+            "SELECT MAX(date) FROM price_keyframes WHERE shop = ? AND date <= ?", (shop, day)
+        ).fetchone()[0]
+        state = {}
+        if keyframe is not None:
+            rows = self.connection.execute(
+                """SELECT product, price_grosze, rating, num_of_opinions, availability FROM price_keyframes
+                   WHERE shop = ? AND date = ?""",
+                (shop, keyframe),
+            )
+            state = {row[0]: tuple(row[1:]) for row in rows}
+        events = self.connection.execute(
+            """SELECT product, event, changed, price_grosze, rating, num_of_opinions, availability FROM price_events
+               WHERE shop = ? AND date > ? AND date <= ? ORDER BY date""",
+            (shop, keyframe or "", day),
+        )
+        for product, event, changed, *values in events:
+            if event == DISAPPEAR:
+                state.pop(product, None)
+                continue
+            previous = state.get(product, (None,) * len(TRACKED_FIELDS))
+            state[product] = tuple(
+                value if changed & (1 << index) else previous[index] for index, value in enumerate(values)
+            )
+        return state
+
+    def _delta_history(self, shop, product, since=None):
+        # Historia produktu z trybu zmian: wartości po każdym zdarzeniu (tylko dni, w których coś się zmieniło)
+        query = """SELECT date, event, changed, price_grosze, rating, num_of_opinions FROM price_events
+                   WHERE shop = ? AND product = ? ORDER BY date"""
+        current = [None, None, None]
+        history = []
+        for day, event, changed, *values in self.connection.execute(query, (shop, product)):
+            if event == DISAPPEAR:
+                current = [None, None, None]
+            else:
+                current = [value if changed & (1 << index) else current[index] for index, value in enumerate(values)]
+            if since is None or day >= since:
+                history.append((day, *current))
+        return history
+
+    def history(self, shop, product_link, days=None):
+        """
+        Funkcja zwraca historię ceny produktu: listę (data, cena w groszach, ocena, liczba opinii) od najstarszej.
+        W trybie zmian lista zawiera tylko dni, w których wartości się zmieniły (po zniknięciu produktu – None).
+        """
+        if self.delta:
+            since = (date.today() - timedelta(days=days)).isoformat() if days else None
+            return self._delta_history(shop, canonical_link(product_link), since)
+        query = "SELECT date, price_grosze, rating, num_of_opinions FROM prices WHERE shop = ? AND product = ?"
+        params = [shop, canonical_link(product_link)]
+        if days:
+            query += " AND date >= ?"
+            params.append((date.today() - timedelta(days=days)).isoformat())
+        return self.connection.execute(query + " ORDER BY date", params).fetchall()
+
+    def import_csv(self, path, shop, day):
+        """
+        Funkcja wczytuje jeden stary plik listingu do historii i zwraca liczbę zapisanych wierszy.
+        """
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.record_many(shop, day, rows)
+        # W trybie zmian każdy plik to zamknięty dzień sklepu (zniknięcia, keyframe)
+        self.finish_day(shop, day)
+        self.commit()
+        return len(rows)
+
+    def import_folder(self, folder="output"):
+        """
+        Funkcja importuje wszystkie pliki <sklep>_<RRRR-MM-DD>.csv z folderu.
+        """
+        total = 0
+        for path in sorted(glob.glob(os.path.join(folder, "*.csv"))):
+            name = os.path.basename(path)
+            match = LISTING_FILE_PATTERN.match(name)
+            if not match or name.startswith(SKIPPED_PREFIXES):
+                continue
+            count = self.import_csv(path, match.group("shop"), match.group("date"))
+            logger.info("Zaimportowano {} wierszy z {}", count, name)
+            total += count
+        return total
+
+    def close(self):
+        for shop in list(self._seen):
+            if self._seen[shop]:
+                self.finish_day(shop)
+        if self.delta and self.delta_stats["rows"]:
+            logger.info("Historia cen (tryb zmian): {} wierszy, zapisano {} zdarzeń ({:.1f}%).",
+                        self.delta_stats["rows"], self.delta_stats["events"],
+                        100 * self.delta_stats["events"] / self.delta_stats["rows"])
+        self.commit()
+        self.connection.close()
+        log_cache_summary()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Historia cen w bazie SQLite")
+    parser.add_argument("--db", default=DEFAULT_HISTORY_PATH)
+    parser.add_argument("--delta", action="store_true", help="tryb zmian (jak PRICE_HISTORY_DELTA=1)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="import starych plików CSV z listingu")
+    import_parser.add_argument("folder", nargs="?", default="output")
+    history_parser = commands.add_parser("history", help="historia ceny produktu")
+    history_parser.add_argument("shop")
+    history_parser.add_argument("product_link")
+    history_parser.add_argument("--days", type=int, default=90)
+    snapshot_parser = commands.add_parser("snapshot", help="stan sklepu w danym dniu (tryb zmian)")
+    snapshot_parser.add_argument("shop")
+    snapshot_parser.add_argument("day")
+    args = parser.parse_args()
+
+    with PriceHistory(args.db, delta=args.delta or args.command == "snapshot" or None) as store:
+        if args.command == "import":
+            logger.info("Zaimportowano łącznie {} wierszy.", store.import_folder(args.folder))
+        elif args.command == "snapshot":
+            for product, (price, rating, opinions, available) in sorted(store.snapshot(args.shop, args.day).items()):
+                price_text = f"{price / 100:.2f} zł" if price is not None else "-"
+                print(f"{price_text:>12s}  ocena: {rating if rating is not None else '-'}  "
+                      f"opinie: {opinions if opinions is not None else '-'}  {product}")
+        else:
+            for day, price, rating, opinions in store.history(args.shop, args.product_link, args.days):
+                price_text = f"{price / 100:.2f} zł" if price is not None else "-"
+                print(f"{day}  {price_text:>12s}  ocena: {rating if rating is not None else '-'}  opinie: {opinions if opinions is not None else '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
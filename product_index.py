@@ -0,0 +1,157 @@
+# Tożsamość produktów sklepu: kanoniczny adres (bez parametrów śledzących) albo identyfikator produktu w sklepie
+# W trakcie przebiegu indeks jest w pamięci (każdy produkt zapisujemy i pobieramy raz, także między stronami i kategoriami),
+# a mapowanie adres -> identyfikator oraz daty pierwszego/ostatniego wystąpienia są trwałe między przebiegami (SQLite).
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from loguru import logger
+
+DEFAULT_INDEX_PATH = os.path.join("output", "product_index.sqlite")
+
+# Parametry kampanii i systemów analitycznych – nie zmieniają produktu, na który wskazuje link
+TRACKING_PARAMS = {
+    "gclid", "gbraid", "wbraid", "dclid", "fbclid", "msclkid", "yclid", "srsltid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "ref", "referrer", "cmpid", "campaign", "source", "from", "gad_source",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_")
+
+# Identyfikator produktu zapisany w adresie (sklepy, w których jest to stała część linku)
+URL_ID_PATTERNS = {
+    "komputronik": re.compile(r"/product/(\d+)/"),
+    "morele": re.compile(r"-(\d{6,})/?$"),
+}
+
+
+def canonical_product_url(url):
+    """
+    Funkcja zwraca kanoniczny adres produktu: mały host, bez fragmentu, końcowego "/" i parametrów śledzących,
+    pozostałe parametry w stałej kolejności.
+    """
+    parts = urlsplit(url.strip())
+    params = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PREFIXES)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(params), ""))
+
+
+def product_id_of(item, attribute=None):
+    """
+    Funkcja zwraca identyfikator produktu z elementu listingu: atrybut kafelka (np. data-neonet-product-id)
+    albo sku z danych strukturalnych.
+    """
+    if isinstance(item, dict):
+        value = item.get("sku")
+    else:
+        value = item.get(attribute) if attribute else None
+    return str(value).strip() if value not in (None, "") else None
+
+
+class ProductIndex:
+    """
+    Tabela products z kluczem (shop, product_key); klucz to "id:<identyfikator>" albo "url:<kanoniczny adres>".
+    persist=False – tylko odczyt mapowania z poprzednich przebiegów (np. skrypty danych technicznych).
+    """
+
+    def __init__(self, shop_name, path=DEFAULT_INDEX_PATH, persist=True):
+        self.shop_name = shop_name
+        self.persist = persist
+        self.today = datetime.now().strftime("%Y-%m-%d")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # timeout – listing i dane techniczne tego samego sklepu mogą działać równocześnie (run_all.py --stream)
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS products (
+                shop TEXT NOT NULL,
+                product_key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                product_id TEXT,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                PRIMARY KEY (shop, product_key)
+            )"""
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS products_shop_url ON products (shop, url)")
+        self.connection.commit()
+        # Kanoniczny adres -> klucz produktu z poprzednich przebiegów (link bez identyfikatora trafia pod ten sam klucz)
+        self._url_keys = dict(self.connection.execute(
+            "SELECT url, product_key FROM products WHERE shop = ?", (shop_name,)
+        ).fetchall())
+        self._known = set(self._url_keys.values())
+        self._seen = set()
+        self._pending = []
+        self._lock = threading.Lock()
+        self.stats = {"new": 0, "known": 0, "duplicates": 0}
+
+    def key(self, url, product_id=None):
+        """
+        Funkcja zwraca klucz tożsamości produktu (identyfikator ze sklepu ma pierwszeństwo przed adresem).
+        """
+        canonical = canonical_product_url(url)
+        if not product_id:
+            pattern = URL_ID_PATTERNS.get(self.shop_name)
+            match = pattern.search(urlsplit(canonical).path) if pattern else None
+            product_id = match.group(1) if match else None
+        if product_id:
+            return f"id:{product_id}", canonical, product_id
+        return self._url_keys.get(canonical, f"url:{canonical}"), canonical, None
+
+    def claim(self, url, product_id=None):
+        """
+        Funkcja zwraca True przy pierwszym wystąpieniu produktu w tym przebiegu, a False dla duplikatu
+        (ten sam produkt na innej stronie, w innej kategorii albo pod innym linkiem).
+        """
+        key, canonical, product_id = self.key(url, product_id)
+        with self._lock:
+            if key in self._seen:
+                self.stats["duplicates"] += 1
+                return False
+            self._seen.add(key)
+            self.stats["known" if key in self._known else "new"] += 1
+            self._url_keys[canonical] = key
+            if self.persist:
+                self._pending.append((self.shop_name, key, canonical, product_id, self.today, self.today))
+        return True
+
+    def unique(self, items, key="product_link"):
+        """
+        Funkcja pomija powtórzone produkty na liście linków (lista zostaje listą, generator – generatorem).
+        """
+        if isinstance(items, list):
+            return [item for item in items if self.claim(item[key])]
+        return (item for item in items if self.claim(item[key]))
+
+    def commit(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        with self.connection:
+            self.connection.executemany(
+                """INSERT INTO products (shop, product_key, url, product_id, first_seen, last_seen)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (shop, product_key) DO UPDATE SET
+                       url = excluded.url,
+                       product_id = COALESCE(excluded.product_id, products.product_id),
+                       last_seen = excluded.last_seen""",
+                pending,
+            )
+
+    def log_summary(self):
+        logger.info(
+            "Indeks produktów [{}]: {} unikalnych ({} nowych, {} znanych z poprzednich przebiegów), pominięto {} duplikatów.",
+            self.shop_name, self.stats["new"] + self.stats["known"], self.stats["new"], self.stats["known"],
+            self.stats["duplicates"]
+        )
+
+    def close(self):
+        if self.persist:
+            self.commit()
+        self.log_summary()
+        self.connection.close()
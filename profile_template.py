@@ -0,0 +1,126 @@
+# Gotowy szablon profilu Firefoksa kopiowany dla każdej przeglądarki (szybszy start niż pusty profil tymczasowy)
+# Szablon powstaje raz – przy pierwszym uruchomieniu przeglądarki z danymi opcjami – z wyłączonym pierwszym
+# uruchomieniem, aktualizacjami i telemetrią oraz z wypełnioną pamięcią podręczną startu (startupCache).
+# Każda przeglądarka dostaje własną kopię szablonu, usuwaną po zamknięciu.
+# PROFILE_TEMPLATE=1 włącza szablony; PROFILE_TEMPLATE_DIR zmienia katalog (domyślnie output/firefox_profiles).
+import copy
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from loguru import logger
+from selenium import webdriver
+from selenium.webdriver.firefox.service import Service
+
+DEFAULT_TEMPLATE_DIR = os.path.join("output", "firefox_profiles")
+
+# Ustawienia szablonu: bez ekranów pierwszego uruchomienia, sprawdzania aktualizacji, telemetrii
+# i list Safe Browsing pobieranych przy starcie
+TEMPLATE_PREFERENCES = {
+    "browser.shell.checkDefaultBrowser": False,
+    "browser.startup.homepage_override.mstone": "ignore",
+    "browser.startup.page": 0,
+    "browser.aboutwelcome.enabled": False,
+    "browser.newtabpage.enabled": False,
+    "startup.homepage_welcome_url": "about:blank",
+    "startup.homepage_welcome_url.additional": "",
+    "browser.sessionstore.resume_from_crash": False,
+    "toolkit.startup.max_resumed_crashes": -1,
+    "app.update.auto": False,
+    "app.update.checkInstallTime": False,
+    "extensions.update.enabled": False,
+    "extensions.getAddons.cache.enabled": False,
+    "extensions.pocket.enabled": False,
+    "browser.discovery.enabled": False,
+    "datareporting.policy.dataSubmissionEnabled": False,
+    "datareporting.healthreport.uploadEnabled": False,
+    "toolkit.telemetry.enabled": False,
+    "browser.safebrowsing.malware.enabled": False,
+    "browser.safebrowsing.phishing.enabled": False,
+    "browser.safebrowsing.downloads.enabled": False,
+    "network.captive-portal-service.enabled": False,
+    "network.connectivity-service.enabled": False,
+}
+
+# Pliki blokady i sesji, których nie kopiujemy do klonów
+SKIPPED_FILES = ("lock", ".parentlock", "parent.lock", "sessionstore.jsonlz4", "sessionCheckpoints.json")
+
+_lock = threading.Lock()
+
+
+def profile_template_enabled():
+    return os.environ.get("PROFILE_TEMPLATE") == "1"
+
+
+def _template_key(options):
+    # Szablon zależy od ustawień i argumentów przeglądarki (np. wyjątki odchudzonego profilu dla sklepu)
+    data = {
+        "binary": options.binary_location,
+        "arguments": sorted(options.arguments),
+        "preferences": options.preferences,
+    }
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+def template_options(options):
+    """
+    Funkcja zwraca kopię opcji uzupełnioną o ustawienia szablonu.
+    """
+    options = copy.deepcopy(options)
+    for name, value in TEMPLATE_PREFERENCES.items():
+        options.set_preference(name, value)
+    return options
+
+
+def _build_template(path, executable_path, options):
+    """
+    Funkcja tworzy szablon: jedno uruchomienie Firefoksa z podanym profilem wypełnia startupCache i prefs.js.
+    Szablon jest budowany w katalogu tymczasowym i przenoszony na miejsce jednym rename
+    (równoległe procesy run_all.py nie widzą niedokończonego szablonu).
+    """
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix="build_", dir=parent)
+    build_options = copy.deepcopy(options)
+    build_options.add_argument("-profile")
+    build_options.add_argument(build_dir)
+    started = time.monotonic()
+    driver = webdriver.Firefox(service=Service(executable_path), options=build_options)
+    try:
+        driver.get("about:blank")
+    finally:
+        driver.quit()
+    try:
+        os.rename(build_dir, path)
+        logger.info("Utworzono szablon profilu przeglądarki {} w {:.2f} s.", path, time.monotonic() - started)
+    except OSError:
+        # Inny proces zdążył utworzyć ten sam szablon
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def clone_profile(executable_path, options, folder=None):
+    """
+    Funkcja zwraca (opcje z argumentem -profile, katalog kopii profilu) – przy pierwszym użyciu buduje szablon.
+    Katalog kopii trzeba usunąć po zamknięciu przeglądarki (remove_clone).
+    """
+    # Ścieżka bezwzględna – geckodriver przekazuje ją Firefoksowi bez zmian
+    folder = os.path.abspath(folder or os.environ.get("PROFILE_TEMPLATE_DIR", DEFAULT_TEMPLATE_DIR))
+    options = template_options(options)
+    path = os.path.join(folder, f"template_{_template_key(options)}")
+    with _lock:
+        if not os.path.isdir(path):
+            _build_template(path, executable_path, options)
+    clone_dir = tempfile.mkdtemp(prefix="clone_", dir=folder)
+    shutil.copytree(path, clone_dir, dirs_exist_ok=True, ignore=shutil.ignore_patterns(*SKIPPED_FILES))
+    options.add_argument("-profile")
+    options.add_argument(clone_dir)
+    return options, clone_dir
+
+
+def remove_clone(clone_dir):
+    if clone_dir:
+        shutil.rmtree(clone_dir, ignore_errors=True)
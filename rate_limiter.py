@@ -0,0 +1,263 @@
+# Wspólne tempo zapytań do jednej domeny dla HttpFetcher i BrowserManager (token bucket + AIMD)
+# Tempo i liczba równoczesnych zapytań rosną, dopóki sklep odpowiada szybko i bez błędów,
+# a po 429/503, captchy albo wyraźnym spowolnieniu są zmniejszane o połowę (z przerwą dla domeny).
+# RATE_LIMIT=0 wyłącza ograniczanie; RATE_LIMIT_RPS, RATE_LIMIT_MAX_RPS i RATE_LIMIT_MAX_CONCURRENCY zmieniają limity.
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+import metrics
+
+DEFAULT_RATE = 2.0
+DEFAULT_MAX_RATE = 20.0
+MIN_RATE = 0.1
+DEFAULT_MAX_CONCURRENCY = 8
+INITIAL_CONCURRENCY = 2
+
+# Po tylu zdrowych odpowiedziach z rzędu tempo rośnie, a limit równoczesnych zapytań o 1:
+# do pierwszego spowolnienia lub blokady ×SLOW_START_FACTOR (jak slow start w TCP), potem o RATE_STEP
+INCREASE_AFTER = 5
+SLOW_START_FACTOR = 1.5
+RATE_STEP = 0.5
+# Odpowiedź jest "wolna", gdy trwa dłużej niż SLOW_FACTOR × średnia (i co najmniej SLOW_MIN_SECONDS)
+SLOW_FACTOR = 2.5
+SLOW_MIN_SECONDS = 1.0
+SLOW_DECREASE = 0.8
+# Przerwa dla domeny po blokadzie: od INITIAL_BACKOFF, podwajana do MAX_BACKOFF (albo Retry-After z odpowiedzi)
+INITIAL_BACKOFF = 5.0
+MAX_BACKOFF = 120.0
+
+THROTTLE_STATUSES = (429, 503)
+BLOCKED_TITLE_PATTERN = re.compile(r"captcha|just a moment|attention required|access denied|are you a robot", re.IGNORECASE)
+
+# Jedno zapytanie JS zamiast pobierania page_source: tytuł strony i typowe elementy stron z captchą
+BLOCKED_PAGE_SCRIPT = """
+var selectors = "#px-captcha, #challenge-form, #cf-challenge-running, iframe[src*='captcha'], div[class*='captcha-container']";
+return [document.title, !!document.querySelector(selectors)];
+"""
+
+_registry_lock = threading.Lock()
+_limiters = {}
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning("Niepoprawna wartość zmiennej {}: {}", name, value)
+        return default
+
+
+def rate_limit_enabled():
+    return os.environ.get("RATE_LIMIT", "1") != "0"
+
+
+class DomainLimiter:
+    """
+    Token bucket dla jednej domeny z adaptacyjnym tempem (zapytania/s) i limitem równoczesnych zapytań.
+    Wspólny dla wszystkich wątków procesu (workery DriverPool, pula HttpFetcher).
+    """
+
+    def __init__(self, host, rate=None, max_rate=None, max_concurrency=None):
+        self.host = host
+        self.max_rate = max_rate or _env_float("RATE_LIMIT_MAX_RPS", DEFAULT_MAX_RATE)
+        self.rate = min(rate or _env_float("RATE_LIMIT_RPS", DEFAULT_RATE), self.max_rate)
+        self.max_concurrency = int(max_concurrency or _env_float("RATE_LIMIT_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+        self.concurrency = min(INITIAL_CONCURRENCY, self.max_concurrency)
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.active = 0
+        self.blocked_until = 0.0
+        self.backoff = INITIAL_BACKOFF
+        self.latency = None
+        self.healthy_streak = 0
+        self.slow_start = True
+        self.stats = {"requests": 0, "throttled": 0, "slow": 0, "waited": 0.0, "peak_rate": self.rate}
+        self._condition = threading.Condition()
+
+    def _refill(self, now):
+        # Pojemność kubełka: jedna sekunda zapytań w bieżącym tempie
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """
+        Funkcja czeka na wolne miejsce i token dla domeny.
+        """
+        started = time.monotonic()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                elif self.active >= self.concurrency:
+                    delay = None
+                elif self.tokens < 1:
+                    delay = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    self.active += 1
+                    break
+                self._condition.wait(delay)
+            waited = time.monotonic() - started
+            self.stats["requests"] += 1
+            self.stats["waited"] += waited
+        metrics.observe(metrics.RATE_LIMIT, waited)
+
+    def release(self, latency, status=None, blocked=False, retry_after=None, failed=False):
+        """
+        Funkcja zwalnia miejsce i dostosowuje tempo do wyniku zapytania.
+        """
+        with self._condition:
+            self.active -= 1
+            if blocked or status in THROTTLE_STATUSES:
+                self._back_off(retry_after, "captcha / blokada" if blocked else f"HTTP {status}")
+            elif failed or (status is not None and status >= 500):
+                self._slow_down()
+            else:
+                slow = (self.latency is not None and latency > SLOW_FACTOR * self.latency
+                        and latency > SLOW_MIN_SECONDS)
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+                if slow:
+                    self.stats["slow"] += 1
+                    self._slow_down()
+                else:
+                    self._speed_up()
+            self._condition.notify_all()
+
+    def _speed_up(self):
+        self.healthy_streak += 1
+        if self.healthy_streak < INCREASE_AFTER:
+            return
+        self.healthy_streak = 0
+        self.backoff = INITIAL_BACKOFF
+        if self.slow_start:
+            self.rate = min(self.max_rate, self.rate * SLOW_START_FACTOR)
+        else:
+            self.rate = min(self.max_rate, self.rate + RATE_STEP)
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+        self.stats["peak_rate"] = max(self.stats["peak_rate"], self.rate)
+
+    def _slow_down(self):
+        self.healthy_streak = 0
+        self.slow_start = False
+        self.rate = max(MIN_RATE, self.rate * SLOW_DECREASE)
+
+    def _back_off(self, retry_after, reason):
+        self.healthy_streak = 0
+        self.slow_start = False
+        self.stats["throttled"] += 1
+        self.rate = max(MIN_RATE, self.rate / 2)
+        self.concurrency = max(1, self.concurrency // 2)
+        pause = retry_after if retry_after else self.backoff
+        self.backoff = min(MAX_BACKOFF, self.backoff * 2)
+        self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+        self.tokens = 0.0
+        logger.warning("{}: {} – przerwa {:.0f} s, tempo {:.2f} zapytań/s, równolegle {}.",
+                       self.host, reason, pause, self.rate, self.concurrency)
+
+
+def limiter_for(url):
+    """
+    Funkcja zwraca wspólny limiter domeny adresu albo None, gdy ograniczanie jest wyłączone.
+    """
+    if not rate_limit_enabled():
+        return None
+    host = urlsplit(url).netloc.lower()
+    with _registry_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = DomainLimiter(host)
+        return limiter
+
+
+class RequestSlot:
+    """
+    Wynik jednego zapytania zgłaszany do limitera przy wyjściu z request_slot().
+    """
+
+    def __init__(self):
+        self.status = None
+        self.blocked = False
+        self.retry_after = None
+
+
+@contextmanager
+def request_slot(url):
+    """
+    Menedżer kontekstu dla jednego zapytania do sklepu:
+        with request_slot(url) as slot:
+            response = session.get(url)
+            slot.status = response.status_code
+    """
+    limiter = limiter_for(url)
+    slot = RequestSlot()
+    if limiter is None:
+        yield slot
+        return
+    limiter.acquire()
+    started = time.monotonic()
+    failed = False
+    try:
+        yield slot
+    except Exception:
+        failed = True
+        raise
+    finally:
+        limiter.release(time.monotonic() - started, slot.status, slot.blocked, slot.retry_after, failed)
+
+
+def retry_after_seconds(value):
+    # Retry-After w sekundach (format z datą HTTP traktujemy jak brak nagłówka)
+    try:
+        return min(MAX_BACKOFF, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+def html_blocked(html):
+    """
+    Funkcja sprawdza, czy pobrana przez HTTP strona to captcha / strona blokady (po tytule).
+    """
+    if not html:
+        return False
+    title = re.search(r"<title[^>]*>(.*?)</title>", html[:20000], re.IGNORECASE | re.DOTALL)
+    return bool(title and BLOCKED_TITLE_PATTERN.search(title.group(1)))
+
+
+def page_blocked(driver):
+    """
+    Funkcja sprawdza, czy przeglądarka wyświetla captchę / stronę blokady (jedno zapytanie JS).
+    """
+    try:
+        title, has_challenge = driver.execute_script(BLOCKED_PAGE_SCRIPT)
+    except Exception:
+        return False
+    return bool(has_challenge or BLOCKED_TITLE_PATTERN.search(title or ""))
+
+
+def log_rate_summary():
+    """
+    Funkcja zapisuje w logu końcowe tempo każdej domeny i liczbę blokad.
+    """
+    with _registry_lock:
+        limiters = list(_limiters.values())
+    for limiter in limiters:
+        with limiter._condition:
+            stats = dict(limiter.stats)
+            rate, concurrency = limiter.rate, limiter.concurrency
+        logger.info(
+            "Tempo {}: {} zapytań, końcowo {:.2f}/s (maks. {:.2f}/s), równolegle {}, blokady: {}, spowolnienia: {}, "
+            "oczekiwanie łącznie {:.1f} s.",
+            limiter.host, stats["requests"], rate, stats["peak_rate"], concurrency, stats["throttled"], stats["slow"],
+            stats["waited"]
+        )
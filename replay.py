@@ -0,0 +1,209 @@
+# Nagrywanie stron sklepów i ich lokalne odtwarzanie (testy wydajności bez ruchu na prawdziwych sklepach)
+# Nagranie:      python replay.py record [sklep ...]          (uruchamia run_all.py z REPLAY_RECORD)
+# Odtwarzanie:   python replay.py serve --latency-ms 100 --error-rate 0.02
+# Skrypty kierują zapytania na serwer odtwarzający, gdy ustawiona jest zmienna REPLAY_URL=http://127.0.0.1:8765
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+DEFAULT_FIXTURES = "fixtures"
+DEFAULT_PORT = 8765
+
+# Przy nagrywaniu usuwamy skrypty wykonywalne – odtworzona strona ma już wyrenderowany DOM,
+# a dane strukturalne (JSON-LD, __NEXT_DATA__) zostają
+EXECUTABLE_SCRIPT_PATTERN = re.compile(
+    r"<script(?![^>]*type=\"application/(?:ld\+)?json\")(?![^>]*id=\"__NEXT_DATA__\")[^>]*>.*?</script>",
+    re.IGNORECASE | re.DOTALL,
+)
+
+_latencies_lock = threading.Lock()
+_latencies = []
+
+# Nagrywanie przeglądarki: adres strony otwartej w danym driverze, która czeka na zapis
+# (zapisujemy ją dopiero po doczytaniu leniwej zawartości, a nie zaraz po nawigacji)
+_pending_lock = threading.Lock()
+_pending_pages = weakref.WeakKeyDictionary()
+
+
+def replay_url():
+    return os.environ.get("REPLAY_URL", "").rstrip("/")
+
+
+def fixture_name(url):
+    """
+    Funkcja zwraca ścieżkę pliku nagrania (względem katalogu nagrań): <host>/<sha1 ścieżki i parametrów>.html
+    """
+    parts = urlsplit(url)
+    key = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+    return os.path.join(parts.netloc.lower(), hashlib.sha1(key.encode("utf-8")).hexdigest() + ".html")
+
+
+def rewrite_url(url):
+    """
+    Funkcja przekierowuje adres sklepu na serwer odtwarzający (REPLAY_URL), np.
+    https://www.neonet.pl/smartfony.html -> http://127.0.0.1:8765/www.neonet.pl/smartfony.html
+    Bez REPLAY_URL zwraca adres bez zmian.
+    """
+    base = replay_url()
+    if not base or url.startswith(base):
+        return url
+    parts = urlsplit(url)
+    return f"{base}/{parts.netloc}{parts.path or '/'}" + (f"?{parts.query}" if parts.query else "")
+
+
+def record_page(url, html):
+    """
+    Funkcja zapisuje treść strony do katalogu REPLAY_RECORD (jeśli ustawiony).
+    """
+    folder = os.environ.get("REPLAY_RECORD")
+    if not folder or html is None:
+        return
+    path = os.path.join(folder, fixture_name(url))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(EXECUTABLE_SCRIPT_PATTERN.sub("", html))
+    with open(os.path.join(folder, "index.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"url": url, "file": fixture_name(url)}) + "\n")
+
+
+def remember_page(driver, url):
+    """
+    Funkcja zapamiętuje stronę otwartą w przeglądarce do nagrania; treść zapisuje record_snapshot()
+    po pełnym załadowaniu strony albo flush_page() przed kolejną nawigacją.
+    """
+    if not os.environ.get("REPLAY_RECORD"):
+        return
+    flush_page(driver)
+    with _pending_lock:
+        _pending_pages[driver] = url
+
+
+def record_snapshot(driver, html):
+    """
+    Funkcja zapisuje zrzut w pełni załadowanej strony (page_source po przewijaniu i oczekiwaniach).
+    """
+    with _pending_lock:
+        url = _pending_pages.pop(driver, None)
+    if url is not None:
+        record_page(url, html)
+
+
+def flush_page(driver):
+    # Strona bez zrzutu (np. dane techniczne czytane elementami) – zapisujemy jej DOM po zakończeniu pracy z nią
+    with _pending_lock:
+        url = _pending_pages.pop(driver, None)
+    if url is None:
+        return
+    try:
+        html = driver.page_source
+    except Exception:
+        return
+    record_page(url, html)
+
+
+def record_latency(seconds):
+    """
+    Funkcja zapamiętuje czas pobrania strony; przy REPLAY_STATS czasy są zapisywane do pliku przy wyjściu z procesu.
+    """
+    if os.environ.get("REPLAY_STATS"):
+        with _latencies_lock:
+            _latencies.append(seconds)
+
+
+@atexit.register
+def _dump_latencies():
+    path = os.environ.get("REPLAY_STATS")
+    if not path or not _latencies:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        for seconds in _latencies:
+            f.write(f"{seconds:.6f}\n")
+
+
+def make_handler(folder, latency_ms, jitter_ms, error_rate):
+    class ReplayHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            # Ścieżka: /<host>/<ścieżka sklepu>?<parametry>
+            host, _, rest = self.path.lstrip("/").partition("/")
+            path = os.path.join(folder, fixture_name(f"https://{host}/{rest}"))
+            time.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+            if random.random() < error_rate:
+                self._send(503, b"Service Unavailable (wstrzykniety blad)")
+                return
+            if not os.path.exists(path):
+                self._send(404, b"Brak nagrania")
+                return
+            with open(path, "rb") as f:
+                self._send(200, f.read())
+
+        def _send(self, status, body):
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ReplayHandler
+
+
+def start_server(folder=DEFAULT_FIXTURES, port=0, latency_ms=0, jitter_ms=0, error_rate=0.0):
+    """
+    Funkcja uruchamia serwer odtwarzający w wątku w tle i zwraca (serwer, adres bazowy).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(folder, latency_ms, jitter_ms, error_rate))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nagrywanie i odtwarzanie stron sklepów")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="nagranie stron przez zwykły przebieg scraperów")
+    record_parser.add_argument("shops", nargs="*")
+    record_parser.add_argument("--dir", default=DEFAULT_FIXTURES)
+    serve_parser = commands.add_parser("serve", help="serwer odtwarzający nagrane strony")
+    serve_parser.add_argument("--dir", default=DEFAULT_FIXTURES)
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--latency-ms", type=float, default=0)
+    serve_parser.add_argument("--jitter-ms", type=float, default=0)
+    serve_parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        env = dict(os.environ, REPLAY_RECORD=os.path.abspath(args.dir))
+        env.pop("REPLAY_URL", None)
+        root = os.path.dirname(os.path.abspath(__file__))
+        return subprocess.run([sys.executable, os.path.join(root, "run_all.py"), *args.shops], cwd=root, env=env).returncode
+
+    server, base = start_server(args.dir, args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    logger.info("Serwer odtwarzający {} na {} (opóźnienie {} ± {} ms, błędy {:.0%}).",
+                args.dir, base, args.latency_ms, args.jitter_ms, args.error_rate)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+# Jeden punkt startowy dla wszystkich sklepów: listing -> dane techniczne, różne sklepy równolegle
+# Uruchomienie: python run_all.py [sklep ...]   (bez argumentów – wszystkie sklepy)
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from loguru import logger
+
+from driver_pool import get_worker_count
+from listing_pages import get_listing_workers
+from run_manifest import LISTING, RunManifest
+
+# Kolejne kroki dla każdego sklepu: (skrypt, czy używa przeglądarki, czy to skrypt danych technicznych)
+SHOPS = {
+    "elektromarket": [("Elektromarket.py", False, False), ("Elektromarket_dane_techniczne.py", False, True)],
+    "komputronik": [("Komputronik.py", True, False), ("Komputronik_dane_techniczne.py", True, True)],
+    "mediaexpert": [("MediaExpert.py", True, False), ("MediaExpert_dane_techniczne.py", True, True)],
+    "mediamarkt": [("Mediamarkt.py", True, False)],
+    "morele": [("Morele.py", True, False), ("Morele_dane_techniczne.py", True, True)],
+    "neonet": [("Neonet.py", True, False), ("Neonet_dane_techniczne.py", True, True)],
+    "rtv_euro_agd": [("RTV.py", True, False), ("RTV_dane_techniczne.py", True, True)],
+}
+
+# Listingi pobierające strony w kilku przeglądarkach (listing_pages.py); pozostałe używają jednej
+FAN_OUT_LISTINGS = {"MediaExpert.py", "Morele.py", "Neonet.py", "RTV.py"}
+
+# Szacowane zużycie pamięci przez jedną przeglądarkę (Firefox + geckodriver), można nadpisać BROWSER_MEMORY_MB
+DEFAULT_BROWSER_MEMORY_MB = 700
+DEFAULT_MAX_BROWSERS = 8
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+output_folder = os.path.join(ROOT, "output")
+
+today = datetime.now().strftime("%Y-%m-%d")
+log_filename = os.path.join(output_folder, f"run_all_{today}.log")
+summary_filename = os.path.join(output_folder, f"run_summary_{today}.json")
+
+
+def available_memory_mb():
+    """
+    Funkcja zwraca dostępną pamięć z /proc/meminfo (MemAvailable) w MB albo None poza Linuksem.
+    """
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def browser_budget():
+    """
+    Funkcja wylicza globalny limit przeglądarek: MAX_BROWSERS, ograniczony przez dostępną pamięć
+    (80% MemAvailable, ew. MAX_MEMORY_MB) podzieloną przez szacowane zużycie jednej przeglądarki.
+    """
+    max_browsers = int(os.environ.get("MAX_BROWSERS", DEFAULT_MAX_BROWSERS))
+    per_browser_mb = int(os.environ.get("BROWSER_MEMORY_MB", DEFAULT_BROWSER_MEMORY_MB))
+    memory_mb = available_memory_mb()
+    memory_mb = 0.8 * memory_mb if memory_mb is not None else None
+    if os.environ.get("MAX_MEMORY_MB"):
+        limit = int(os.environ["MAX_MEMORY_MB"])
+        memory_mb = min(memory_mb, limit) if memory_mb is not None else limit
+    if memory_mb is not None:
+        max_browsers = min(max_browsers, int(memory_mb // per_browser_mb))
+    return max(1, max_browsers), per_browser_mb, memory_mb
+
+
+class BrowserBudget:
+    """
+    Licznik wolnych przeglądarek współdzielony przez wszystkie sklepy.
+    Krok czeka, aż będzie mógł zająć tyle przeglądarek, ile potrzebuje.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.free = total
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, count):
+        count = min(count, self.total)
+        with self._condition:
+            self._condition.wait_for(lambda: self.free >= count)
+            self.free -= count
+            self.peak = max(self.peak, self.total - self.free)
+        return count
+
+    def release(self, count):
+        with self._condition:
+            self.free += count
+            self._condition.notify_all()
+
+
+def listing_browsers(script):
+    """
+    Funkcja zwraca liczbę przeglądarek, których potrzebuje skrypt listingu.
+    """
+    return get_listing_workers() if script in FAN_OUT_LISTINGS else 1
+
+
+# Nazwy sklepów używane w plikach output i rejestrze przebiegów (shop_name / SHOP_NAME w skryptach)
+MANIFEST_NAMES = {"mediaexpert": "MediaExpert"}
+
+
+def run_step(shop, script, uses_browser, is_tech, budget, workers, per_browser_mb, extra_env=None, started_event=None):
+    """
+    Funkcja uruchamia jeden skrypt jako osobny proces i zwraca opis wyniku do podsumowania.
+    workers – liczba przeglądarek, które krok rezerwuje w budżecie (jeśli używa przeglądarki).
+    started_event jest ustawiany po przydzieleniu przeglądarek, tuż przed startem procesu.
+    """
+    browsers = 0
+    env = dict(os.environ, **(extra_env or {}))
+    if uses_browser:
+        browsers = budget.acquire(workers)
+        if is_tech:
+            # Pula w skrypcie danych technicznych dostaje tyle przeglądarek, ile przydzielono z budżetu
+            env["TECH_DETAILS_WORKERS"] = str(browsers)
+        else:
+            # Listing pobiera kolejne strony w kilku przeglądarkach (listing_pages.py)
+            env["LISTING_WORKERS"] = str(browsers)
+        env.setdefault("BROWSER_MAX_MEMORY_MB", str(per_browser_mb))
+    step_log = os.path.join(output_folder, f"run_all_{shop}_{os.path.splitext(script)[0]}_{today}.out")
+    started_at = datetime.now().isoformat(timespec="seconds")
+    started = time.monotonic()
+    logger.info("[{}] Start {} (przeglądarki: {}).", shop, script, browsers)
+    if started_event is not None:
+        started_event.set()
+    try:
+        with open(step_log, "w", encoding="utf-8") as out:
+            returncode = subprocess.run(
+                [sys.executable, script], cwd=ROOT, env=env, stdout=out, stderr=subprocess.STDOUT
+            ).returncode
+    finally:
+        if browsers:
+            budget.release(browsers)
+    elapsed = time.monotonic() - started
+    level = "INFO" if returncode == 0 else "ERROR"
+    logger.log(level, "[{}] Koniec {}: kod {}, {:.1f} s.", shop, script, returncode, elapsed)
+    return {
+        "script": script,
+        "returncode": returncode,
+        "started_at": started_at,
+        "seconds": round(elapsed, 1),
+        "browsers": browsers,
+        "output": os.path.relpath(step_log, ROOT),
+    }
+
+
+def close_interrupted_listing(shop):
+    """
+    Funkcja oznacza listing jako nieudany, jeśli proces zakończył się bez wpisu końcowego w rejestrze,
+    żeby skrypt danych technicznych w trybie strumieniowym nie czekał na kolejne wiersze.
+    """
+    name = MANIFEST_NAMES.get(shop, shop)
+    manifest = RunManifest(os.path.join(output_folder, "run_manifest.sqlite"))
+    try:
+        status, path = manifest.status(name, LISTING, today)
+        if status in (None, "running"):
+            manifest.record(name, LISTING, today, path or os.path.join("output", f"{name}_{today}.csv"), status="failed")
+    finally:
+        manifest.close()
+
+
+def run_shop_streaming(shop, budget, workers, per_browser_mb):
+    """
+    Funkcja uruchamia listing i dane techniczne sklepu równocześnie: drugi skrypt czyta linki z pliku listingu w trakcie zapisu.
+    """
+    (listing_script, listing_browser, _), (tech_script, tech_browser, _) = SHOPS[shop]
+    listing_started = threading.Event()
+    # Listing zostawia w budżecie co najmniej jedną przeglądarkę dla danych technicznych,
+    # a dane techniczne proszą tylko o to, co zostało po rezerwacji listingu
+    listing_workers = min(listing_browsers(listing_script), max(1, budget.total - 1)) if listing_browser else 0
+    tech_workers = min(workers, max(1, budget.total - listing_workers))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        def run_listing():
+            result = run_step(shop, listing_script, listing_browser, False, budget, listing_workers, per_browser_mb,
+                              None, listing_started)
+            close_interrupted_listing(shop)
+            return result
+
+        listing = executor.submit(run_listing)
+        # Dane techniczne rezerwują przeglądarki dopiero, gdy listing ma już swoją – inaczej mogłyby zająć cały budżet
+        # i czekać na listing, który nie dostałby przeglądarki
+        while not listing_started.wait(timeout=1):
+            if listing.done():
+                break
+        tech = run_step(shop, tech_script, tech_browser, True, budget, tech_workers, per_browser_mb, {"STREAM_LISTING": "1"})
+        steps = [listing.result(), tech]
+    ok = all(step["returncode"] == 0 for step in steps)
+    # Czas sklepu to czas od startu do końca wolniejszego z dwóch równoległych etapów
+    return {"shop": shop, "ok": ok, "seconds": max(step["seconds"] for step in steps), "streaming": True, "steps": steps}
+
+
+def run_shop(shop, budget, workers, per_browser_mb, stream=False):
+    """
+    Funkcja wykonuje kroki sklepu po kolei; dane techniczne uruchamiamy tylko po udanym listingu.
+    W trybie strumieniowym sklepy z danymi technicznymi pobieranymi przeglądarką wykonują oba etapy równocześnie.
+    """
+    if stream and len(SHOPS[shop]) == 2 and SHOPS[shop][1][1]:
+        return run_shop_streaming(shop, budget, workers, per_browser_mb)
+    steps = []
+    for script, uses_browser, is_tech in SHOPS[shop]:
+        if steps and steps[-1]["returncode"] != 0:
+            logger.warning("[{}] Pomijam {} – poprzedni krok zakończył się błędem.", shop, script)
+            steps.append({"script": script, "returncode": None, "skipped": True})
+            continue
+        step_workers = workers if is_tech else listing_browsers(script)
+        steps.append(run_step(shop, script, uses_browser, is_tech, budget, step_workers, per_browser_mb))
+    ok = all(step["returncode"] == 0 for step in steps)
+    return {"shop": shop, "ok": ok, "seconds": round(sum(step.get("seconds", 0) for step in steps), 1), "steps": steps}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Równoległe uruchomienie scraperów wszystkich sklepów")
+    parser.add_argument("shops", nargs="*", help=f"domyślnie wszystkie: {', '.join(sorted(SHOPS))}")
+    parser.add_argument("--stream", action="store_true", help="dane techniczne równolegle z listingiem (STREAM_LISTING=1)")
+    args = parser.parse_args()
+    unknown = set(args.shops) - set(SHOPS)
+    if unknown:
+        parser.error(f"nieznane sklepy: {', '.join(sorted(unknown))}")
+    shops = args.shops or sorted(SHOPS)
+
+    os.makedirs(output_folder, exist_ok=True)
+    # Logowanie konfigurujemy dopiero tutaj, żeby import SHOPS (np. w benchmarkach) nie podmieniał handlerów
+    logger.remove()
+    log_format = "{time:YYYY-MM-DD HH:mm:ss,SSS} - {level} - {message}"
+    logger.add(log_filename, level="INFO", format=log_format, encoding="utf-8")
+    logger.add(lambda msg: print(msg, end=""), level="INFO", format=log_format)
+
+    total_browsers, per_browser_mb, memory_mb = browser_budget()
+    budget = BrowserBudget(total_browsers)
+    workers = get_worker_count()
+    logger.info(
+        "Start: {} sklepów, limit przeglądarek {} (pamięć do dyspozycji: {} MB, {} MB na przeglądarkę), workerów na sklep {}.",
+        len(shops), total_browsers, f"{memory_mb:.0f}" if memory_mb is not None else "?", per_browser_mb, workers
+    )
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(shops)) as executor:
+        results = list(executor.map(lambda shop: run_shop(shop, budget, workers, per_browser_mb, args.stream), shops))
+    wall = time.monotonic() - started
+
+    sequential = sum(result["seconds"] for result in results)
+    summary = {
+        "date": today,
+        "wall_seconds": round(wall, 1),
+        "sequential_seconds": round(sequential, 1),
+        "browser_limit": total_browsers,
+        "browser_peak": budget.peak,
+        "ok": all(result["ok"] for result in results),
+        "shops": results,
+    }
+    with open(summary_filename, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    for result in results:
+        logger.info("[{}] {} w {:.1f} s.", result["shop"], "OK" if result["ok"] else "BŁĄD", result["seconds"])
+    logger.info(
+        "Zakończono w {:.1f} s (suma kroków: {:.1f} s, najwolniejszy sklep: {:.1f} s). Podsumowanie: {}",
+        wall, sequential, max(result["seconds"] for result in results), summary_filename
+    )
+    return 0 if summary["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
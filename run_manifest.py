@@ -0,0 +1,150 @@
+# Rejestr przebiegów scraperów (SQLite): który plik jest najnowszym udanym wynikiem danego sklepu i etapu
+import csv
+import glob
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+from loguru import logger
+
+DEFAULT_MANIFEST_PATH = os.path.join("output", "run_manifest.sqlite")
+
+LISTING = "listing"
+TECH_DETAILS = "tech_details"
+
+
+def count_rows(path):
+    """
+    Funkcja zwraca liczbę wierszy danych w pliku CSV (bez nagłówka).
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, newline="", encoding="utf-8") as f:
+        return max(0, sum(1 for _ in csv.reader(f)) - 1)
+
+
+class RunManifest:
+    """
+    Tabela runs z historią przebiegów oraz tabela latest_success z kluczem (shop, run_type),
+    dzięki której najnowszy udany wynik etapu odczytujemy jednym zapytaniem po kluczu głównym.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # timeout – listing i dane techniczne różnych sklepów mogą kończyć się równocześnie (run_all.py);
+        # check_same_thread=False – w trybie strumieniowym rejestr czyta wątek podający zadania do puli
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(
+            """CREATE TABLE IF NOT EXISTS runs (
+                shop TEXT NOT NULL,
+                run_type TEXT NOT NULL,
+                date TEXT NOT NULL,
+                status TEXT NOT NULL,
+                rows INTEGER,
+                path TEXT NOT NULL,
+                finished_at TEXT NOT NULL,
+                PRIMARY KEY (shop, run_type, date)
+            );
+            CREATE TABLE IF NOT EXISTS latest_success (
+                shop TEXT NOT NULL,
+                run_type TEXT NOT NULL,
+                date TEXT NOT NULL,
+                rows INTEGER,
+                path TEXT NOT NULL,
+                finished_at TEXT NOT NULL,
+                PRIMARY KEY (shop, run_type)
+            );"""
+        )
+        self.connection.commit()
+
+    def record(self, shop, run_type, date, path, status=None, rows=None):
+        """
+        Funkcja zapisuje zakończony przebieg; udany przebieg staje się najnowszym wynikiem etapu dla sklepu.
+        Bez podanego statusu przebieg jest udany, jeśli plik zawiera co najmniej jeden wiersz.
+        """
+        if rows is None:
+            rows = count_rows(path)
+        if status is None:
+            status = "success" if rows else "empty"
+        finished_at = datetime.now().isoformat(timespec="seconds")
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO runs (shop, run_type, date, status, rows, path, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (shop, run_type, date, status, rows, path, finished_at),
+            )
+            if status == "success":
+                self.connection.execute(
+                    """INSERT INTO latest_success (shop, run_type, date, rows, path, finished_at) VALUES (?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (shop, run_type) DO UPDATE SET
+                           date = excluded.date, rows = excluded.rows, path = excluded.path, finished_at = excluded.finished_at
+                       WHERE excluded.date >= latest_success.date""",
+                    (shop, run_type, date, rows, path, finished_at),
+                )
+        logger.info("Rejestr przebiegów: {} / {} z {} – {} ({} wierszy).", shop, run_type, date, status, rows)
+
+    def latest(self, shop, run_type=LISTING):
+        """
+        Funkcja zwraca najnowszy udany przebieg etapu jako słownik albo None.
+        """
+        row = self.connection.execute(
+            "SELECT date, rows, path, finished_at FROM latest_success WHERE shop = ? AND run_type = ?",
+            (shop, run_type),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"shop": shop, "run_type": run_type, "date": row[0], "rows": row[1], "path": row[2], "finished_at": row[3]}
+
+    def status(self, shop, run_type, date):
+        """
+        Funkcja zwraca parę (status, ścieżka) przebiegu z danego dnia albo (None, None).
+        """
+        row = self.connection.execute(
+            "SELECT status, path FROM runs WHERE shop = ? AND run_type = ? AND date = ?", (shop, run_type, date)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def close(self):
+        self.connection.close()
+
+
+def record_run(shop, run_type, date, path, status=None, rows=None):
+    """
+    Funkcja zapisuje przebieg w domyślnym rejestrze (skróty dla skryptów scraperów).
+    """
+    manifest = RunManifest()
+    try:
+        manifest.record(shop, run_type, date, path, status, rows)
+    finally:
+        manifest.close()
+
+
+def _latest_by_glob(shop, output_folder):
+    # Pliki sprzed wprowadzenia rejestru: dokładne dopasowanie <sklep>_RRRR-MM-DD.csv, bez kolizji prefiksów
+    pattern = re.compile(rf"^{re.escape(shop)}_(\d{{4}}-\d{{2}}-\d{{2}})\.csv$")
+    candidates = []
+    for path in glob.glob(os.path.join(output_folder, f"{glob.escape(shop)}_*.csv")):
+        match = pattern.match(os.path.basename(path))
+        if match:
+            candidates.append((match.group(1), path))
+    return max(candidates)[1] if candidates else None
+
+
+def latest_listing_file(shop, output_folder="output"):
+    """
+    Funkcja zwraca ścieżkę najnowszego udanego listingu sklepu z rejestru przebiegów.
+    Gdy rejestr nie zna sklepu (starsze wyniki), wybiera najnowszy plik z folderu output.
+    """
+    manifest = RunManifest(os.path.join(output_folder, os.path.basename(DEFAULT_MANIFEST_PATH)))
+    try:
+        entry = manifest.latest(shop, LISTING)
+    finally:
+        manifest.close()
+    if entry and os.path.exists(entry["path"]):
+        logger.info("Najnowszy listing z rejestru przebiegów: {} ({} wierszy).", entry["path"], entry["rows"])
+        return entry["path"]
+    path = _latest_by_glob(shop, output_folder)
+    if path:
+        logger.info("Brak wpisu w rejestrze przebiegów, wybrano plik z folderu: {}", path)
+    return path
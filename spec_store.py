@@ -0,0 +1,282 @@
+# Dane techniczne wszystkich sklepów w jednej bazie SQLite ze słownikami nazw atrybutów i wartości
+# Zamiast JSON-a z pełnymi nazwami ("Pamięć RAM", "Przekątna ekranu") w każdym wierszu każdego pliku przechowujemy
+# wiersze (produkt, id atrybutu, id wartości) – filtrowanie po atrybucie korzysta z indeksu, bez dekodowania JSON.
+# Import starych plików:  python spec_store.py import [folder]
+# Produkty z atrybutem:   python spec_store.py find "Pamięć RAM" [--value "8 GB"] [--shop neonet]
+# Najczęstsze atrybuty:   python spec_store.py keys [--shop neonet]
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+from datetime import date
+
+from loguru import logger
+
+from tech_cache import canonical_link
+
+DEFAULT_SPEC_PATH = os.path.join("output", "tech_specs.sqlite")
+# Skrypty danych technicznych uruchomione równolegle piszą do tej samej bazy – czekamy na blokadę zamiast zgłaszać błąd
+BUSY_TIMEOUT = 30
+
+# Pliki danych technicznych: tech_details_<sklep>_<RRRR-MM-DD>.csv
+TECH_FILE_PATTERN = re.compile(r"^tech_details_(?P<shop>[A-Za-z][A-Za-z_]*?)_(?P<date>\d{4}-\d{2}-\d{2})\.csv$")
+
+
+def _value_text(value):
+    # Wartości to zwykle teksty; listy i słowniki zapisujemy jako JSON, żeby dało się je odtworzyć
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class SpecStore:
+    """
+    Tabele spec_keys i spec_values (słowniki), spec_products (sklep, kanoniczny link, data pobrania)
+    oraz specs z wierszami (product_id, key_id, value_id) i indeksem po atrybucie.
+    Przechowywany jest ostatni stan danych technicznych produktu; ponowny zapis bez zmian niczego nie nadpisuje.
+    """
+
+    def __init__(self, path=DEFAULT_SPEC_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # W trybie WAL zatwierdzenie bez fsync przy każdym produkcie (baza pozostaje spójna)
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(
+            """CREATE TABLE IF NOT EXISTS spec_keys (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS spec_values (
+                id INTEGER PRIMARY KEY,
+                value TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS spec_products (
+                id INTEGER PRIMARY KEY,
+                shop TEXT NOT NULL,
+                link TEXT NOT NULL,
+                scraped_at TEXT NOT NULL,
+                UNIQUE (shop, link)
+            );
+            CREATE TABLE IF NOT EXISTS specs (
+                product_id INTEGER NOT NULL REFERENCES spec_products (id),
+                key_id INTEGER NOT NULL REFERENCES spec_keys (id),
+                value_id INTEGER NOT NULL REFERENCES spec_values (id),
+                PRIMARY KEY (product_id, key_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS specs_key_value ON specs (key_id, value_id);"""
+        )
+        self.connection.commit()
+        # Słowniki w pamięci – każda nazwa i wartość trafia do bazy tylko raz
+        self._key_ids = dict(self.connection.execute("SELECT name, id FROM spec_keys"))
+        self._value_ids = dict(self.connection.execute("SELECT value, id FROM spec_values"))
+        self.stats = {"stored": 0, "unchanged": 0, "failed": 0}
+
+    def _intern(self, table, column, ids, text):
+        intern_id = ids.get(text)
+        if intern_id is None:
+            # Równoległy skrypt mógł już dodać tę samą nazwę lub wartość – wtedy bierzemy jej istniejące id
+            self.connection.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (text,))
+            intern_id = self.connection.execute(
+                f"SELECT id FROM {table} WHERE {column} = ?", (text,)
+            ).fetchone()[0]
+            ids[text] = intern_id
+        return intern_id
+
+    def _product_id(self, shop, link, day):
+        row = self.connection.execute(
+            "SELECT id FROM spec_products WHERE shop = ? AND link = ?", (shop, link)
+        ).fetchone()
+        if row is not None:
+            self.connection.execute("UPDATE spec_products SET scraped_at = ? WHERE id = ?", (day, row[0]))
+            return row[0]
+        return self.connection.execute(
+            "INSERT INTO spec_products (shop, link, scraped_at) VALUES (?, ?, ?)", (shop, link, day)
+        ).lastrowid
+
+    def store(self, shop, product_link, details, day=None):
+        """
+        Funkcja zapisuje dane techniczne produktu (słownik atrybut -> wartość) jako wiersze ze słownikowymi id.
+        Zapis jest od razu zatwierdzany; błąd bazy trafia tylko do logu i nie przerywa scrapowania.
+        """
+        if not details:
+            return
+        try:
+            self._store(shop, product_link, details, day or date.today().isoformat())
+            self.commit()
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            # Wycofane wiersze słowników nie mogą zostać w pamięci
+            self._key_ids = dict(self.connection.execute("SELECT name, id FROM spec_keys"))
+            self._value_ids = dict(self.connection.execute("SELECT value, id FROM spec_values"))
+            self.stats["failed"] += 1
+            logger.warning("Nie udało się zapisać danych technicznych {} w bazie: {}", product_link, e)
+
+    def _store(self, shop, product_link, details, day):
+        product_id = self._product_id(shop, canonical_link(product_link), day)
+        rows = {
+            self._intern("spec_keys", "name", self._key_ids, str(key).strip()):
+                self._intern("spec_values", "value", self._value_ids, _value_text(value))
+            for key, value in details.items()
+        }
+        current = dict(self.connection.execute(
+            "SELECT key_id, value_id FROM specs WHERE product_id = ?", (product_id,)
+        ))
+        if current == rows:
+            self.stats["unchanged"] += 1
+        else:
+            self.connection.execute("DELETE FROM specs WHERE product_id = ?", (product_id,))
+            self.connection.executemany(
+                "INSERT INTO specs (product_id, key_id, value_id) VALUES (?, ?, ?)",
+                [(product_id, key_id, value_id) for key_id, value_id in rows.items()],
+            )
+            self.stats["stored"] += 1
+
+    def commit(self):
+        self.connection.commit()
+
+    def details(self, shop, product_link):
+        """
+        Funkcja zwraca dane techniczne produktu jako słownik (albo None, jeśli produktu nie ma w bazie).
+        """
+        rows = self.connection.execute(
+            """SELECT k.name, v.value FROM spec_products p
+               JOIN specs s ON s.product_id = p.id
+               JOIN spec_keys k ON k.id = s.key_id
+               JOIN spec_values v ON v.id = s.value_id
+               WHERE p.shop = ? AND p.link = ?""",
+            (shop, canonical_link(product_link)),
+        ).fetchall()
+        return dict(rows) if rows else None
+
+    def find(self, key, value=None, shop=None):
+        """
+        Funkcja zwraca produkty z danym atrybutem (opcjonalnie o danej wartości): listę (sklep, link, wartość).
+        Nazwa atrybutu i wartość są zamieniane na id, więc zapytanie używa indeksu specs_key_value.
+        Id są odczytywane z bazy, a nie ze słowników w pamięci – widać też atrybuty dodane przez inne procesy.
+        """
+        row = self.connection.execute("SELECT id FROM spec_keys WHERE name = ?", (key,)).fetchone()
+        if row is None:
+            return []
+        query = """SELECT p.shop, p.link, v.value FROM specs s
+                   JOIN spec_products p ON p.id = s.product_id
+                   JOIN spec_values v ON v.id = s.value_id
+                   WHERE s.key_id = ?"""
+        params = [row[0]]
+        if value is not None:
+            row = self.connection.execute("SELECT id FROM spec_values WHERE value = ?", (value,)).fetchone()
+            if row is None:
+                return []
+            query += " AND s.value_id = ?"
+            params.append(row[0])
+        if shop:
+            query += " AND p.shop = ?"
+            params.append(shop)
+        return self.connection.execute(query + " ORDER BY p.shop, p.link", params).fetchall()
+
+    def keys(self, shop=None, limit=50):
+        """
+        Funkcja zwraca najczęstsze atrybuty: listę (nazwa, liczba produktów, liczba różnych wartości).
+        """
+        query = """SELECT k.name, COUNT(*), COUNT(DISTINCT s.value_id) FROM specs s
+                   JOIN spec_keys k ON k.id = s.key_id"""
+        params = []
+        if shop:
+            query += " JOIN spec_products p ON p.id = s.product_id WHERE p.shop = ?"
+            params.append(shop)
+        query += " GROUP BY s.key_id ORDER BY COUNT(*) DESC LIMIT ?"
+        params.append(limit)
+        return self.connection.execute(query, params).fetchall()
+
+    def import_csv(self, path, shop, day):
+        """
+        Funkcja wczytuje jeden plik tech_details_*.csv (kolumna tech_details z JSON-em) i zwraca liczbę produktów.
+        """
+        count = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    details = json.loads(row.get("tech_details") or "{}")
+                except ValueError:
+                    logger.warning("Niepoprawny JSON danych technicznych w {}: {}", path, row.get("product_link"))
+                    continue
+                if row.get("product_link") and details:
+                    self.store(shop, row["product_link"], details, day)
+                    count += 1
+        self.commit()
+        return count
+
+    def import_folder(self, folder="output"):
+        """
+        Funkcja importuje wszystkie pliki tech_details_<sklep>_<RRRR-MM-DD>.csv z folderu (od najstarszego).
+        """
+        files = []
+        for path in glob.glob(os.path.join(folder, "tech_details_*.csv")):
+            match = TECH_FILE_PATTERN.match(os.path.basename(path))
+            if match:
+                files.append((match.group("date"), match.group("shop"), path))
+        total = 0
+        for day, shop, path in sorted(files):
+            count = self.import_csv(path, shop, day)
+            logger.info("Zaimportowano dane techniczne {} produktów z {}", count, os.path.basename(path))
+            total += count
+        return total
+
+    def log_summary(self):
+        counts = [
+            self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("spec_products", "spec_keys", "spec_values", "specs")
+        ]
+        logger.info(
+            "Baza danych technicznych: {} produktów, {} atrybutów, {} różnych wartości, {} wierszy; "
+            "w tym przebiegu zapisano {}, bez zmian {}, błędów zapisu {}.",
+            *counts, self.stats["stored"], self.stats["unchanged"], self.stats["failed"]
+        )
+
+    def close(self):
+        self.commit()
+        self.log_summary()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dane techniczne w bazie SQLite")
+    parser.add_argument("--db", default=DEFAULT_SPEC_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="import plików tech_details_*.csv")
+    import_parser.add_argument("folder", nargs="?", default="output")
+    find_parser = commands.add_parser("find", help="produkty z danym atrybutem")
+    find_parser.add_argument("key")
+    find_parser.add_argument("--value")
+    find_parser.add_argument("--shop")
+    keys_parser = commands.add_parser("keys", help="najczęstsze atrybuty")
+    keys_parser.add_argument("--shop")
+    keys_parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    with SpecStore(args.db) as store:
+        if args.command == "import":
+            logger.info("Zaimportowano łącznie dane techniczne {} produktów.", store.import_folder(args.folder))
+        elif args.command == "find":
+            for shop, link, value in store.find(args.key, args.value, args.shop):
+                print(f"{shop:15s}  {value:30s}  {link}")
+        else:
+            for name, products, values in store.keys(args.shop, args.limit):
+                print(f"{products:6d}  {values:6d}  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
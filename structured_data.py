@@ -0,0 +1,198 @@
+# Szybka ścieżka dla stron listingu: dane strukturalne (JSON-LD, microdata, osadzony stan aplikacji)
+import json
+import re
+
+from loguru import logger
+
+from metrics import STRUCTURED_DATA, stage
+
+# Skrypty z osadzonym stanem aplikacji (np. Next.js, Nuxt, własne window.__INITIAL_STATE__)
+STATE_SCRIPT_PATTERN = re.compile(
+    r"window\.(?:__INITIAL_STATE__|__PRELOADED_STATE__|__NUXT__|__APOLLO_STATE__)\s*=\s*(\{.*\})\s*;?\s*$",
+    re.DOTALL,
+)
+
+
+def _to_float(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = re.sub(r"[^\d,.\-]", "", str(value)).replace(",", ".")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _to_int(value):
+    number = _to_float(value)
+    return int(number) if number is not None else None
+
+
+def _first(value):
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _product_from_json(data):
+    """
+    Funkcja zamienia obiekt schema.org/Product (lub podobny) na słownik ze wspólnymi polami.
+    """
+    offers = _first(data.get("offers")) or {}
+    if offers.get("@type") == "AggregateOffer":
+        price = offers.get("lowPrice", offers.get("price"))
+    else:
+        price = offers.get("price", data.get("price"))
+    rating = data.get("aggregateRating") or {}
+    image = _first(data.get("image"))
+    if isinstance(image, dict):
+        image = image.get("url")
+    return {
+        "name": data.get("name"),
+        "url": data.get("url") or offers.get("url"),
+        "price": _to_float(price),
+        "currency": offers.get("priceCurrency"),
+        "rating": _to_float(rating.get("ratingValue")),
+        "review_count": _to_int(rating.get("reviewCount", rating.get("ratingCount"))),
+        "image": image,
+        "availability": offers.get("availability"),
+        "sku": _first(data.get("sku")) or data.get("productID"),
+    }
+
+
+def _json_ld_products(soup):
+    products = []
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except json.JSONDecodeError as e:
+            logger.error(f"Błąd podczas parsowania JSON: {e}")
+            continue
+        stack = data if isinstance(data, list) else [data]
+        while stack:
+            node = stack.pop(0)
+            if not isinstance(node, dict):
+                continue
+            if "@graph" in node:
+                stack.extend(node["@graph"])
+            node_type = node.get("@type")
+            if node_type == "ItemList":
+                for element in node.get("itemListElement", []):
+                    item = element.get("item", element) if isinstance(element, dict) else None
+                    if isinstance(item, dict) and item.get("name"):
+                        products.append(_product_from_json(item))
+            elif node_type == "Product":
+                products.append(_product_from_json(node))
+    return products
+
+
+def _microdata_products(soup):
+    products = []
+    for scope in soup.select('[itemscope][itemtype*="schema.org/Product"]'):
+        def prop(name):
+            element = scope.select_one(f'[itemprop="{name}"]')
+            if element is None:
+                return None
+            for attribute in ("content", "href", "src"):
+                if element.get(attribute):
+                    return element[attribute]
+            return element.get_text(" ", strip=True)
+
+        products.append({
+            "name": prop("name"),
+            "url": prop("url"),
+            "price": _to_float(prop("price")),
+            "currency": prop("priceCurrency"),
+            "rating": _to_float(prop("ratingValue")),
+            "review_count": _to_int(prop("reviewCount")),
+            "image": prop("image"),
+            "availability": prop("availability"),
+            "sku": prop("sku") or prop("productID"),
+        })
+    return [product for product in products if product["name"]]
+
+
+def _looks_like_product(node):
+    return (
+        isinstance(node, dict)
+        and isinstance(node.get("name"), str)
+        and any(key in node for key in ("url", "link", "href"))
+        and any(key in node for key in ("price", "offers", "finalPrice"))
+    )
+
+
+def _embedded_state_products(soup):
+    states = []
+    next_data = soup.find("script", id="__NEXT_DATA__")
+    if next_data is not None and next_data.string:
+        states.append(next_data.string)
+    for script in soup.find_all("script"):
+        match = STATE_SCRIPT_PATTERN.search((script.string or "").strip())
+        if match:
+            states.append(match.group(1))
+
+    products = []
+    for state in states:
+        try:
+            stack = [json.loads(state)]
+        except json.JSONDecodeError:
+            continue
+        while stack:
+            node = stack.pop()
+            if _looks_like_product(node):
+                product = _product_from_json(node)
+                product["url"] = product["url"] or node.get("link") or node.get("href")
+                if product["price"] is None:
+                    product["price"] = _to_float(node.get("finalPrice"))
+                products.append(product)
+            elif isinstance(node, dict):
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
+    return products
+
+
+# Kolejność sprawdzania źródeł danych strukturalnych
+SOURCES = (
+    ("json-ld", _json_ld_products),
+    ("microdata", _microdata_products),
+    ("embedded-state", _embedded_state_products),
+)
+
+
+class StructuredDataExtractor:
+    """
+    Wykrywa dane strukturalne produktów na stronie listingu i liczy, jak często udało się ich użyć
+    zamiast parsowania DOM.
+    """
+
+    def __init__(self, shop_name):
+        self.shop_name = shop_name
+        self.pages = 0
+        self.fast_path = {}
+
+    def extract(self, soup, expected=None):
+        """
+        Funkcja zwraca listę produktów z pierwszego źródła danych strukturalnych, które obejmuje
+        co najmniej expected produktów (np. liczbę kafelków w DOM), albo None – wtedy używamy selektorów DOM.
+        """
+        self.pages += 1
+        with stage(STRUCTURED_DATA):
+            for source, finder in SOURCES:
+                products = [product for product in finder(soup) if product["name"] and product["url"]]
+                if products and (expected is None or len(products) >= expected):
+                    self.fast_path[source] = self.fast_path.get(source, 0) + 1
+                    logger.info("Dane strukturalne ({}): {} produktów.", source, len(products))
+                    return products
+        return None
+
+    def log_summary(self):
+        used = sum(self.fast_path.values())
+        share = 100 * used / self.pages if self.pages else 0
+        details = ", ".join(f"{source}: {count}" for source, count in self.fast_path.items()) or "brak"
+        logger.info(
+            "Dane strukturalne [{}]: użyte na {}/{} stronach ({:.0f}%), źródła: {}.",
+            self.shop_name, used, self.pages, share, details
+        )
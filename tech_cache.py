@@ -0,0 +1,162 @@
+# Trwała pamięć podręczna danych technicznych między przebiegami (SQLite) z czasem ważności
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, urlunsplit
+
+from loguru import logger
+
+from metrics import CSV_WRITE, stage
+
+DEFAULT_CACHE_PATH = os.path.join("output", "tech_details_cache.sqlite")
+DEFAULT_TTL_DAYS = 30
+BUSY_TIMEOUT = 30
+
+
+def canonical_link(url):
+    """
+    Funkcja sprowadza link produktu do postaci kanonicznej: mała nazwa hosta, bez parametrów i fragmentu.
+    """
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, "", ""))
+
+
+class TechDetailsCache:
+    """
+    Dane techniczne zapisane pod kanonicznym linkiem produktu.
+    Wpisy starsze niż TECH_CACHE_TTL_DAYS dni są pobierane ponownie, TECH_CACHE_REFRESH=1 wymusza odświeżenie wszystkich.
+    """
+
+    def __init__(self, shop_name, path=DEFAULT_CACHE_PATH, ttl_days=None, refresh=None):
+        self.shop_name = shop_name
+        if ttl_days is None:
+            ttl_days = float(os.environ.get("TECH_CACHE_TTL_DAYS", DEFAULT_TTL_DAYS))
+        self.ttl = timedelta(days=ttl_days)
+        self.refresh = os.environ.get("TECH_CACHE_REFRESH") == "1" if refresh is None else refresh
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # W trybie strumieniowym cache czytają wątki puli, dlatego połączenie jest współdzielone pod blokadą.
+        # Ten sam plik zapisują równoległe sklepy (run_all.py), więc zablokowana baza czeka zamiast zgłaszać błąd.
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._hits = set()
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS tech_details (
+                shop TEXT NOT NULL,
+                link TEXT NOT NULL,
+                details TEXT NOT NULL,
+                scraped_at TEXT NOT NULL,
+                PRIMARY KEY (shop, link)
+            )"""
+        )
+        self.connection.commit()
+
+    def get(self, url, ignore_ttl=False):
+        """
+        Funkcja zwraca zapisane dane techniczne, jeśli wpis istnieje i nie jest przeterminowany, w przeciwnym razie None.
+        ignore_ttl=True zwraca także przeterminowany wpis (np. gdy serwer potwierdził 304, że strona się nie zmieniła).
+        """
+        if self.refresh:
+            return None
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT details, scraped_at FROM tech_details WHERE shop = ? AND link = ?",
+                (self.shop_name, canonical_link(url)),
+            ).fetchone()
+        if row is None:
+            return None
+        details, scraped_at = row
+        if not ignore_ttl and datetime.now() - datetime.fromisoformat(scraped_at) > self.ttl:
+            return None
+        return json.loads(details)
+
+    def split(self, items, key="product_link"):
+        """
+        Funkcja dzieli produkty na te z aktualnym wpisem w pamięci podręcznej (pary (item, dane))
+        i te, które trzeba pobrać ponownie.
+        """
+        cached = []
+        to_scrape = []
+        for item in items:
+            details = self.get(item[key])
+            if details is None:
+                to_scrape.append(item)
+            else:
+                cached.append((item, details))
+                with self._lock:
+                    self._hits.add(canonical_link(item[key]))
+        logger.info("Pamięć podręczna: {} produktów z cache, {} do pobrania.", len(cached), len(to_scrape))
+        return cached, to_scrape
+
+    def through(self, scrape):
+        """
+        Funkcja opakowuje scrape(worker, item): wynik z pamięci podręcznej zwraca bez otwierania strony.
+        Cache jest sprawdzany w wątku puli, więc wyniki z cache i pobrane zachowują kolejność listingu.
+        """
+        def cached_scrape(worker, item):
+            details = self.get(item["product_link"])
+            if details is None:
+                return scrape(worker, item)
+            with self._lock:
+                self._hits.add(canonical_link(item["product_link"]))
+            return details
+        return cached_scrape
+
+    def in_order(self, items, cached, scraped, key="product_link"):
+        """
+        Generator łączy wyniki z cache (pary z split()) i pobrane wyniki (pary (item, dane) w kolejności produktów
+        do pobrania) w kolejności listingu.
+        """
+        cached = {item[key]: details for item, details in cached}
+        scraped = iter(scraped)
+        for item in items:
+            details = cached.get(item[key])
+            yield (item, details) if details is not None else next(scraped)
+
+    def store(self, url, details):
+        # Pustych wyników (np. po błędzie strony) nie zapisujemy, żeby przy następnym przebiegu spróbować ponownie
+        if not details:
+            return
+        link = canonical_link(url)
+        with self._lock:
+            # Wynik odczytany z cache nie odnawia daty pobrania
+            if link in self._hits:
+                return
+            self.connection.execute(
+                "INSERT OR REPLACE INTO tech_details (shop, link, details, scraped_at) VALUES (?, ?, ?, ?)",
+                (self.shop_name, link, json.dumps(details, ensure_ascii=False),
+                 datetime.now().isoformat(timespec="seconds")),
+            )
+            self.connection.commit()
+
+    def close(self):
+        if self._hits:
+            logger.info("Pamięć podręczna: {} produktów z cache.", len(self._hits))
+        self.connection.close()
+
+
+def write_tech_details(results, writer, output_file, journal, cache, spec_store, shop_name, day):
+    """
+    Funkcja zapisuje wyniki (pary (item, dane techniczne)) w kolejności, w jakiej przychodzą (kolejność listingu):
+    wiersz CSV, dziennik postępu, pamięć podręczna i wspólna baza danych technicznych.
+    Pusty wynik (limit czasu, blokada) nie trafia ani do CSV, ani do dziennika – wznowiony przebieg spróbuje ponownie
+    i dopisze produkt do pliku tylko raz.
+    """
+    for item, details in results:
+        link = item["product_link"]
+        if not details:
+            logger.warning("Brak danych technicznych, produkt zostanie pobrany przy wznowieniu: {}", link)
+            continue
+        with stage(CSV_WRITE):
+            writer.writerow({
+                "product_link": link,
+                "tech_details": json.dumps(details, ensure_ascii=False)
+            })
+            output_file.flush()
+        journal.mark_done(link)
+        cache.store(link, details)
+        spec_store.store(shop_name, link, details, day)
+        logger.info("Zakończono przetwarzanie: {}", link)
@@ -0,0 +1,5 @@
+# Skrypty i moduły leżą w katalogu głównym repozytorium – testy importują je bezpośrednio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,56 @@
+import random
+import threading
+import time
+
+import pytest
+
+from driver_pool import DriverPool
+
+
+class FakeWorker:
+    created = 0
+    quit_count = 0
+    lock = threading.Lock()
+
+    def __init__(self):
+        with FakeWorker.lock:
+            FakeWorker.created += 1
+
+    def quit(self):
+        with FakeWorker.lock:
+            FakeWorker.quit_count += 1
+
+
+@pytest.fixture(autouse=True)
+def reset_workers():
+    FakeWorker.created = FakeWorker.quit_count = 0
+
+
+def slow_square(worker, item):
+    # Losowe opóźnienia – wyniki kończą się w innej kolejności niż wejście
+    time.sleep(random.uniform(0, 0.01))
+    return item * item
+
+
+def test_imap_returns_results_in_input_order():
+    items = list(range(50))
+    results = list(DriverPool(FakeWorker, workers=4).imap(slow_square, items))
+    assert results == [(item, item * item) for item in items]
+    assert FakeWorker.created <= 4
+    assert FakeWorker.quit_count == FakeWorker.created
+
+
+def test_imap_reads_generator_lazily():
+    results = list(DriverPool(FakeWorker, workers=3).imap(slow_square, (item for item in range(20))))
+    assert [item for item, _ in results] == list(range(20))
+
+
+def test_imap_raises_worker_error_and_quits_workers():
+    def fail_on_five(worker, item):
+        if item == 5:
+            raise ValueError("błąd")
+        return item
+
+    with pytest.raises(ValueError):
+        list(DriverPool(FakeWorker, workers=2).imap(fail_on_five, range(20)))
+    assert FakeWorker.quit_count == FakeWorker.created
@@ -0,0 +1,29 @@
+import json
+
+import metrics
+
+
+def stage_entry(data, shop, stage_name):
+    return next(entry for entry in data["stages"] if (entry["shop"], entry["stage"]) == (shop, stage_name))
+
+
+def test_quantiles_above_last_bucket_are_null_in_json(tmp_path):
+    for seconds in (45.0, 60.0, 90.0):
+        metrics.observe(metrics.DRIVER_GET, seconds, shop="wolny_sklep")
+    data = metrics.finish_run(folder=str(tmp_path))
+    entry = stage_entry(data, "wolny_sklep", metrics.DRIVER_GET)
+    assert entry["p50_seconds"] is None
+    assert entry["p95_seconds"] is None
+    assert entry["max_seconds"] == 90.0
+    # Plik JSON musi dać się odczytać parserem bez rozszerzeń (Infinity nie jest poprawnym JSON)
+    json.dumps(data, allow_nan=False)
+    saved = next(tmp_path.glob("*.json"))
+    assert stage_entry(json.loads(saved.read_text(encoding="utf-8")), "wolny_sklep", metrics.DRIVER_GET)["p50_seconds"] is None
+
+
+def test_quantiles_use_bucket_upper_bounds():
+    for seconds in (0.2, 0.2, 0.2, 0.2, 20.0):
+        metrics.observe(metrics.HTTP_GET, seconds, shop="szybki_sklep")
+    entry = stage_entry(metrics.snapshot(), "szybki_sklep", metrics.HTTP_GET)
+    assert entry["p50_seconds"] == 0.25
+    assert entry["p95_seconds"] == 30.0
@@ -0,0 +1,59 @@
+import pytest
+
+from normalize import normalize_rows, parse_opinions, parse_price_grosze, parse_rating
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1299.00zł", 129900),
+    ("1 299,00", 129900),
+    ("1 299,00 zł", 129900),
+    ("1 299,99 zł", 129999),
+    ("1.299", 129900),
+    ("1.299,50", 129950),
+    ("1,299.50", 129950),
+    (1299.0, 129900),
+    (1299, 129900),
+    (0, None),
+    ("", None),
+    (None, None),
+    ("brak", None),
+])
+def test_parse_price_grosze(value, expected):
+    assert parse_price_grosze(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("4.5/5", 4.5),
+    ("4,5 (12)", 4.5),
+    ("4.5/5 (12 opinii)", 4.5),
+    ("9/10", 4.5),
+    ("90%", 4.5),
+    (4.5, 4.5),
+    ("Brak opinii", None),
+    (0, None),
+])
+def test_parse_rating(value, expected):
+    assert parse_rating(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("4.5/5 (12 opinii)", 12),
+    ("(7)", 7),
+    ("12 opinii", 12),
+    ("4.5/5", None),
+    (3, 3),
+    ("", None),
+])
+def test_parse_opinions(value, expected):
+    assert parse_opinions(value) == expected
+
+
+def test_normalize_rows_reads_reviews_when_no_rating_columns():
+    rows = [
+        {"price": "1 299,00 zł", "reviews": "4.5/5 (12 opinii)", "availability": "tak"},
+        {"price": "999", "rating": "4", "num_of_opinions": "3"},
+    ]
+    assert normalize_rows(rows) == [
+        {"price_grosze": 129900, "rating": 4.5, "num_of_opinions": 12, "availability": 1},
+        {"price_grosze": 99900, "rating": 4.0, "num_of_opinions": 3, "availability": None},
+    ]
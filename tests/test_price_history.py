@@ -0,0 +1,76 @@
+from price_history import PriceHistory
+
+SHOP = "sklep"
+LINK = "https://www.sklep.pl/telefon-1.html"
+
+
+def make_row(link=LINK, price="1 299,00 zł", reviews="4.5/5 (12 opinii)", **extra):
+    return dict({"product_link": link, "title": "Telefon", "price": price, "reviews": reviews}, **extra)
+
+
+def test_full_mode_stores_normalized_row(tmp_path):
+    with PriceHistory(str(tmp_path / "history.sqlite"), delta=False) as history:
+        history.record_many(SHOP, "2026-01-01", [make_row(color="czarny")])
+        row = history.connection.execute(
+            "SELECT product, price_grosze, rating, num_of_opinions, extra FROM prices"
+        ).fetchone()
+    assert row == (LINK, 129900, 4.5, 12, '{"color": "czarny"}')
+
+
+def test_full_mode_same_day_rerun_overwrites_row(tmp_path):
+    with PriceHistory(str(tmp_path / "history.sqlite"), delta=False) as history:
+        history.record_many(SHOP, "2026-01-01", [make_row(price="1 000 zł")])
+        history.record_many(SHOP, "2026-01-01", [make_row(price="1 500 zł")])
+        history.record_many(SHOP, "2026-01-02", [make_row(price="1 400 zł")])
+        assert [(day, price) for day, price, _, _ in history.history(SHOP, LINK)] == [
+            ("2026-01-01", 150000), ("2026-01-02", 140000)
+        ]
+
+
+def test_full_mode_commits_each_batch(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    history = PriceHistory(path, delta=False)
+    history.record_many(SHOP, "2026-01-01", [make_row()])
+    # Drugie połączenie (inny proces) widzi stronę bez zamykania pierwszego
+    other = PriceHistory(path, delta=False)
+    assert other.connection.execute("SELECT COUNT(*) FROM prices").fetchone()[0] == 1
+    other.close()
+    history.close()
+
+
+def run_day(history, day, rows):
+    history.record_many(SHOP, day, rows)
+    history.finish_day(SHOP, day)
+
+
+def test_delta_snapshot_matches_recorded_days(tmp_path):
+    other = "https://www.sklep.pl/telefon-2.html"
+    with PriceHistory(str(tmp_path / "history.sqlite"), delta=True) as history:
+        run_day(history, "2026-01-01", [make_row(price="1 000 zł"), make_row(other, price="500 zł")])
+        run_day(history, "2026-01-02", [make_row(price="900 zł"), make_row(other, price="500 zł")])
+        run_day(history, "2026-01-03", [make_row(price="900 zł")])
+        assert history.snapshot(SHOP, "2026-01-01") == {LINK: (100000, 4.5, 12, None), other: (50000, 4.5, 12, None)}
+        assert history.snapshot(SHOP, "2026-01-02") == {LINK: (90000, 4.5, 12, None), other: (50000, 4.5, 12, None)}
+        assert history.snapshot(SHOP, "2026-01-03") == {LINK: (90000, 4.5, 12, None)}
+        # Dzień bez zmian ceny pierwszego produktu nie zapisuje dla niego zdarzenia
+        assert history.connection.execute(
+            "SELECT COUNT(*) FROM price_events WHERE product = ? AND date = '2026-01-03'", (LINK,)
+        ).fetchone()[0] == 0
+
+
+def test_delta_snapshot_after_same_day_rerun(tmp_path):
+    other = "https://www.sklep.pl/telefon-2.html"
+    with PriceHistory(str(tmp_path / "history.sqlite"), delta=True) as history:
+        run_day(history, "2026-01-01", [make_row(price="1 000 zł"), make_row(other)])
+        # Ponowny przebieg tego samego dnia: nowa cena i produkt, który zniknął
+        run_day(history, "2026-01-01", [make_row(price="1 500 zł")])
+        assert history.snapshot(SHOP, "2026-01-01") == {LINK: (150000, 4.5, 12, None)}
+        assert history.snapshot(SHOP, "2026-01-02") == {LINK: (150000, 4.5, 12, None)}
+
+
+def test_delta_history_lists_change_days(tmp_path):
+    with PriceHistory(str(tmp_path / "history.sqlite"), delta=True) as history:
+        run_day(history, "2026-01-01", [make_row(price="1 000 zł")])
+        run_day(history, "2026-01-02", [make_row(price="1 000 zł")])
+        run_day(history, "2026-01-03", [make_row(price="800 zł")])
+        assert history.history(SHOP, LINK) == [("2026-01-01", 100000, 4.5, 12), ("2026-01-03", 80000, 4.5, 12)]
@@ -0,0 +1,35 @@
+from product_index import ProductIndex, canonical_product_url
+
+
+def test_canonical_url_drops_tracking_params_fragment_and_slash():
+    url = "https://WWW.Sklep.pl/telefon-1/?utm_source=x&gclid=abc&kolor=czarny#opinie"
+    assert canonical_product_url(url) == "https://www.sklep.pl/telefon-1?kolor=czarny"
+
+
+def test_canonical_url_sorts_remaining_params():
+    assert canonical_product_url("https://sklep.pl/p?b=2&a=1&fbclid=z") == "https://sklep.pl/p?a=1&b=2"
+
+
+def test_canonical_url_keeps_root_path():
+    assert canonical_product_url("https://sklep.pl/?ref=abc") == "https://sklep.pl/"
+
+
+def test_claim_skips_same_product_under_different_links(tmp_path):
+    index = ProductIndex("sklep", path=str(tmp_path / "index.sqlite"))
+    assert index.claim("https://sklep.pl/telefon-1?utm_campaign=a")
+    assert not index.claim("https://sklep.pl/telefon-1/#opis")
+    assert index.claim("https://sklep.pl/telefon-2")
+    index.close()
+
+
+def test_claim_prefers_product_id_over_url(tmp_path):
+    index = ProductIndex("sklep", path=str(tmp_path / "index.sqlite"))
+    assert index.claim("https://sklep.pl/kategoria-a/telefon", "123")
+    assert not index.claim("https://sklep.pl/kategoria-b/telefon", "123")
+    index.close()
+
+
+def test_product_id_from_url_pattern(tmp_path):
+    index = ProductIndex("morele", path=str(tmp_path / "index.sqlite"))
+    assert index.key("https://www.morele.net/smartfon-xyz-1234567/")[0] == "id:1234567"
+    index.close()
@@ -0,0 +1,42 @@
+from run_manifest import LISTING, RunManifest
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("title,product_link\n")
+        for index in range(rows):
+            f.write(f"Telefon {index},https://sklep.pl/{index}\n")
+    return str(path)
+
+
+def test_latest_success_is_newest_successful_run(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.sqlite"))
+    old = write_csv(tmp_path / "sklep_2026-01-01.csv", 3)
+    new = write_csv(tmp_path / "sklep_2026-01-02.csv", 5)
+    manifest.record("sklep", LISTING, "2026-01-01", old)
+    manifest.record("sklep", LISTING, "2026-01-02", new)
+    latest = manifest.latest("sklep", LISTING)
+    assert (latest["date"], latest["rows"], latest["path"]) == ("2026-01-02", 5, new)
+    manifest.close()
+
+
+def test_failed_empty_and_running_runs_do_not_replace_latest_success(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.sqlite"))
+    good = write_csv(tmp_path / "sklep_2026-01-01.csv", 3)
+    manifest.record("sklep", LISTING, "2026-01-01", good)
+    manifest.record("sklep", LISTING, "2026-01-02", write_csv(tmp_path / "sklep_2026-01-02.csv", 2), status="running")
+    manifest.record("sklep", LISTING, "2026-01-03", write_csv(tmp_path / "sklep_2026-01-03.csv", 2), status="failed")
+    manifest.record("sklep", LISTING, "2026-01-04", write_csv(tmp_path / "sklep_2026-01-04.csv", 0))
+    assert manifest.latest("sklep", LISTING)["path"] == good
+    assert manifest.status("sklep", LISTING, "2026-01-04")[0] == "empty"
+    manifest.close()
+
+
+def test_older_run_recorded_later_does_not_replace_latest_success(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.sqlite"))
+    new = write_csv(tmp_path / "sklep_2026-01-02.csv", 2)
+    manifest.record("sklep", LISTING, "2026-01-02", new)
+    manifest.record("sklep", LISTING, "2026-01-01", write_csv(tmp_path / "sklep_2026-01-01.csv", 2))
+    assert manifest.latest("sklep", LISTING)["path"] == new
+    assert manifest.latest("inny", LISTING) is None
+    manifest.close()
@@ -0,0 +1,43 @@
+from spec_store import SpecStore
+
+LINK = "https://www.sklep.pl/telefon-1.html"
+
+
+def test_store_and_read_back_details(tmp_path):
+    with SpecStore(str(tmp_path / "specs.sqlite")) as store:
+        store.store("sklep", LINK + "?utm_source=x", {"Pamięć RAM": "8 GB", "Kolory": ["czarny", "biały"]})
+        assert store.details("sklep", LINK) == {"Pamięć RAM": "8 GB", "Kolory": '["czarny", "biały"]'}
+        assert store.find("Pamięć RAM", "8 GB") == [("sklep", LINK, "8 GB")]
+        assert store.find("Pamięć RAM", "16 GB") == []
+
+
+def test_same_details_are_not_rewritten(tmp_path):
+    with SpecStore(str(tmp_path / "specs.sqlite")) as store:
+        store.store("sklep", LINK, {"Pamięć RAM": "8 GB"})
+        store.store("sklep", LINK, {"Pamięć RAM": "8 GB"})
+        store.store("sklep", LINK, {"Pamięć RAM": "12 GB"})
+        assert store.stats == {"stored": 2, "unchanged": 1, "failed": 0}
+        assert store.details("sklep", LINK) == {"Pamięć RAM": "12 GB"}
+
+
+def test_two_writers_share_dictionaries(tmp_path):
+    path = str(tmp_path / "specs.sqlite")
+    first, second = SpecStore(path), SpecStore(path)
+    # Drugi proces nie zna wartości dodanych przez pierwszy po jego starcie
+    first.store("sklep", LINK, {"Pamięć RAM": "8 GB"})
+    second.store("inny", LINK, {"Pamięć RAM": "8 GB"})
+    assert second.stats["failed"] == 0
+    assert [shop for shop, _, _ in second.find("Pamięć RAM", "8 GB")] == ["inny", "sklep"]
+    first.close()
+    second.close()
+
+
+def test_find_sees_attributes_added_by_another_writer(tmp_path):
+    path = str(tmp_path / "specs.sqlite")
+    # Czytelnik otwiera bazę przed zapisem, więc jego słowniki w pamięci nie znają nowego atrybutu
+    reader = SpecStore(path)
+    with SpecStore(path) as writer:
+        writer.store("sklep", LINK, {"Ładowanie bezprzewodowe": "Tak"})
+    assert reader.find("Ładowanie bezprzewodowe") == [("sklep", LINK, "Tak")]
+    assert reader.find("Ładowanie bezprzewodowe", "Tak", shop="sklep") == [("sklep", LINK, "Tak")]
+    reader.close()
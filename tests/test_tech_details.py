@@ -0,0 +1,86 @@
+import csv
+
+from checkpoint import CheckpointJournal
+from driver_pool import DriverPool
+from tech_cache import TechDetailsCache, write_tech_details
+
+FIELDNAMES = ["product_link", "tech_details"]
+ITEMS = [{"product_link": f"https://www.sklep.pl/telefon-{index}"} for index in range(6)]
+
+
+class FakeSpecStore:
+    def __init__(self):
+        self.stored = []
+
+    def store(self, shop, link, details, day=None):
+        self.stored.append(link)
+
+
+class FakeWorker:
+    def quit(self):
+        pass
+
+
+def run(tmp_path, results_for):
+    """
+    Jeden przebieg skryptu danych technicznych: dziennik, pamięć podręczna i zapis wyników.
+    """
+    output_path = str(tmp_path / "tech_details.csv")
+    journal = CheckpointJournal(str(tmp_path / "checkpoint.txt"), output_path)
+    cache = TechDetailsCache("sklep", path=str(tmp_path / "cache.sqlite"))
+    items = journal.pending(list(ITEMS))
+    output_file, writer = journal.open_output(FIELDNAMES)
+    with output_file:
+        write_tech_details(results_for(items, cache), writer, output_file, journal, cache, FakeSpecStore(), "sklep", "2026-01-01")
+    journal.close()
+    cache.close()
+    with open(output_path, newline="", encoding="utf-8") as f:
+        return [row["product_link"] for row in csv.DictReader(f)]
+
+
+def test_resume_after_interruption_writes_each_product_once(tmp_path, monkeypatch):
+    monkeypatch.delenv("CHECKPOINT_RESET", raising=False)
+    monkeypatch.delenv("TECH_CACHE_REFRESH", raising=False)
+
+    def interrupted(items, cache):
+        for index, item in enumerate(items):
+            if index == 4:
+                raise KeyboardInterrupt
+            # Produkt 1 – limit czasu, pusty wynik
+            yield item, {} if index == 1 else {"RAM": "8 GB"}
+
+    try:
+        run(tmp_path, interrupted)
+    except KeyboardInterrupt:
+        pass
+
+    links = run(tmp_path, lambda items, cache: ((item, {"RAM": "8 GB"}) for item in items))
+    assert sorted(links) == sorted(item["product_link"] for item in ITEMS)
+    assert len(links) == len(set(links))
+
+
+def test_through_keeps_listing_order_with_cache_hits(tmp_path):
+    cache = TechDetailsCache("sklep", path=str(tmp_path / "cache.sqlite"))
+    for index in (1, 4):
+        cache.store(ITEMS[index]["product_link"], {"z": "cache"})
+    scraped = []
+
+    def scrape(worker, item):
+        scraped.append(item["product_link"])
+        return {"z": "strona"}
+
+    results = list(DriverPool(FakeWorker, workers=3).imap(cache.through(scrape), ITEMS))
+    assert [item for item, _ in results] == ITEMS
+    assert [details["z"] for _, details in results] == ["strona", "cache", "strona", "strona", "cache", "strona"]
+    assert sorted(scraped) == sorted(ITEMS[index]["product_link"] for index in (0, 2, 3, 5))
+    cache.close()
+
+
+def test_in_order_merges_split_results(tmp_path):
+    cache = TechDetailsCache("sklep", path=str(tmp_path / "cache.sqlite"))
+    cache.store(ITEMS[2]["product_link"], {"z": "cache"})
+    cached, to_scrape = cache.split(ITEMS)
+    results = list(cache.in_order(ITEMS, cached, ((item, {"z": "strona"}) for item in to_scrape)))
+    assert [item for item, _ in results] == ITEMS
+    assert [details["z"] for _, details in results] == ["strona", "strona", "cache", "strona", "strona", "strona"]
+    cache.close()
@@ -0,0 +1,93 @@
+# Wspólne oczekiwanie na gotowość strony zamiast stałych time.sleep()
+import threading
+import time
+from collections import defaultdict
+
+from loguru import logger
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+import metrics
+
+# Statystyki oczekiwań: etykieta -> [liczba, rzeczywisty czas, czas dawnego sleep]
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: [0, 0.0, 0.0])
+
+# Znacznik czasu ostatniej zmiany DOM zapisywany przez MutationObserver
+INSTALL_OBSERVER_SCRIPT = """
+if (!window.__scraperObserver) {
+    window.__scraperLastMutation = performance.now();
+    window.__scraperObserver = new MutationObserver(function () {
+        window.__scraperLastMutation = performance.now();
+    });
+    window.__scraperObserver.observe(document, {childList: true, subtree: true, attributes: true});
+}
+return performance.now() - window.__scraperLastMutation;
+"""
+
+# Czas od zakończenia ostatniego zasobu sieciowego (Resource Timing API)
+NETWORK_QUIET_SCRIPT = """
+if (document.readyState !== "complete") { return -1; }
+var entries = performance.getEntriesByType("resource");
+var last = 0;
+for (var i = 0; i < entries.length; i++) { last = Math.max(last, entries[i].responseEnd); }
+return performance.now() - last;
+"""
+
+
+def document_ready(driver):
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def dom_stable(quiet_ms=300):
+    """
+    Warunek spełniony, gdy przez quiet_ms milisekund nie było zmian w DOM (MutationObserver).
+    """
+    def condition(driver):
+        return driver.execute_script(INSTALL_OBSERVER_SCRIPT) >= quiet_ms
+    return condition
+
+
+def network_idle(idle_ms=500):
+    """
+    Warunek spełniony, gdy strona jest załadowana i od idle_ms milisekund nie zakończyło się żadne zapytanie.
+    """
+    def condition(driver):
+        return driver.execute_script(NETWORK_QUIET_SCRIPT) >= idle_ms
+    return condition
+
+
+def wait_for(driver, condition, timeout=10, label="oczekiwanie", replaces=None):
+    """
+    Funkcja czeka na spełnienie warunku i wraca od razu, gdy strona jest gotowa.
+    replaces – długość stałego time.sleep(), który to oczekiwanie zastępuje (do porównania w podsumowaniu).
+    Zwraca wynik warunku albo None po przekroczeniu czasu.
+    """
+    started = time.perf_counter()
+    try:
+        result = WebDriverWait(driver, timeout, poll_frequency=0.1).until(condition)
+    except TimeoutException:
+        logger.warning("Przekroczono czas oczekiwania ({} s): {}", timeout, label)
+        result = None
+    elapsed = time.perf_counter() - started
+    metrics.observe(metrics.WAIT, elapsed)
+    with _stats_lock:
+        entry = _stats[label]
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] += replaces or 0.0
+    logger.debug("{}: {:.2f} s (wcześniej stałe {} s)", label, elapsed, replaces)
+    return result
+
+
+def log_wait_summary():
+    """
+    Funkcja zapisuje w logu rzeczywisty czas oczekiwań w porównaniu ze stałymi opóźnieniami.
+    """
+    with _stats_lock:
+        stats = {label: list(values) for label, values in _stats.items()}
+    for label, (count, waited, replaced) in sorted(stats.items()):
+        logger.info(
+            "Oczekiwanie '{}': {} razy, średnio {:.2f} s, łącznie {:.1f} s (stałe opóźnienia: {:.1f} s).",
+            label, count, waited / count, waited, replaced
+        )